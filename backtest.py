@@ -0,0 +1,409 @@
+"""
+backtest.py
+Walk-forward backtest of the Murphy Screener's signals: would the "Buy
+Zone" / "Watchlist" setups and high checklist counts score_stock hands out
+actually have worked?
+
+Re-running score_stock on df.iloc[:t + 1] for every historical bar is far
+too slow for a whole universe, so signal_history evaluates the same rules
+at every bar of one ticker at once, from full-length indicator series
+(moving averages, Bollinger width percentile, RSI, MACD, candlestick masks,
+volume ratios): Score, Setup tier, checklist pass count, StopLoss and
+Target per bar. trade_outcomes then walks forward from each bar with
+sliding windows over the next `horizon` bars and records whether the stop
+or the target was touched first. run_backtest does this for every ticker,
+on a process pool if asked (the price arrays are shipped packed, like the
+scan's scoring pool).
+
+The sector-leadership and intermarket-regime inputs (checklist steps 1-2,
+the sector and macro points) come from a context object. HistoricalContext
+(the default) reads them point-in-time from market_history.py: each bar
+sees the leaderboard and regime as they stood after its own close.
+StaticContext holds one snapshot — today's — for every bar instead, which
+leaks today's sector leadership into the past (--static-context).
+
+Usage:
+    python backtest.py --universe all --years 5 --processes 8
+    python backtest.py --synthetic --check      # parity vs. score_stock on sliced history
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import murphy_screener as ms
+from market_history import get_market_history
+
+
+HORIZON_BARS = 60     # how long a signal has to reach its target or stop before it counts as expired
+WARMUP_BARS = 252     # bars before the first evaluated one (52-week high, 200-day MA, squeeze percentile)
+TICKERS_PER_TASK = 8  # tickers per process-pool task
+
+SIGNAL_COLUMNS = ["Date", "Ticker", "Setup", "ChecklistPassCount", "Score", "Price", "StopLoss", "Target",
+                  "Beta", "Outcome", "Return", "BarsHeld"]
+OUTCOMES = ["target", "stop", "expired", "open"]
+
+
+class StaticContext:
+    """The sector leaderboard and intermarket regime held fixed for every
+    bar (see the module docstring for the look-ahead this implies)."""
+
+    def __init__(self, sector_leaderboard, regime):
+        self.sector_leaderboard = sector_leaderboard
+        self.regime = regime
+
+    def arrays(self, dates, sector, is_etf=False):
+        """Per-bar inputs for one ticker: risk_on (bool), sector_rank (float,
+        NaN when unranked), n_sectors (int) and favored (bool: its sector is
+        favored by the regime)."""
+        n = len(dates)
+        etf_for_sector = ms.SECTOR_ETFS.get(sector)
+        rank = np.nan
+        if not is_etf and etf_for_sector in self.sector_leaderboard:
+            rank = self.sector_leaderboard[etf_for_sector]["rank"]
+        return {
+            "risk_on": np.full(n, bool(self.regime.get("risk_on", True))),
+            "sector_rank": np.full(n, rank, dtype=float),
+            "n_sectors": np.full(n, len(self.sector_leaderboard)),
+            "favored": np.full(n, not is_etf and sector in self.regime.get("favored_sectors", [])),
+        }
+
+    def snapshot(self, date):
+        """(sector_leaderboard, regime) as score_stock sees them on `date`."""
+        return self.sector_leaderboard, self.regime
+
+
+class HistoricalContext:
+    """Point-in-time sector ranks and regime from a market_history.MarketHistory."""
+
+    def __init__(self, history):
+        self.history = history
+
+    def arrays(self, dates, sector, is_etf=False):
+        rank, n_sectors = self.history.sector_rank(dates, sector)
+        risk_on, favored = self.history.regime_arrays(dates, sector)
+        if is_etf:
+            rank, favored = np.full(len(rank), np.nan), np.zeros(len(rank), dtype=bool)
+        return {"risk_on": risk_on, "sector_rank": rank, "n_sectors": n_sectors, "favored": favored}
+
+    def snapshot(self, date):
+        """(sector_leaderboard, regime) as score_stock sees them on `date`."""
+        return self.history.leaderboard_on(date), self.history.regime_on(date)
+
+
+def signal_history(df, sector, context, is_etf=False, spy_returns=None):
+    """score_stock's verdict at every bar of `df` from bar WARMUP_BARS - 1
+    on: a DataFrame indexed by date with Score, Setup, ChecklistPassCount,
+    Price, StopLoss, Target, R:R and Beta (NaN without `spy_returns`, see
+    murphy_screener.benchmark_returns). Row t matches score_stock on
+    df.iloc[:t + 1] with the same context."""
+    close, high, low, vol, open_ = (df[k] for k in ("Close", "High", "Low", "Volume", "Open"))
+    c = close.to_numpy(dtype=np.float64)
+    h, l, v, o = (x.to_numpy(dtype=np.float64) for x in (high, low, vol, open_))
+    n = len(c)
+
+    ma50 = ms.sma(close, 50).to_numpy()
+    ma200 = ms.sma(close, 200).to_numpy()
+    week52_high = close.rolling(252).max().to_numpy()
+    price_52w_ago = np.where(np.arange(n) >= 251, np.roll(c, 251), c[0])
+    avg_vol20 = vol.rolling(20).mean().to_numpy()
+    vol_yesterday = np.concatenate([[np.nan], v[:-1]])
+    _, _, lower, width = ms.bollinger_bands(close)
+    lower, width = lower.to_numpy(), width.to_numpy()
+    width_q20 = ms.rolling_quantile(width, 120, 0.2).to_numpy()
+    rsi_val = ms.rsi(close).to_numpy()
+    macd_line, signal_line, hist = (x.to_numpy() for x in ms.macd(close))
+    recent_low = low.rolling(ms.BREAKOUT_LOOKBACK).min().to_numpy()
+    masks = ms.candle_pattern_masks(o, h, l, c)
+    candle = np.logical_or.reduce(list(masks.values()))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # --- 1. trend template
+        trend_pts = (np.where(c > price_52w_ago, 8, 0) + np.where((c > ma50) & (c > ma200), 10, 0)
+                     + np.where(ma50 > ma200, 4, 0) + np.where(c >= week52_high * 0.75, 3, 0))
+        score = np.minimum(trend_pts, 25).astype(np.float64)
+
+        # --- 2. near-MA50 pullback, volume spike flag
+        ratio_today = np.where(avg_vol20 > 0, v / avg_vol20, np.nan)
+        ratio_yesterday = np.where((avg_vol20 > 0) & ~np.isnan(vol_yesterday), vol_yesterday / avg_vol20, np.nan)
+        use_today = np.isnan(ratio_yesterday) | (~np.isnan(ratio_today) & (ratio_today >= ratio_yesterday))
+        spike_ratio = np.where(use_today, ratio_today, ratio_yesterday)
+        spike_flag = ~np.isnan(spike_ratio) & (spike_ratio >= ms.RECENT_VOLUME_SPIKE_MULT)
+        near_ma50 = (np.abs(c - ma50) / ma50 <= ms.NEAR_MA50_PCT) & (c >= ma50 * 0.98)
+        score += np.where(near_ma50, 5, 0) + np.where(near_ma50 & (v >= avg_vol20 * 1.3), 5, 0)
+
+        # --- 3. Bollinger squeeze / lower-band touch
+        squeeze = width <= width_q20
+        lower_touch = (c <= lower * 1.02) & (c > ma200)
+        support = near_ma50 | lower_touch
+        score += np.minimum(np.where(squeeze, 6, 0) + np.where(lower_touch, 4, 0), 10)
+
+        # --- 4. candle, 5. unusual volume day
+        score += np.where(candle, 10, 0)
+        volume_signal = (avg_vol20 > 0) & (v >= avg_vol20 * ms.VOLUME_SPIKE_MULT)
+        day_range = h - l
+        closes_high = (day_range > 0) & ((c - l) / day_range >= 0.7)
+        score += np.where(volume_signal, 7, 0) + np.where(volume_signal & closes_high, 3, 0)
+
+        # --- 6. RSI, 7. MACD
+        score += np.select([(rsi_val >= 50) & (rsi_val <= 70), (rsi_val >= 40) & (rsi_val < 50), rsi_val > 70],
+                           [10, 5, 3], 0)
+        hist1, hist2 = np.roll(hist, 1), np.roll(hist, 2)
+        macd_up = macd_line > signal_line
+        score += np.where(macd_up, 6, 0) + np.where(macd_up & (hist > hist1) & (hist1 > hist2), 4, 0)
+
+        # --- 8. sector leadership, 9. regime alignment (stocks only)
+        ctx = context.arrays(df.index, sector, is_etf)
+        rank, n_sectors = ctx["sector_rank"], ctx["n_sectors"]
+        sector_pts = np.where(rank <= np.maximum(1, n_sectors // 3), 10,
+                              np.where(rank <= n_sectors * 2 // 3, 5, 0))
+        if is_etf:
+            score = score * 100 / 85
+        else:
+            score += sector_pts + np.where(ctx["favored"], 5, 0)
+
+        # --- stop loss / target
+        stop_loss = np.where(ma50 < recent_low, ma50, recent_low) * 0.98
+        risk = c - stop_loss
+        upside = (week52_high - c) * 0.5
+        target = c + np.where(upside > risk * 2.5, upside, risk * 2.5)
+        target = np.where((week52_high > c) & (week52_high > target), week52_high, target)
+        rr_ratio = np.where(risk > 0, (target - c) / risk, np.nan)
+
+    buy_zone = support | candle | volume_signal | spike_flag
+    setup = np.where(buy_zone, "Buy Zone", np.where(squeeze | (trend_pts >= 18), "Watchlist", "No Signal"))
+    passes = (ctx["risk_on"].astype(int) + (np.ones(n, dtype=int) if is_etf else (sector_pts == 10).astype(int))
+              + ((trend_pts >= 18) & support).astype(int) + candle.astype(int)
+              + (~np.isnan(rr_ratio) & (rr_ratio >= 2.0)).astype(int))
+
+    beta = np.full(n, np.nan)
+    if spy_returns is not None:
+        beta = ms.rolling_beta({"_": df["Close"]}, spy_returns)["_"].reindex(df.index).to_numpy()
+
+    first = WARMUP_BARS - 1
+    out = pd.DataFrame({
+        "Score": np.round(score, 1), "Setup": setup, "ChecklistPassCount": passes.astype(np.int8),
+        "Price": c, "StopLoss": stop_loss, "Target": target, "R:R": rr_ratio, "Beta": beta,
+    }, index=df.index)
+    return out.iloc[first:]
+
+
+def trade_outcomes(df, entry_bar, stop, target, horizon=HORIZON_BARS):
+    """Walk forward from each entry bar (entered at its close) and report
+    which of `stop` / `target` the next `horizon` bars touched first.
+    Returns (outcome, exit_return, bars_held) arrays. A bar that opens
+    through a level fills at the open; a bar whose range spans both levels
+    counts as a stop (the intrabar order is unknown, so assume the worse).
+    Signals with neither hit are "expired" (exit at the horizon's close) or,
+    when fewer than `horizon` bars have happened since, "open" (marked at
+    the last close)."""
+    o, h, l, c = (df[k].to_numpy(dtype=np.float64) for k in ("Open", "High", "Low", "Close"))
+    n = len(c)
+    pad = np.full(horizon, np.nan)
+    # row t of each view holds bars t+1 .. t+horizon
+    fut_o, fut_h, fut_l = (sliding_window_view(np.concatenate([x[1:], pad]), horizon)[entry_bar]
+                           for x in (o, h, l))
+    stop_col, target_col = stop[:, None], target[:, None]
+    with np.errstate(invalid="ignore"):
+        stop_hit = fut_l <= stop_col
+        target_hit = (fut_h >= target_col) & ~(fut_o <= stop_col)
+    first_stop = np.where(stop_hit.any(axis=1), stop_hit.argmax(axis=1), horizon)
+    first_target = np.where(target_hit.any(axis=1), target_hit.argmax(axis=1), horizon)
+    # a bar that gaps open above the target is a target hit even if it later trades through the stop
+    gap_up = np.take_along_axis(fut_o, np.minimum(first_target, horizon - 1)[:, None], axis=1)[:, 0] >= target
+    target_first = (first_target < first_stop) | ((first_target == first_stop) & (first_target < horizon) & gap_up)
+    stop_first = ~target_first & (first_stop < horizon)
+
+    entry = c[entry_bar]
+    available = np.minimum(horizon, n - 1 - entry_bar)
+    outcome = np.where(target_first, "target", np.where(stop_first, "stop",
+                                                        np.where(available >= horizon, "expired", "open")))
+    hit_bar = np.where(target_first, first_target, first_stop)
+    hit_open = np.take_along_axis(fut_o, np.minimum(hit_bar, horizon - 1)[:, None], axis=1)[:, 0]
+    exit_price = np.where(target_first, np.fmax(target, hit_open),
+                          np.where(stop_first, np.fmin(stop, hit_open), c[entry_bar + available]))
+    bars_held = np.where(target_first | stop_first, hit_bar + 1, available)
+    return outcome, exit_price / entry - 1, bars_held
+
+
+def backtest_ticker(ticker, df, sector, context, is_etf=False, spy_returns=None, horizon=HORIZON_BARS):
+    """signal_history + trade_outcomes for one ticker, as SIGNAL_COLUMNS rows."""
+    if df is None or len(df) < WARMUP_BARS + 1:
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
+    sig = signal_history(df, sector, context, is_etf=is_etf, spy_returns=spy_returns)
+    entry_bar = np.arange(WARMUP_BARS - 1, len(df))
+    outcome, ret, held = trade_outcomes(df, entry_bar, sig["StopLoss"].to_numpy(), sig["Target"].to_numpy(),
+                                        horizon)
+    return pd.DataFrame({
+        "Date": sig.index, "Ticker": ticker, "Setup": sig["Setup"].to_numpy(),
+        "ChecklistPassCount": sig["ChecklistPassCount"].to_numpy(), "Score": sig["Score"].to_numpy(np.float32),
+        "Price": sig["Price"].to_numpy(), "StopLoss": sig["StopLoss"].to_numpy(),
+        "Target": sig["Target"].to_numpy(), "Beta": sig["Beta"].to_numpy(np.float32),
+        "Outcome": outcome, "Return": ret.astype(np.float32), "BarsHeld": held.astype(np.int16),
+    }, columns=SIGNAL_COLUMNS)
+
+
+_worker_context = None  # (context, spy_returns, horizon), set once per worker process
+
+
+def _init_worker(context, spy_returns, horizon):
+    global _worker_context
+    _worker_context = (context, spy_returns, horizon)
+
+
+def _backtest_packed(batch):
+    context, spy_returns, horizon = _worker_context
+    return [backtest_ticker(t, ms.unpack_ohlcv(*packed), sector, context, is_etf=etf_flag,
+                            spy_returns=spy_returns, horizon=horizon)
+            for t, packed, sector, etf_flag in batch]
+
+
+def run_backtest(histories, sectors, etf_flags, context, spy_close=None, horizon=HORIZON_BARS, processes=0):
+    """Backtest every {ticker: OHLCV DataFrame} in `histories`. Returns one
+    DataFrame of SIGNAL_COLUMNS rows (every evaluated bar of every ticker;
+    Setup, Outcome and Ticker as categoricals). With processes > 1 the
+    tickers are split over a process pool; the context and SPY returns go
+    to each worker once."""
+    spy_returns = ms.benchmark_returns(spy_close) if spy_close is not None else None
+    items = [(t, df, sectors.get(t), bool(etf_flags.get(t, False))) for t, df in histories.items()
+             if df is not None]
+    if processes is None or processes <= 1:
+        parts = [backtest_ticker(t, df, sector, context, is_etf=etf_flag, spy_returns=spy_returns, horizon=horizon)
+                 for t, df, sector, etf_flag in items]
+    else:
+        batches = [[(t, ms.pack_ohlcv(df), sector, etf_flag) for t, df, sector, etf_flag in items[i:i + TICKERS_PER_TASK]]
+                   for i in range(0, len(items), TICKERS_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(context, spy_returns, horizon)) as pool:
+            parts = [part for result in pool.map(_backtest_packed, batches) for part in result]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
+    out = pd.concat(parts, ignore_index=True)
+    out["Ticker"] = out["Ticker"].astype("category")
+    out["Setup"] = pd.Categorical(out["Setup"], categories=list(ms.SETUP_SORT_ORDER))
+    out["Outcome"] = pd.Categorical(out["Outcome"], categories=OUTCOMES)
+    return out
+
+
+def summarize(signals, by="Setup", min_beta=None):
+    """Hit rates per group over the closed signals (outcome not "open"):
+    signals, target-first %, stop-first %, expired %, mean and median
+    return, and mean bars held. `min_beta` mirrors run_scan's beta filter."""
+    closed = signals[signals["Outcome"] != "open"]
+    if min_beta is not None:
+        closed = closed[closed["Beta"] >= min_beta]
+    g = closed.groupby(by, observed=True)
+    out = pd.DataFrame({
+        "Signals": g.size(),
+        "Target%": g["Outcome"].apply(lambda s: (s == "target").mean() * 100),
+        "Stop%": g["Outcome"].apply(lambda s: (s == "stop").mean() * 100),
+        "Expired%": g["Outcome"].apply(lambda s: (s == "expired").mean() * 100),
+        "AvgReturn%": g["Return"].mean() * 100,
+        "MedianReturn%": g["Return"].median() * 100,
+        "AvgBarsHeld": g["BarsHeld"].mean(),
+    })
+    return out.round(2)
+
+
+def parity_check(histories, sectors, context, samples=40, seed=0):
+    """Compare signal_history with score_stock on df.iloc[:t + 1] — fed the
+    context's snapshot for that day — at five random bars of `samples`
+    random stocks. Returns a list of mismatches."""
+    rng = np.random.default_rng(seed)
+    tickers = [t for t, df in histories.items()
+               if df is not None and len(df) > WARMUP_BARS and sectors.get(t) != "ETF"]
+    mismatches = []
+    for t in rng.choice(tickers, size=min(samples, len(tickers)), replace=False):
+        df = histories[t]
+        sig = signal_history(df, sectors.get(t), context)
+        for bar in rng.integers(WARMUP_BARS - 1, len(df), size=5):
+            day = df.index[bar]
+            sector_leaderboard, regime = context.snapshot(day)
+            ref = ms.score_stock(t, df.iloc[:bar + 1], sectors.get(t), sector_leaderboard, regime)
+            row = sig.loc[day]
+            for col in ("Score", "Setup", "ChecklistPassCount", "StopLoss", "Target"):
+                a, b = ref[col], row[col]
+                same = a == b or (isinstance(a, float) and abs(a - round(float(b), 2)) <= 0.011)
+                if not same:
+                    mismatches.append((t, day.date(), col, a, b))
+    return mismatches
+
+
+def main():
+    p = argparse.ArgumentParser(description="Walk-forward backtest of the Murphy Screener's setups")
+    p.add_argument("tickers", nargs="*", help="Tickers to backtest (default: the --universe)")
+    p.add_argument("--universe", choices=["sp500", "sp400", "sp600", "all"], default="sp500")
+    p.add_argument("--count", type=int, default=None, help="Only the first N tickers of the universe")
+    p.add_argument("--years", type=float, default=5, help="Years of signals to evaluate (default: 5)")
+    p.add_argument("--horizon", type=int, default=HORIZON_BARS,
+                   help=f"Bars a signal has to hit its target or stop (default: {HORIZON_BARS})")
+    p.add_argument("--processes", type=int, default=0, help="Worker processes (default: 0 = inline)")
+    p.add_argument("--min-beta", type=float, default=None, help="Only count stocks with beta >= this")
+    p.add_argument("--save", help="Write every evaluated bar to this .parquet / .csv file")
+    p.add_argument("--static-context", action="store_true",
+                   help="Use today's sector leaderboard and regime for every bar instead of point-in-time ones")
+    p.add_argument("--synthetic", action="store_true", help="Use deterministic synthetic data (no network)")
+    p.add_argument("--check", action="store_true", help="Parity check against score_stock, then exit")
+    args = p.parse_args()
+
+    if args.synthetic:
+        ms.set_provider(ms.SyntheticProvider())
+    tickers = [t.upper() for t in args.tickers] or ms.get_universe_tickers(args.universe, args.count)
+    ctx = ms.DataContext()
+    ctx.prefetch(ms.market_symbols())
+    regime, leaderboard = ms.get_intermarket_regime(ctx), ms.get_sector_leaderboard(ctx)
+    spy_df = ctx.history(ms.BENCHMARK)
+    spy_close = spy_df["Close"] if spy_df is not None else None
+
+    period_days = int(args.years * 252) + WARMUP_BARS + args.horizon
+    t0 = time.perf_counter()
+    histories = ms.fetch_history_batch(tickers, period_days=period_days)
+    if spy_close is not None:
+        spy_close = ms.fetch_history(ms.BENCHMARK, period_days=period_days)["Close"]
+    etf_flags = {t: ms.is_etf(t) for t in histories}
+    sectors = {t: ("ETF" if etf_flags[t] else ms.get_sector(t)) for t in histories}
+    if args.static_context:
+        context = StaticContext(leaderboard, regime)
+    else:
+        context = HistoricalContext(get_market_history(period_days, ctx=ctx))
+    fetch_secs = time.perf_counter() - t0
+
+    if args.check:
+        bad = parity_check(histories, sectors, context)
+        print(f"Parity vs score_stock on sliced history: {len(bad)} mismatches")
+        for m in bad[:20]:
+            print("  ", m)
+        return
+
+    t0 = time.perf_counter()
+    signals = run_backtest(histories, sectors, etf_flags, context, spy_close=spy_close,
+                           horizon=args.horizon, processes=args.processes)
+    secs = time.perf_counter() - t0
+    print(f"Backtested {signals['Ticker'].nunique()} tickers, {len(signals):,} ticker-days "
+          f"({fetch_secs:.1f}s loading data, {secs:.1f}s backtesting).")
+    if args.static_context:
+        print("(Sector/regime inputs are today's leaderboard and regime for every bar — see backtest.py)")
+    stocks = signals[signals["Ticker"].map(lambda t: not etf_flags.get(t, False)).astype(bool)]
+    print(f"\n=== Stocks by setup (horizon {args.horizon} bars) ===")
+    print(summarize(stocks, "Setup", min_beta=args.min_beta).to_string())
+    print("\n=== Stocks by checklist steps passed ===")
+    print(summarize(stocks, "ChecklistPassCount", min_beta=args.min_beta).to_string())
+    buy_zone_5 = stocks[(stocks["Setup"] == "Buy Zone") & (stocks["ChecklistPassCount"] == 5)]
+    if len(buy_zone_5):
+        print("\n=== Buy Zone with all 5 checklist steps ===")
+        print(summarize(buy_zone_5.assign(Group="Buy Zone 5/5"), "Group", min_beta=args.min_beta).to_string())
+    if args.save:
+        if args.save.endswith(".csv"):
+            signals.to_csv(args.save, index=False)
+        else:
+            signals.to_parquet(args.save, index=False)
+        print(f"\nSaved {len(signals):,} rows to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
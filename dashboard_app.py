@@ -7,11 +7,14 @@ murphy_screener.py (and sp_universe_data.py, which murphy_screener.py
 imports) in the SAME folder/repo.
 """
 
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 
 import murphy_screener as ms
+import scan_diff
 
 
 def fmt_or_na(x, spec="{:.2f}"):
@@ -159,39 +162,41 @@ def pct_html(value):
 # ---------------------------------------------------------------------------
 # Cached data fetchers (avoid re-hitting Yahoo Finance on every rerun)
 # ---------------------------------------------------------------------------
+@st.cache_resource(ttl=300, show_spinner=False)
+def shared_data_context():
+    # One batched download of SPY, the intermarket proxies, the sector ETFs
+    # and the snapshot quotes, shared by every panel below (and by concurrent
+    # sessions, which wait on an in-flight download instead of repeating it).
+    ctx = ms.DataContext()
+    ctx.prefetch(ms.market_symbols(include_snapshot=True))
+    return ctx
+
+
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_regime():
-    return ms.get_intermarket_regime()
+    return ms.get_intermarket_regime(shared_data_context())
 
 
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_sector_leaderboard():
-    return ms.get_sector_leaderboard()
+    return ms.get_sector_leaderboard(shared_data_context())
 
 
 @st.cache_data(ttl=1800, show_spinner=False)
 def cached_history(ticker):
+    if ticker in ms.market_symbols(include_snapshot=True):
+        return shared_data_context().history(ticker)
     return ms.fetch_history(ticker)
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def cached_sector(ticker):
-    return ms.get_sector(ticker)
-
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def cached_is_etf(ticker):
-    return ms.is_etf(ticker)
-
-
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_market_snapshot():
-    return ms.get_market_snapshot()
+    return ms.get_market_snapshot(shared_data_context())
 
 
 @st.cache_data(ttl=1800, show_spinner=False)
 def cached_normalized_comparison(tickers_tuple, lookback=252):
-    return ms.get_normalized_comparison(dict(tickers_tuple), lookback=lookback)
+    return ms.get_normalized_comparison(dict(tickers_tuple), lookback=lookback, ctx=shared_data_context())
 
 
 # ---------------------------------------------------------------------------
@@ -341,6 +346,9 @@ with st.sidebar:
 
     top_n = st.select_slider("Number of results to show (per list)",
                              options=list(range(5, 51, 5)), value=20)
+    scan_jobs = st.slider("Parallel download workers", 1, 16, ms.DEFAULT_JOBS,
+                          help="Downloads overlap across this many workers; all of them share one "
+                               "rate limit, so raising it won't trip Yahoo Finance's throttling.")
     run_button = st.button("🔍 Run scan", type="primary", use_container_width=True)
 
     st.markdown("---")
@@ -395,6 +403,51 @@ def render_relative_strength_chart(ticker, stock_df):
     st.line_chart(rel, use_container_width=True, height=220)
 
 
+def render_signal_history(store):
+    """Streaks and new full-checklist names from the recorded scan history
+    (see signal_store.py)."""
+    st.markdown('<div class="section-title">📜 Signal History</div>', unsafe_allow_html=True)
+    dates = store.scan_dates()
+    if len(dates) < 2:
+        st.caption("Every scan is recorded in the signal history; streaks and new entries show up here "
+                   "once there are scans from a few different days.")
+        return
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("**In the Buy Zone 3 scan days running**")
+        streak = store.streak("Buy Zone", 3)
+        if streak.empty:
+            st.caption("None yet (needs 3 scan days).")
+        else:
+            st.dataframe(streak.rename(columns={"ticker": "Ticker", "score": "Score", "checklist": "Steps",
+                                                "sector": "Sector"})[["Ticker", "Score", "Steps", "Sector"]],
+                         hide_index=True, use_container_width=True)
+    with c2:
+        since = dates[-min(5, len(dates))]
+        st.markdown(f"**First time on the 5/5 list (since {since})**")
+        new = store.first_appearances(5, since=since)
+        if new.empty:
+            st.caption("No new names.")
+        else:
+            st.dataframe(new.rename(columns={"ticker": "Ticker", "first_date": "First day", "score": "Score",
+                                             "sector": "Sector"})[["Ticker", "First day", "Score", "Sector"]],
+                         hide_index=True, use_container_width=True)
+
+
+def render_scan_changes(previous, changes):
+    """What changed since the previous dashboard scan (see scan_diff.py)."""
+    st.markdown('<div class="section-title">🔁 Changes since the previous scan</div>', unsafe_allow_html=True)
+    if previous is None:
+        st.caption("Each scan is compared with the one before it; the changes show up here from the next scan on.")
+        return
+    if not changes:
+        st.caption(f"Nothing changed since the previous scan ({previous['as_of']}).")
+        return
+    st.caption(f"Since the previous scan ({previous['as_of']}): {scan_diff.count_changes(changes)}.")
+    st.dataframe(pd.DataFrame(changes).assign(Change=lambda d: d["Change"].map(scan_diff.CHANGES)),
+                 hide_index=True, use_container_width=True)
+
+
 with tab_home:
     # ---------------------------------------------------------------------------
     # Main scan
@@ -407,6 +460,12 @@ with tab_home:
         if not tickers:
             st.warning("No tickers to scan.")
             st.stop()
+        # Known-dead symbols this scan's slice of the universe left out (the
+        # random draw only ever picks live ones), as run_scan reports them.
+        skipped_dead = []
+        if universe_key != "random100":
+            universe_all = ms.get_universe_tickers(universe_key, skip_dead=False)
+            skipped_dead = ms.split_dead_tickers(universe_all[:universe_all.index(tickers[-1]) + 1])[1]
 
         regime = cached_regime()
         sector_leaderboard_scan = cached_sector_leaderboard()
@@ -414,22 +473,95 @@ with tab_home:
         spy_close_scan = spy_df_scan["Close"] if spy_df_scan is not None else None
 
         st.markdown(f'<div class="section-title">📋 Scan Results ({len(tickers)} tickers)</div>', unsafe_allow_html=True)
+        ms.CONTROLLER.reset_stats()
+        score_memo = ms.get_score_memo()  # scores kept across reruns; only dirty tickers are rescored
+        if score_memo is not None:
+            score_memo.reset_stats()
         progress = st.progress(0.0, text="Starting scan...")
         stock_results, etf_results = [], []
-        for i, ticker in enumerate(tickers, start=1):
-            progress.progress(i / len(tickers), text=f"Scanning {ticker} ({i}/{len(tickers)})")
-            try:
-                df = cached_history(ticker)
-                if df is None:
-                    continue  # no usable price data for this ticker — silently skipped
-                etf_flag = cached_is_etf(ticker)
-                sector = "ETF" if etf_flag else cached_sector(ticker)
-                res = ms.score_stock(ticker, df, sector, sector_leaderboard_scan, regime,
-                                      is_etf=etf_flag, spy_close=spy_close_scan)
-                (etf_results if etf_flag else stock_results).append(res)
-            except Exception:
-                continue  # couldn't score this ticker — silently skipped, not worth cluttering the UI
+        # With the on-disk cache on, finished tickers are checkpointed as they
+        # complete. If the last scan never finished (a widget click reran the
+        # script mid-scan), this run picks up its results and only scans
+        # what's left; a finished journal means this is a fresh scan.
+        journal = ms.open_scan_journal(ms.scan_journal_key(), "dashboard", resume=True) if ms.disk_cache_enabled() else None
+        if journal is not None and journal.complete:
+            journal.close()
+            journal = ms.open_scan_journal(ms.scan_journal_key(), "dashboard")
+        wanted = set(tickers)
+        restored = [e for t, e in (journal.entries if journal is not None else {}).items()
+                    if t in wanted and ms.journal_restorable(e)]
+        if restored:
+            st.caption(f"Resumed an interrupted scan: {len(restored)} tickers were already done.")
+        # Tickers whose latest bar (and trailing window, see ms.last_bar)
+        # hasn't moved since the previous scan keep their previous result
+        # (when the sector ranks, regime and SPY haven't moved either), so a
+        # rerun only rescores what has new data.
+        snapshots = ms.get_scan_snapshot("dashboard")
+        previous = snapshots.load() if snapshots is not None else None
+        context = scan_diff.context_fingerprint(sector_leaderboard_scan, regime, spy_close_scan)
+        done = {e["ticker"] for e in restored}
+        if previous is not None:
+            reused, _ = scan_diff.reuse_unchanged([t for t in tickers if t not in done], previous, context,
+                                                  jobs=scan_jobs)
+            for e in reused:
+                journal.record(e["ticker"], "scored", etf=e["etf"], result=e["result"], bar=e["bar"])
+            if reused:
+                st.caption(f"{len(reused)} tickers are unchanged since the previous scan; only the rest are "
+                           f"rescored.")
+            restored += reused
+            done |= {e["ticker"] for e in reused}
+        # Likeliest actionable names first (from cached signals; see ms.schedule_tickers).
+        remaining = ms.schedule_tickers([t for t in tickers if t not in done], sector_leaderboard_scan,
+                                        ms.strong_sector_etfs(sector_leaderboard_scan))
+        # Downloads run concurrently on scan_engine's worker pool (rate-limited);
+        # scoring, the progress bar and the live leaderboard below stay on this
+        # Streamlit script thread. Nothing is filtered out here, as before.
+        order = {t: i for i, t in enumerate(tickers)}
+        live = st.empty()
+        last_live = 0.0
+        events = ms.scan_stream(remaining, sector_leaderboard_scan, regime, spy_close=spy_close_scan,
+                                only_strong_sectors=False, min_beta=None, only_actionable=False,
+                                jobs=scan_jobs, journal=journal, restored=restored,
+                                order=order, top_n=top_n, rank_by_setup=False)
+        for ev in events:
+            progress.progress(ev["done"] / ev["total"], text=f"Scanning {ev['ticker']} ({ev['done']}/{ev['total']})")
+            if ev["result"] is not None:  # no data / couldn't score: silently skipped, not worth cluttering the UI
+                (etf_results if ev["etf"] else stock_results).append(ev["result"])
+            # Show the best candidates so far while the scan is still running
+            # (redrawn at most twice a second).
+            if ev["top_changed"] and time.monotonic() - last_live >= 0.5 and ev["top_stocks"]:
+                with live.container():
+                    st.markdown(f"**Best stocks so far** ({ev['done']}/{ev['total']} scanned)")
+                    st.dataframe(pd.DataFrame(ev["top_stocks"])[["Ticker", "Score", "ChecklistPassCount", "Setup",
+                                                                "Sector", "Price"]],
+                                 hide_index=True, use_container_width=True)
+                last_live = time.monotonic()
+        if journal is not None:
+            journal.close()
+        live.empty()
+        if ms.CONTROLLER.summary():
+            st.caption(ms.CONTROLLER.summary() + " Tickers that still failed are retried on the next scan.")
+        if score_memo is not None and score_memo.summary():
+            st.caption(score_memo.summary())
+        stock_results.sort(key=lambda r: order.get(r["Ticker"], 0))
+        etf_results.sort(key=lambda r: order.get(r["Ticker"], 0))
         progress.empty()
+        # Every finished scan goes into the signal history (streaks, score trajectories).
+        signal_store = ms.get_signal_store()
+        if signal_store is not None:
+            signal_store.append(stock_results + etf_results, ms.get_provider().today(), source="dashboard",
+                                options={"universe": universe_key, "tickers": len(tickers)})
+        changes = None
+        if snapshots is not None:
+            current = scan_diff.make_snapshot(journal.entries, [r["Ticker"] for r in stock_results + etf_results],
+                                              tickers, context, ms.get_provider().today(),
+                                              options={"universe": universe_key})
+            changes = scan_diff.diff_scans(previous, current) if previous is not None else []
+            snapshots.save(current)
+        if skipped_dead:
+            st.caption(f"Skipped {len(skipped_dead)} delisted/dead symbols that keep returning no data "
+                       f"(re-checked every {ms.get_dead_registry().reprobe_days} days): "
+                       f"{', '.join(skipped_dead[:15])}" + (" ..." if len(skipped_dead) > 15 else ""))
 
         if not stock_results and not etf_results:
             st.error("No results returned. Check your tickers/filters and try again.")
@@ -506,6 +638,10 @@ with tab_home:
                     st.markdown("**Why it scored this way:**")
                     for r in row["Reasons"]:
                         st.markdown(f'<div class="reason-item">• {r}</div>', unsafe_allow_html=True)
+                    history = signal_store.trajectory(row["Ticker"]) if signal_store is not None else None
+                    if history is not None and len(history) >= 2:
+                        st.markdown("**Score over past scans:**")
+                        st.line_chart(history.set_index("scan_date")[["score"]], use_container_width=True, height=160)
                     if show_rs_chart:
                         st.markdown("**Relative strength vs. SPY:**")
                         stock_df = cached_history(row["Ticker"])
@@ -520,8 +656,12 @@ with tab_home:
             st.download_button(f"⬇️ Download {title} CSV", csv, csv_name, "text/csv",
                                 use_container_width=True, key=csv_name)
 
+        if changes is not None:
+            render_scan_changes(previous, changes)
         render_results(stock_results, "Stocks", "📈", "screener_results_stocks.csv", show_rs_chart=True)
         render_results(etf_results, "ETFs", "🧺", "screener_results_etfs.csv", show_rs_chart=False)
+        if signal_store is not None:
+            render_signal_history(signal_store)
 
     else:
         st.info("Set your tickers in the sidebar and click **Run scan**.")
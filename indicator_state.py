@@ -0,0 +1,347 @@
+"""
+indicator_state.py
+Streaming per-ticker indicator state for the Murphy Screener.
+
+score_stock recomputes everything (Wilder RSI averages, MACD EMAs, the
+50/200/20-day means, Bollinger std, the 52-week high, beta...) from the full
+~400-bar history every time. IndicatorState keeps the running pieces
+instead — EMA accumulators, running sums for the moving averages and the
+Bollinger std, monotonic deques for the rolling max/min, running
+covariance sums for beta — so appending one new daily bar costs O(1), and
+snapshot() yields the same indicator dict as murphy_screener.compute_indicators,
+ready for score_indicators.
+
+StateStore persists one pickled state per ticker under the screener's
+cache directory (MemoryStateStore keeps them in memory when the on-disk
+cache is off), and score_incremental ties it together: load the state,
+feed it only the bars it hasn't seen, score, save.
+
+tests/test_indicator_state.py holds score_incremental to parity with
+score_stock; `python indicator_state.py` times the two on synthetic data.
+"""
+
+import os
+import math
+import hashlib
+import pickle
+import threading
+from collections import deque
+
+import numpy as np
+
+import murphy_screener as ms
+from price_cache import DEFAULT_CACHE_DIR, safe_filename
+
+
+class IndicatorState:
+    """Running indicator state for one ticker. Feed bars oldest-first with
+    update(); read the current indicator values with snapshot()."""
+
+    RSI_WINDOW = 14
+    MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+    BB_WINDOW, BB_RANK_WINDOW, BB_RANK_Q = 20, 120, 0.2
+    YEAR = 252
+
+    def __init__(self):
+        self.n = 0
+        self.last_date = None
+        self.prev_close = None
+        self.closes = deque(maxlen=self.YEAR)   # covers every close-based window (20/50/200/252)
+        self.sum20 = self.sumsq20 = self.sum50 = self.sum200 = 0.0
+        self.vols = deque(maxlen=20)
+        self.vsum20 = 0.0
+        self.max_close = deque()                 # (bar#, close), decreasing — 252-bar rolling max
+        self.min_low = deque()                   # (bar#, low), increasing — BREAKOUT_LOOKBACK rolling min
+        self.widths = deque(maxlen=self.BB_RANK_WINDOW)
+        self.bb_lower = np.nan
+        self.bars = deque(maxlen=3)              # last three (open, high, low, close) for candlesticks
+        self.avg_gain = self.avg_loss = np.nan
+        self.rsi_count = 0
+        self.ema_fast = self.ema_slow = self.ema_signal = np.nan
+        self.hist = deque([np.nan] * 3, maxlen=3)
+        self.beta_pairs = deque(maxlen=self.YEAR)  # (spy_ret, stock_ret)
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self._candles = (-1, [])                 # (bar count, hits) memo for snapshot()
+        self.spy_fp = None                       # spy_fingerprint at last_date, set by sync_state
+
+    @staticmethod
+    def _ema(prev, value, alpha):
+        return value if np.isnan(prev) else (1 - alpha) * prev + alpha * value
+
+    def update(self, date, o, h, l, c, v, spy_ret=np.nan):
+        """Append one bar. `spy_ret` is SPY's daily return on the same date
+        (NaN if SPY has no bar that day / no benchmark is in use)."""
+        o, h, l, c, v, spy_ret = float(o), float(h), float(l), float(c), float(v), float(spy_ret)
+        i = self.n
+        closes = self.closes
+
+        # moving-average / Bollinger running sums (drop the bar leaving each window)
+        if len(closes) >= 20:
+            out = closes[-20]
+            self.sum20 -= out
+            self.sumsq20 -= out * out
+        if len(closes) >= 50:
+            self.sum50 -= closes[-50]
+        if len(closes) >= 200:
+            self.sum200 -= closes[-200]
+        self.sum20 += c
+        self.sumsq20 += c * c
+        self.sum50 += c
+        self.sum200 += c
+
+        if len(self.vols) == self.vols.maxlen:
+            self.vsum20 -= self.vols[0]
+        self.vols.append(v)
+        self.vsum20 += v
+
+        while self.max_close and self.max_close[-1][1] <= c:
+            self.max_close.pop()
+        self.max_close.append((i, c))
+        while self.max_close[0][0] <= i - self.YEAR:
+            self.max_close.popleft()
+        while self.min_low and self.min_low[-1][1] >= l:
+            self.min_low.pop()
+        self.min_low.append((i, l))
+        while self.min_low[0][0] <= i - ms.BREAKOUT_LOOKBACK:
+            self.min_low.popleft()
+
+        if i + 1 >= self.BB_WINDOW:
+            mean = self.sum20 / self.BB_WINDOW
+            var = max(0.0, (self.sumsq20 - self.sum20 * mean) / (self.BB_WINDOW - 1))
+            std = math.sqrt(var)
+            self.widths.append(4 * std / mean)
+            self.bb_lower = mean - 2 * std
+
+        if self.prev_close is not None:
+            delta = c - self.prev_close
+            alpha = 1 / self.RSI_WINDOW
+            self.avg_gain = self._ema(self.avg_gain, max(delta, 0.0), alpha)
+            self.avg_loss = self._ema(self.avg_loss, max(-delta, 0.0), alpha)
+            self.rsi_count += 1
+            stock_ret = c / self.prev_close - 1
+            if not (np.isnan(spy_ret) or np.isnan(stock_ret)):
+                if len(self.beta_pairs) == self.beta_pairs.maxlen:
+                    ox, oy = self.beta_pairs[0]
+                    self.sx -= ox
+                    self.sy -= oy
+                    self.sxx -= ox * ox
+                    self.sxy -= ox * oy
+                self.beta_pairs.append((spy_ret, stock_ret))
+                self.sx += spy_ret
+                self.sy += stock_ret
+                self.sxx += spy_ret * spy_ret
+                self.sxy += spy_ret * stock_ret
+
+        self.ema_fast = self._ema(self.ema_fast, c, 2 / (self.MACD_FAST + 1))
+        self.ema_slow = self._ema(self.ema_slow, c, 2 / (self.MACD_SLOW + 1))
+        macd_line = self.ema_fast - self.ema_slow
+        self.ema_signal = self._ema(self.ema_signal, macd_line, 2 / (self.MACD_SIGNAL + 1))
+        self.hist.append(macd_line - self.ema_signal)
+
+        closes.append(c)
+        self.bars.append((o, h, l, c))
+        self.prev_close = c
+        self.last_date = date
+        self.n += 1
+        if self.n % self.YEAR == 0:
+            self._reanchor()
+
+    def _reanchor(self):
+        """Recompute the running sums exactly from the stored windows, so
+        add/subtract rounding error can't build up over years of updates."""
+        closes = list(self.closes)
+        self.sum20 = math.fsum(closes[-20:])
+        self.sumsq20 = math.fsum(x * x for x in closes[-20:])
+        self.sum50 = math.fsum(closes[-50:])
+        self.sum200 = math.fsum(closes[-200:])
+        self.vsum20 = math.fsum(self.vols)
+        pairs = list(self.beta_pairs)
+        self.sx = math.fsum(x for x, _ in pairs)
+        self.sy = math.fsum(y for _, y in pairs)
+        self.sxx = math.fsum(x * x for x, _ in pairs)
+        self.sxy = math.fsum(x * y for x, y in pairs)
+
+    def beta(self):
+        n = len(self.beta_pairs)
+        if n < 30:
+            return np.nan
+        var = self.sxx - self.sx * self.sx / n
+        if var <= 0:
+            return np.nan
+        return (self.sxy - self.sx * self.sy / n) / var
+
+    def rsi(self):
+        if self.rsi_count < self.RSI_WINDOW or self.avg_loss == 0 or np.isnan(self.avg_loss):
+            return 50.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+    def candle_hits(self):
+        if self._candles[0] != self.n:
+            masks = ms.candle_pattern_masks(*np.array(self.bars, dtype=float).T)
+            self._candles = (self.n, [label for name, label in ms.CANDLE_PATTERNS if masks[name][-1]])
+        return list(self._candles[1])
+
+    def snapshot(self):
+        """The current indicator dict, same keys as compute_indicators."""
+        n = self.n
+        o, h, l, c = self.bars[-1]
+        full_rank = len(self.widths) == self.widths.maxlen
+        return {
+            "last_close": c,
+            "beta": self.beta(),
+            "ma50": self.sum50 / 50 if n >= 50 else np.nan,
+            "ma200": self.sum200 / 200 if n >= 200 else np.nan,
+            "week52_high": self.max_close[0][1] if n >= self.YEAR else np.nan,
+            "price_52w_ago": self.closes[0],
+            "avg_vol20": self.vsum20 / 20 if n >= 20 else np.nan,
+            "vol_today": self.vols[-1],
+            "vol_yesterday": self.vols[-2] if len(self.vols) >= 2 else np.nan,
+            "bb_width": self.widths[-1] if self.widths else np.nan,
+            "bb_width_q20": (ms.rolling_quantile_last(self.widths, self.BB_RANK_WINDOW, self.BB_RANK_Q)
+                            if full_rank else np.nan),
+            "bb_lower": self.bb_lower,
+            "candle_hits": self.candle_hits(),
+            "rsi": self.rsi(),
+            "macd": self.ema_fast - self.ema_slow,
+            "macd_signal": self.ema_signal,
+            "macd_hist": tuple(self.hist),
+            "day_high": h,
+            "day_low": l,
+            "recent_low": self.min_low[0][1] if n >= ms.BREAKOUT_LOOKBACK else np.nan,
+        }
+
+
+def spy_returns(spy_close):
+    """{Timestamp: SPY daily return} lookup for IndicatorState.update."""
+    if spy_close is None:
+        return {}
+    return spy_close.pct_change().dropna().to_dict()
+
+
+def spy_fingerprint(dates, spy_ret_by_date):
+    """Digest of SPY's returns on `dates` (NaN where it has none), i.e. what
+    the beta accumulators were fed over the year ending on dates[-1]."""
+    rets = np.array([spy_ret_by_date.get(d, np.nan) for d in dates[-(IndicatorState.YEAR + 1):]],
+                    dtype=np.float64)
+    return hashlib.blake2b(np.round(rets, 8).tobytes(), digest_size=8).hexdigest()
+
+
+def sync_state(state, df, spy_ret_by_date):
+    """Bring `state` up to date with `df`, feeding only the bars after
+    state.last_date. Returns (state, changed). The state is rebuilt from the
+    whole of `df` if `state` is None or no longer lines up with it: its last
+    bar is missing from df, that bar's adjusted close has since changed, or
+    the SPY returns over its beta window differ from the ones it was built
+    with (e.g. SPY's download had failed then, leaving NaN in the sums)."""
+    new = df
+    if state is not None and state.last_date is not None:
+        pos = df.index.searchsorted(state.last_date)
+        lines_up = (pos < len(df) and df.index[pos] == state.last_date
+                    and np.isclose(df["Close"].iat[pos], state.bars[-1][3], rtol=1e-6)
+                    and getattr(state, "spy_fp", None) == spy_fingerprint(df.index[:pos + 1], spy_ret_by_date))
+        if lines_up:
+            if pos == len(df) - 1:
+                return state, False
+            new = df.iloc[pos + 1:]
+        else:
+            state = None
+    if state is None:
+        state = IndicatorState()
+    cols = df.columns.get_indexer(ms.OHLCV_COLUMNS)
+    for date, (o, h, l, c, v) in zip(new.index, new.to_numpy(dtype=np.float64)[:, cols]):
+        state.update(date, o, h, l, c, v, spy_ret_by_date.get(date, np.nan))
+    state.spy_fp = spy_fingerprint(df.index, spy_ret_by_date)
+    return state, True
+
+
+class StateStore:
+    """One pickled IndicatorState per ticker, under <cache dir>/state/<namespace>.
+    murphy_screener.get_state_store names the namespace after the data
+    provider, so state built from one source is never picked up by another."""
+
+    def __init__(self, root=None, namespace="default"):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "state", namespace)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ticker):
+        return os.path.join(self.root, safe_filename(ticker) + ".pkl")
+
+    def load(self, ticker):
+        try:
+            with open(self._path(ticker), "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def save(self, ticker, state):
+        path = self._path(ticker)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+
+class MemoryStateStore:
+    """StateStore stand-in that keeps the states in this process only, for
+    scans that mustn't write to the cache directory (--no-cache, offline
+    providers)."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, ticker):
+        with self._lock:
+            return self._states.get(ticker)
+
+    def save(self, ticker, state):
+        with self._lock:
+            self._states[ticker] = state
+
+
+def score_incremental(ticker, df, sector, sector_leaderboard, regime, is_etf=False, spy_close=None,
+                      store=None, spy_ret_by_date=None):
+    """Drop-in for score_stock that keeps a persisted IndicatorState per
+    ticker: only bars newer than the stored state are processed. Pass a
+    precomputed `spy_ret_by_date` (see spy_returns) when scoring many
+    tickers against the same SPY series. `store` defaults to
+    murphy_screener.get_state_store()."""
+    if store is None:
+        store = ms.get_state_store()
+    if spy_ret_by_date is None:
+        spy_ret_by_date = spy_returns(spy_close)
+    state, changed = sync_state(store.load(ticker), df, spy_ret_by_date)
+    ind = state.snapshot()
+    if changed:
+        store.save(ticker, state)
+    if spy_close is None:
+        ind["beta"] = np.nan
+    return ms.score_indicators(ticker, ind, sector, sector_leaderboard, regime, is_etf=is_etf)
+
+
+if __name__ == "__main__":
+    # Timing: rescoring the synthetic S&P 500 with up-to-date state vs. score_stock.
+    import tempfile
+    import time
+    from market_data import SyntheticProvider
+
+    ms.set_provider(SyntheticProvider())
+    histories = {t: df for t, df in ms.fetch_history_batch(ms.get_universe_tickers("sp500")).items()
+                 if df is not None}
+    regime, leaderboard = ms.get_intermarket_regime(), ms.get_sector_leaderboard()
+    spy_close = ms.fetch_history(ms.BENCHMARK)["Close"]
+    spy_ret = spy_returns(spy_close)
+    store = StateStore(tempfile.mkdtemp())
+    for t, df in histories.items():
+        store.save(t, sync_state(None, df, spy_ret)[0])
+
+    t0 = time.perf_counter()
+    for t, df in histories.items():
+        ms.score_stock(t, df, ms.get_sector(t), leaderboard, regime, spy_close=spy_close)
+    full = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for t, df in histories.items():
+        score_incremental(t, df, ms.get_sector(t), leaderboard, regime, spy_close=spy_close,
+                          store=store, spy_ret_by_date=spy_ret)
+    incr = time.perf_counter() - t0
+    print(f"{len(histories)} tickers, up-to-date state: score_incremental {incr:.2f}s vs. score_stock {full:.2f}s")
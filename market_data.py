@@ -0,0 +1,333 @@
+"""
+market_data.py
+Market-data providers for the Murphy Screener.
+
+Every price/metadata request in murphy_screener.py goes through one
+provider object (see murphy_screener.set_provider / get_provider), so the
+whole scan pipeline can run against:
+
+- YFinanceProvider  — live Yahoo Finance data (the default).
+- ReplayProvider    — responses captured to disk earlier, replayed with no
+                      network. Give it an `upstream` provider to record
+                      anything missing while running live.
+- SyntheticProvider — deterministic random-walk OHLCV generated in memory,
+                      for fast benchmarks and regression runs.
+
+A provider answers three questions: history(tickers, start, end) returns a
+dict ticker -> raw OHLCV DataFrame (None when nothing came back), info(ticker)
+returns the yfinance-style metadata dict (sector / quoteType), and today()
+is the "as of" date the screener builds its lookback windows from — the real
+date for live data, a fixed date for replayed/synthetic data so runs are
+reproducible.
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+import datetime as dt
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+from price_cache import safe_filename, atomic_write_json
+from scan_engine import ThrottledError, CallTimeout
+
+try:
+    import pyarrow  # noqa: F401
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+
+def clean_ohlcv(df, min_rows):
+    """Normalize a single-ticker frame (flatten any MultiIndex columns,
+    title-case the OHLCV names, drop all-empty rows) and reject it if it has
+    fewer than `min_rows` bars."""
+    if df is None or df.empty:
+        return None
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns=str.title).dropna(how="all")
+    if len(df) < min_rows:
+        return None
+    return df
+
+
+def split_batch_frame(df, tickers, min_rows=1):
+    """Split the wide frame returned by a multi-ticker yf.download(...,
+    group_by="ticker") call back into one OHLCV DataFrame per ticker.
+    Tickers missing from the frame, or with fewer than `min_rows` real bars,
+    map to None."""
+    out = {t: None for t in tickers}
+    if df is None or df.empty:
+        return out
+    if not isinstance(df.columns, pd.MultiIndex):
+        # A one-ticker batch can come back flat on some yfinance versions.
+        if len(tickers) == 1:
+            out[tickers[0]] = clean_ohlcv(df.copy(), min_rows)
+        return out
+    level0 = set(df.columns.get_level_values(0))
+    for t in tickers:
+        if t not in level0:
+            continue
+        out[t] = clean_ohlcv(df[t].copy(), min_rows)
+    return out
+
+
+YF_TIMEOUT = 20                                      # seconds per HTTP request inside yfinance
+_THROTTLE_MARKERS = ("Too Many Requests", "Rate limited", "YFRateLimitError")
+_TIMEOUT_MARKERS = ("timed out", "Timeout")
+
+
+class _ErrorCapture(logging.Handler):
+    """yf.download doesn't raise for per-ticker failures, it logs them
+    after the batch. This handler, on the 'yfinance' logger, collects the
+    error lines logged on the current thread inside a capture() block, so
+    YFinanceProvider can tell a throttled or timed-out batch from symbols
+    that simply have no data."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self._local = threading.local()
+
+    def emit(self, record):
+        sink = getattr(self._local, "sink", None)
+        if sink is not None:
+            sink.append(record.getMessage())
+
+    @contextmanager
+    def capture(self):
+        self._local.sink = []
+        try:
+            yield self._local.sink
+        finally:
+            self._local.sink = None
+
+
+_yf_errors = _ErrorCapture()
+logging.getLogger("yfinance").addHandler(_yf_errors)
+
+
+def raise_for_transient(messages, what):
+    """Raise ThrottledError / CallTimeout if any captured yfinance error
+    message says the call was rate limited / timed out."""
+    text = " ".join(messages)
+    if any(m in text for m in _THROTTLE_MARKERS):
+        raise ThrottledError(f"{what}: rate limited by Yahoo Finance")
+    if any(m in text for m in _TIMEOUT_MARKERS):
+        raise CallTimeout(f"{what}: request timed out")
+
+
+class MarketDataProvider:
+    """Base class / interface. Subclasses implement history() and info()."""
+
+    name = "base"
+    # Whether murphy_screener should keep this provider's bars in the on-disk
+    # OHLCV cache. Offline providers are already local, so they opt out.
+    cacheable = False
+    # Whether requests hit a remote service and should go through the scan
+    # engine's rate limiter.
+    rate_limited = False
+
+    def today(self):
+        return dt.date.today()
+
+    def history(self, tickers, start, end):
+        raise NotImplementedError
+
+    def info(self, ticker):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live Yahoo Finance data via yfinance."""
+
+    name = "yfinance"
+    cacheable = True
+    rate_limited = True
+
+    def __init__(self):
+        if yf is None:
+            raise ImportError("Missing dependency. Run:  pip install yfinance pandas numpy")
+
+    def history(self, tickers, start, end):
+        """Raises ThrottledError / CallTimeout when Yahoo throttled or timed
+        out any part of the batch, so the caller's retry logic (see
+        scan_engine.CallController) can back off and re-request it."""
+        tickers = list(tickers)
+        with _yf_errors.capture() as errors:
+            df = yf.download(tickers, start=start, end=end, progress=False, auto_adjust=True,
+                             group_by="ticker", threads=True, timeout=YF_TIMEOUT)
+        raise_for_transient(errors, f"history for {len(tickers)} tickers")
+        return split_batch_frame(df, tickers)
+
+    def info(self, ticker):
+        try:
+            return yf.Ticker(ticker).info
+        except Exception as e:
+            raise_for_transient([type(e).__name__, str(e)], f"info for {ticker}")
+            raise
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves previously captured responses from `root`:
+        root/manifest.json          {"as_of": "YYYY-MM-DD"}
+        root/history/<TICKER>.parquet (or .pkl without pyarrow)
+        root/info/<TICKER>.json
+
+    With `upstream` set, anything not on disk yet is fetched from the
+    upstream provider and recorded (record mode); without it, missing
+    symbols simply come back empty, exactly like a dead ticker would."""
+
+    name = "replay"
+
+    def __init__(self, root, upstream=None):
+        self.root = root
+        self.upstream = upstream
+        self.ext = ".parquet" if _PARQUET else ".pkl"
+        os.makedirs(os.path.join(root, "history"), exist_ok=True)
+        os.makedirs(os.path.join(root, "info"), exist_ok=True)
+        manifest = os.path.join(root, "manifest.json")
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self._as_of = dt.date.fromisoformat(json.load(f)["as_of"])
+        else:
+            self._as_of = upstream.today() if upstream is not None else dt.date.today()
+            if upstream is not None:
+                atomic_write_json(manifest, {"as_of": self._as_of.isoformat()})
+
+    @property
+    def rate_limited(self):
+        return self.upstream is not None and self.upstream.rate_limited
+
+    def today(self):
+        return self._as_of
+
+    def _history_path(self, ticker):
+        return os.path.join(self.root, "history", safe_filename(ticker) + self.ext)
+
+    def _read(self, ticker):
+        path = self._history_path(ticker)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path) if _PARQUET else pd.read_pickle(path)
+
+    def _write(self, ticker, df):
+        path = self._history_path(ticker)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if _PARQUET:
+            df.to_parquet(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+
+    def history(self, tickers, start, end):
+        out, missing = {}, []
+        for t in tickers:
+            df = self._read(t)
+            if df is None:
+                missing.append(t)
+                continue
+            too_short = df.index[0] > pd.Timestamp(start) + pd.Timedelta(days=7)
+            if too_short and self.upstream is not None:
+                missing.append(t)  # recorded window too short for this request
+                continue
+            out[t] = df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+        if missing:
+            fetched = self.upstream.history(missing, start, end) if self.upstream is not None else {}
+            for t in missing:
+                df = fetched.get(t)
+                if df is not None:
+                    self._write(t, df)
+                out[t] = df
+        return {t: (df if df is not None and not df.empty else None) for t, df in out.items()}
+
+    def info(self, ticker):
+        path = os.path.join(self.root, "info", safe_filename(ticker) + ".json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        if self.upstream is None:
+            return {}
+        info = self.upstream.info(ticker)
+        keep = {k: info.get(k) for k in ("sector", "quoteType", "longName", "shortName") if k in info}
+        atomic_write_json(path, keep)
+        return keep
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Deterministic, in-memory random-walk OHLCV. Each ticker gets its own
+    seed (derived from the symbol and `seed`), drift and volatility, plus
+    occasional volume spikes, so every scoring branch gets exercised.
+    Tickers listed in `missing` return no data (to mimic delisted symbols)."""
+
+    name = "synthetic"
+
+    def __init__(self, seed=0, as_of=dt.date(2024, 6, 28), start=dt.date(2019, 1, 2), missing=()):
+        self.seed = seed
+        self.as_of = as_of
+        self.start = start
+        self.missing = {t.upper() for t in missing}
+        self._frames = {}
+
+    def today(self):
+        return self.as_of
+
+    def _rng(self, ticker):
+        return np.random.default_rng(zlib.crc32(f"{self.seed}:{ticker}".encode()))
+
+    def _index(self):
+        if "__index__" not in self._frames:
+            self._frames["__index__"] = pd.bdate_range(self.start, self.as_of - dt.timedelta(days=1), name="Date")
+        return self._frames["__index__"]
+
+    def _market_returns(self):
+        if "__market__" not in self._frames:
+            rng = self._rng("__market__")
+            self._frames["__market__"] = rng.normal(0.0004, 0.01, len(self._index()))
+        return self._frames["__market__"]
+
+    def _frame(self, ticker):
+        if ticker in self._frames:
+            return self._frames[ticker]
+        rng = self._rng(ticker)
+        idx = self._index()
+        n = len(idx)
+        # one common market factor, so betas vs. SPY come out realistic
+        beta = 1.0 if ticker == "SPY" else rng.uniform(0.4, 1.8)
+        vol = 0.002 if ticker == "SPY" else rng.uniform(0.006, 0.025)
+        rets = beta * self._market_returns() + rng.normal(rng.normal(0, 0.0004), vol, n)
+        close = rng.uniform(10, 400) * np.exp(np.cumsum(rets))
+        open_ = close * np.exp(rng.normal(0, vol / 2, n))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, vol / 2, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, vol / 2, n)))
+        volume = rng.lognormal(13, 0.35, n) * np.where(rng.random(n) < 0.03, rng.uniform(1.5, 4, n), 1.0)
+        df = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close,
+                           "Volume": np.round(volume)}, index=idx)
+        self._frames[ticker] = df
+        return df
+
+    def history(self, tickers, start, end):
+        out = {}
+        for t in tickers:
+            if t.upper() in self.missing:
+                out[t] = None
+                continue
+            df = self._frame(t)
+            df = df.loc[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+            out[t] = df.copy() if not df.empty else None
+        return out
+
+    def info(self, ticker):
+        sectors = ["Information Technology", "Financials", "Energy", "Health Care", "Industrials",
+                   "Consumer Discretionary", "Consumer Staples", "Materials", "Utilities",
+                   "Real Estate", "Communication Services"]
+        return {"sector": sectors[zlib.crc32(ticker.encode()) % len(sectors)], "quoteType": "EQUITY"}
@@ -0,0 +1,275 @@
+"""
+market_history.py
+Point-in-time sector leaderboard and intermarket regime for every past
+trading day.
+
+get_sector_leaderboard and get_intermarket_regime only describe today, so a
+backtest (or any historical signal study) can't know which sectors were
+leading, or whether the market was risk-on, on a past date. build_history
+computes both for every bar of the benchmark at once: each sector ETF's
+1w/1m/3m/12m relative strength vs SPY and its rank by the 1m/3m average,
+each intermarket market's trend direction, and the resulting regime. Every
+value is what the snapshot builders would have returned after that day's
+close — the same history windows, the same minimum-history rules — which
+tests/test_market_history.py checks against them on sampled dates.
+
+The result is a MarketHistory of compact arrays (dates x ETFs ranks as
+int8, trend codes as int8, ...); get_market_history keeps it in the on-disk
+ArrayStore, so looking up any date afterwards is a binary search, not a
+recomputation.
+"""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import murphy_screener as ms
+
+
+HISTORY_PERIOD_DAYS = 5 * 365       # default span of trading days covered
+TRENDS = ("unknown", "up", "down", "flat")  # trend codes stored in MarketHistory.trends
+MIN_ROWS = 210                      # DataContext.history's minimum: fewer bars => the symbol is missing
+
+_memo = {}  # (provider, as-of, period_days) -> MarketHistory, for this process
+
+
+def _sector_etfs():
+    """(etfs, sectors): each sector ETF once, with the first sector mapped to
+    it (get_sector_leaderboard's etf_to_sector)."""
+    etf_to_sector = {}
+    for sector, etf in ms.SECTOR_ETFS.items():
+        etf_to_sector.setdefault(etf, sector)
+    return list(etf_to_sector), list(etf_to_sector.values())
+
+
+def _as_of(df, dates, window_days):
+    """One symbol's closes seen from each of `dates` (int64 ns): the position
+    of the last bar on or before the date and how many bars the snapshot's
+    window (bars newer than date + 1 day - window_days) holds. A symbol the
+    snapshot would reject for a short history (< MIN_ROWS) gets count 0."""
+    if df is None:
+        return np.empty(0), np.full(len(dates), -1), np.zeros(len(dates), dtype=np.int64)
+    close = df["Close"].dropna()
+    own = ms.index_ns(close.index)
+    last = np.searchsorted(own, dates, side="right") - 1
+    first = np.searchsorted(own, dates + (1 - window_days) * 86_400 * 10**9, side="left")
+    count = last + 1 - first
+    return close.to_numpy(dtype=np.float64), last, np.where(count >= MIN_ROWS, count, 0)
+
+
+def _returns(close, last, count, n):
+    """close[last] / close[last - n + 1] - 1 wherever more than n bars are in
+    the window (the snapshot's closes[-1] / closes[-n]), else NaN."""
+    ok = count > n
+    out = np.full(len(last), np.nan)
+    out[ok] = close[last[ok]] / close[last[ok] - n + 1] - 1
+    return out
+
+
+def _trend_codes(close, last, count, window, compare_bars, threshold):
+    """trend_direction as of every date: codes into TRENDS and the % move of
+    the MA over `compare_bars` (NaN where unknown)."""
+    codes = np.zeros(len(last), dtype=np.int8)
+    pct = np.full(len(last), np.nan)
+    known = count > 0
+    if len(close) >= window:
+        ma = np.full(len(close), np.nan)
+        ma[window - 1:] = sliding_window_view(close, window).mean(axis=-1)
+        # the snapshot's window holds >= MIN_ROWS bars, so both MAs lie inside it once it has enough of them
+        enough = known & (count >= window + compare_bars)
+        prior = np.maximum(last - compare_bars, 0)
+        pct = np.where(enough, (ma[last] / ma[prior] - 1) * 100, np.where(known, 0.0, np.nan))
+        codes[known] = 3
+        codes[known & (pct > threshold * 100)] = 1
+        codes[known & (pct < -threshold * 100)] = 2
+    else:
+        codes[known] = 3
+        pct = np.where(known, 0.0, np.nan)
+    return codes, pct
+
+
+class MarketHistory:
+    """The sector leaderboard and intermarket regime as of every date in
+    `dates` (int64 ns, ascending — the benchmark's bars):
+
+    - ranks: (dates x etfs) int8, 1 = strongest, 0 = not ranked that day;
+    - perf: (dates x etfs x SECTOR_PERF_WINDOWS) float32 relative strength vs
+      SPY in percentage points; closes: (dates x etfs) float64;
+    - trends: (dates x INTERMARKET_TICKERS) int8 codes into TRENDS, and
+      trends_pct the MA moves behind them;
+    - regime: (dates,) int8 index into murphy_screener.REGIMES; risk_on: bool.
+    """
+
+    def __init__(self, dates, etfs, sectors, closes, perf, ranks, trends, trends_pct):
+        self.dates, self.etfs, self.sectors = dates, list(etfs), list(sectors)
+        self.closes, self.perf, self.ranks = closes, perf, ranks
+        self.trends, self.trends_pct = trends, trends_pct
+        names = np.array(TRENDS)[trends.astype(np.intp)]
+        markets = list(ms.INTERMARKET_TICKERS)
+        col = {k: names[:, markets.index(k)] for k in ("Bonds", "Stocks", "Commodities")}
+        self.regime = ms.classify_regime(col["Bonds"], col["Stocks"], col["Commodities"]).astype(np.int8)
+        self.risk_on = col["Stocks"] != "down"
+        self.n_sectors = (ranks > 0).sum(axis=1)
+
+    def rows(self, dates):
+        """Row of the last date on or before each of `dates` (-1 before the
+        history starts)."""
+        return np.searchsorted(self.dates, ms.index_ns(pd.DatetimeIndex(dates)), side="right") - 1
+
+    def row(self, date):
+        return int(self.rows([pd.Timestamp(date)])[0])
+
+    def leaderboard_on(self, date):
+        """get_sector_leaderboard as it read after `date`'s close."""
+        i = self.row(date)
+        if i < 0:
+            return {}
+        order = np.argsort(self.ranks[i])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            day_change = (self.closes[i] / self.closes[i - 1] - 1) * 100 if i > 0 else np.full(len(self.etfs), np.nan)
+        board = {}
+        for j in order:
+            if self.ranks[i, j] == 0:
+                continue
+            board[self.etfs[j]] = {
+                "rank": int(self.ranks[i, j]), "sector": self.sectors[j],
+                **{label: float(self.perf[i, j, k]) for k, (label, _) in enumerate(ms.SECTOR_PERF_WINDOWS)},
+                "price": float(self.closes[i, j]), "day_change_pct": float(day_change[j]),
+            }
+        return board
+
+    def regime_on(self, date):
+        """get_intermarket_regime as it read after `date`'s close."""
+        i = self.row(date)
+        trends, trends_pct = {}, {}
+        for k, name in enumerate(ms.INTERMARKET_TICKERS):
+            trends[name] = TRENDS[self.trends[i, k]] if i >= 0 else "unknown"
+            trends_pct[name] = None if trends[name] == "unknown" else round(float(self.trends_pct[i, k]), 2)
+        _, description, favored = ms.REGIMES[self.regime[i] if i >= 0 else len(ms.REGIMES) - 1]
+        fmt = {k.lower(): trends.get(k, "unknown") for k in ("Stocks", "Bonds", "Commodities", "Dollar")}
+        return {"trends": trends, "trends_pct": trends_pct, "description": description.format(**fmt),
+                "favored_sectors": list(favored), "risk_on": trends.get("Stocks") != "down"}
+
+    def sector_rank(self, dates, sector):
+        """(rank, n_sectors) arrays for `sector`'s ETF on each of `dates`;
+        rank is NaN where the sector has no ETF or it wasn't ranked."""
+        rows = self.rows(dates)
+        valid = rows >= 0
+        rank = np.full(len(rows), np.nan)
+        n_sectors = np.zeros(len(rows), dtype=np.int64)
+        n_sectors[valid] = self.n_sectors[rows[valid]]
+        etf = ms.SECTOR_ETFS.get(sector)
+        if etf in self.etfs:
+            r = np.zeros(len(rows), dtype=np.int64)
+            r[valid] = self.ranks[rows[valid], self.etfs.index(etf)]
+            rank = np.where(r > 0, r, np.nan)
+        return rank, n_sectors
+
+    def regime_arrays(self, dates, sector):
+        """(risk_on, favored) bool arrays on each of `dates`: favored = the
+        regime of the day favors `sector`. Dates before the history read like
+        a snapshot with no market data (risk-on, nothing favored)."""
+        rows = self.rows(dates)
+        valid = rows >= 0
+        favored_codes = [k for k, (_, _, favored) in enumerate(ms.REGIMES) if sector in favored]
+        risk_on = np.ones(len(rows), dtype=bool)
+        favored = np.zeros(len(rows), dtype=bool)
+        risk_on[valid] = self.risk_on[rows[valid]]
+        favored[valid] = np.isin(self.regime[rows[valid]], favored_codes)
+        return risk_on, favored
+
+    def to_arrays(self):
+        return {"dates": self.dates, "etfs": np.array(self.etfs), "sectors": np.array(self.sectors),
+                "closes": self.closes, "perf": self.perf, "ranks": self.ranks,
+                "trends": self.trends, "trends_pct": self.trends_pct}
+
+    @classmethod
+    def from_arrays(cls, a):
+        return cls(a["dates"], a["etfs"].tolist(), a["sectors"].tolist(), a["closes"], a["perf"], a["ranks"],
+                   a["trends"], a["trends_pct"])
+
+
+def build_history(period_days=HISTORY_PERIOD_DAYS, ctx=None):
+    """Compute a MarketHistory over the benchmark's bars of the last
+    `period_days` (plus the warm-up the snapshot windows need). Returns None
+    without benchmark data."""
+    sector_window = int(ms.SECTOR_PERIOD_DAYS * 1.6)   # DataContext.history's calendar-day windows
+    regime_window = int(ms.REGIME_PERIOD_DAYS * 1.6)
+    etfs, sectors = _sector_etfs()
+    markets = list(ms.INTERMARKET_TICKERS.values())
+    fetch_days = period_days + ms.SECTOR_PERIOD_DAYS
+    ctx = ctx or ms.DataContext(period_days=0)
+    ctx.prefetch([ms.BENCHMARK, *etfs, *markets], fetch_days)
+    frames = {t: ctx.history(t, period_days=fetch_days, min_rows=1) for t in [ms.BENCHMARK, *etfs, *markets]}
+    spy = frames[ms.BENCHMARK]
+    if spy is None:
+        return None
+    start = pd.Timestamp(ms.get_provider().today() - dt.timedelta(days=int(period_days * 1.6)))
+    dates = ms.index_ns(spy.index[spy.index >= start])
+
+    # --- sector leaderboard: relative strength vs SPY, ranked by the 1m/3m average
+    spy_close, spy_last, spy_count = _as_of(spy, dates, sector_window)
+    perf = np.full((len(dates), len(etfs), len(ms.SECTOR_PERF_WINDOWS)), np.nan)
+    closes = np.full((len(dates), len(etfs)), np.nan)
+    ranked = np.zeros((len(dates), len(etfs)), dtype=bool)
+    for j, etf in enumerate(etfs):
+        close, last, count = _as_of(frames[etf], dates, sector_window)
+        ranked[:, j] = (count >= 2) & (spy_count > 0)
+        closes[ranked[:, j], j] = close[last[ranked[:, j]]]
+        for k, (_, n) in enumerate(ms.SECTOR_PERF_WINDOWS):
+            spy_ret = _returns(spy_close, spy_last, spy_count, n)
+            perf[:, j, k] = (_returns(close, last, count, n) - spy_ret) * 100
+    labels = [label for label, _ in ms.SECTOR_PERF_WINDOWS]
+    medium = perf[:, :, [labels.index("1m"), labels.index("3m")]]
+    with np.errstate(invalid="ignore"):
+        key = np.nansum(medium, axis=2) / (~np.isnan(medium)).sum(axis=2)  # nanmean, NaN when both are
+    key = np.where(ranked, key, np.nan)
+    order = np.argsort(-key, axis=1, kind="stable")  # NaN keys sort last, ties keep ETF order (like sorted())
+    ranks = np.zeros(order.shape, dtype=np.int8)
+    np.put_along_axis(ranks, order, np.arange(1, len(etfs) + 1, dtype=np.int8)[None, :], axis=1)
+    ranks[~ranked] = 0
+
+    # --- intermarket trends -> regime
+    trends = np.zeros((len(dates), len(markets)), dtype=np.int8)
+    trends_pct = np.full((len(dates), len(markets)), np.nan)
+    for k, ticker in enumerate(markets):
+        close, last, count = _as_of(frames[ticker], dates, regime_window)
+        trends[:, k], trends_pct[:, k] = _trend_codes(close, last, count, ms.TREND_MA_WINDOW,
+                                                      ms.TREND_COMPARE_BARS, ms.TREND_THRESHOLD)
+
+    return MarketHistory(dates, etfs, sectors, closes, perf.astype(np.float32), ranks, trends,
+                         trends_pct.astype(np.float32))
+
+
+def get_market_history(period_days=HISTORY_PERIOD_DAYS, ctx=None, refresh=False):
+    """build_history, cached for the data day: in memory for this process
+    and, with the on-disk cache enabled, in the ArrayStore — so only the
+    first call of the day pays for the computation."""
+    provider = ms.get_provider()
+    key = {"provider": provider.name, "as_of": provider.today().isoformat(), "period_days": period_days}
+    memo_key = tuple(key.values())
+    if not refresh and memo_key in _memo:
+        return _memo[memo_key]
+    store = ms.get_array_store()
+    arrays = store.load("market_history", key) if store is not None and not refresh else None
+    if arrays is not None:
+        history = MarketHistory.from_arrays(arrays)
+    else:
+        history = build_history(period_days, ctx)
+        if history is not None and store is not None:
+            store.save("market_history", key, history.to_arrays())
+    _memo[memo_key] = history
+    return history
+
+
+if __name__ == "__main__":
+    import time
+    from market_data import SyntheticProvider
+
+    provider = SyntheticProvider()
+    ms.set_provider(provider)
+    t0 = time.perf_counter()
+    history = build_history(period_days=4 * 365)
+    print(f"Built {len(history.dates)} days x {len(history.etfs)} sector ETFs in {time.perf_counter() - t0:.2f}s")
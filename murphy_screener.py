@@ -12,6 +12,7 @@ here.
 
 REQUIREMENTS (run locally, not in a sandboxed/offline environment):
     pip install yfinance pandas numpy
+(or pass --replay DIR / --synthetic to run offline — see market_data.py)
 
 CLI USAGE:
     python murphy_screener.py                     # scans the bundled S&P 500 list
@@ -23,15 +24,15 @@ CLI USAGE:
 import os
 import sys
 import argparse
+import bisect
+import hashlib
+import heapq
+import itertools
+import time
 import datetime as dt
 import numpy as np
 import pandas as pd
-
-try:
-    import yfinance as yf
-except ImportError:
-    print("Missing dependency. Run:  pip install yfinance pandas numpy")
-    sys.exit(1)
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 # ---------------------------------------------------------------------------
@@ -43,8 +44,31 @@ VOLUME_SPIKE_MULT = 2.0      # today's volume vs 20d avg volume to count as "unu
 RECENT_VOLUME_SPIKE_MULT = 1.5   # today OR yesterday's volume vs 20d avg — a separate, more sensitive flag/filter
 NEAR_MA50_PCT = 0.03         # "hugging the 50MA" = within 3%
 BREAKOUT_LOOKBACK = 20       # bars used to define "recent swing low" for stop-loss
+BATCH_CHUNK_SIZE = 100       # tickers per provider round-trip in fetch_history_batch
+PRICE_CACHE_ENABLED = True   # keep downloaded OHLCV on disk and only fetch new bars (see price_cache.py)
+SIGNAL_HISTORY_ENABLED = True  # record every scan's results in the signal history (see signal_store.py)
+SCORE_MEMO_ENABLED = True    # reuse in-process scores whose inputs haven't changed (see score_memo.py)
+LIVE_TABLE_SECONDS = 10      # how often the CLI reprints the running top stocks during a long scan
 
 from sp_universe_data import SP500_DATA, SP400_DATA, SP600_DATA, EXTRA_TICKERS_DATA
+from price_cache import ArrayStore, PriceCache, MetadataCache, DeadTickerRegistry, PriorityStore
+from scan_journal import ScanJournal, ScanSnapshot
+from market_data import YFinanceProvider, ReplayProvider, SyntheticProvider, clean_ohlcv
+from signal_store import SignalStore
+from score_memo import ScoreMemo, array_fingerprint, data_fingerprint
+from scan_engine import (CONTROLLER, DEFAULT_JOBS, MAX_JOBS, ProviderError, SingleFlight,
+                         chunked, run_pool)
+
+_price_cache = None
+_metadata_cache = None
+_dead_registry = None
+_priority_store = None
+_array_store = None
+_signal_store = None
+_score_memo = None
+_state_store = None
+_metadata_memo = {}  # ticker -> metadata entry, for this process
+_provider = None
 
 # Merge all universes into one lookup (ticker -> (name, sector)).
 # If a ticker somehow appears in more than one list, the S&P 500 entry wins.
@@ -95,6 +119,13 @@ INTERMARKET_TICKERS = {
 
 BENCHMARK = "SPY"
 
+REGIME_PERIOD_DAYS = 250    # history window behind the intermarket trend calls
+TREND_MA_WINDOW = 60        # trend_direction: slope of this SMA...
+TREND_COMPARE_BARS = 20     # ...over this many bars...
+TREND_THRESHOLD = 0.005     # ...must move more than this to read "up" / "down"
+SECTOR_PERIOD_DAYS = 280    # history window behind the sector leaderboard
+SECTOR_PERF_WINDOWS = (("1w", 5), ("1m", 21), ("3m", 63), ("12m", 252))  # relative-strength lookbacks, in bars
+
 # Live market snapshot: FX, individual commodities, bond proxy — shown on the
 # dashboard home screen as plain price + daily % change (not part of scoring).
 MARKET_SNAPSHOT_TICKERS = {
@@ -111,16 +142,282 @@ MARKET_SNAPSHOT_TICKERS = {
 # DATA FETCH
 # ---------------------------------------------------------------------------
 
+def get_provider():
+    """The market-data provider every fetch goes through (see market_data.py).
+    Defaults to live yfinance data."""
+    global _provider
+    if _provider is None:
+        try:
+            _provider = YFinanceProvider()
+        except ImportError as e:
+            print(e)
+            sys.exit(1)
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the market-data provider, e.g. to a ReplayProvider or
+    SyntheticProvider for offline, deterministic runs."""
+    global _provider, _state_store
+    _provider = provider
+    _metadata_memo.clear()
+    _state_store = None  # in-memory indicator state belongs to the previous provider
+
+
 def fetch_history(ticker, period_days=LOOKBACK_DAYS):
-    end = dt.date.today()
-    start = end - dt.timedelta(days=int(period_days * 1.6))  # buffer for weekends/holidays
-    df = yf.download(ticker, start=start, end=end, progress=False, auto_adjust=True)
-    if df is None or df.empty or len(df) < 210:
+    return fetch_history_batch([ticker], period_days=period_days)[ticker]
+
+
+def call_provider(fn, *args, tokens=1):
+    """Call a provider method; remote (rate-limited) providers go through
+    scan_engine's CONTROLLER — rate limiter, retries with backoff, deadline,
+    circuit breaker, adaptive concurrency — which raises ProviderError when
+    it gives up on a transient failure. Other errors (e.g. a bad symbol's
+    .info) are raised as is, without retries."""
+    if get_provider().rate_limited:
+        return CONTROLLER.call(fn, *args, tokens=tokens)
+    return fn(*args)
+
+
+def _download_chunked(tickers, start, end, chunk_size, on_chunk=None, failed=None):
+    """Download [start, end) for `tickers`, one provider call per chunk, and
+    return a dict ticker -> raw OHLCV frame (None if nothing came back).
+    Tickers whose chunk failed outright (after retries) are added to the
+    `failed` set, if given, so callers can tell them from empty symbols."""
+    provider = get_provider()
+    results = {}
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        try:
+            fetched = call_provider(provider.history, chunk, start, end, tokens=len(chunk))
+        except Exception:
+            fetched = {}
+            if failed is not None:
+                failed.update(chunk)
+        results.update({t: clean_ohlcv(fetched.get(t), 1) for t in chunk})
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+    return results
+
+
+def get_price_cache():
+    """The shared on-disk OHLCV cache, or None when PRICE_CACHE_ENABLED is off
+    (or the active provider is an offline one that doesn't need caching)."""
+    global _price_cache
+    if not PRICE_CACHE_ENABLED or not get_provider().cacheable:
+        return None
+    if _price_cache is None:
+        _price_cache = PriceCache()
+    return _price_cache
+
+
+def get_metadata_cache():
+    """The shared on-disk sector/ETF metadata cache, enabled under the same
+    conditions as get_price_cache."""
+    global _metadata_cache
+    if not PRICE_CACHE_ENABLED or not get_provider().cacheable:
+        return None
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache()
+    return _metadata_cache
+
+
+def get_dead_registry():
+    """The shared DeadTickerRegistry, enabled under the same conditions as
+    get_price_cache."""
+    global _dead_registry
+    if not PRICE_CACHE_ENABLED or not get_provider().cacheable:
+        return None
+    if _dead_registry is None:
+        _dead_registry = DeadTickerRegistry()
+    return _dead_registry
+
+
+def get_priority_store():
+    """The shared PriorityStore (scan-scheduling signals), enabled under the
+    same conditions as get_price_cache."""
+    global _priority_store
+    if not PRICE_CACHE_ENABLED or not get_provider().cacheable:
+        return None
+    if _priority_store is None:
+        _priority_store = PriorityStore()
+    return _priority_store
+
+
+def get_array_store():
+    """The shared ArrayStore (derived NumPy tables), enabled under the same
+    conditions as get_price_cache."""
+    global _array_store
+    if not PRICE_CACHE_ENABLED or not get_provider().cacheable:
+        return None
+    if _array_store is None:
+        _array_store = ArrayStore()
+    return _array_store
+
+
+def get_signal_store():
+    """The shared SignalStore (scan history), or None when
+    SIGNAL_HISTORY_ENABLED is off or the provider is an offline one whose
+    results shouldn't mix with real scans."""
+    global _signal_store
+    if not SIGNAL_HISTORY_ENABLED or not get_provider().cacheable:
         return None
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    df = df.rename(columns=str.title)
-    return df
+    if _signal_store is None:
+        _signal_store = SignalStore()
+    return _signal_store
+
+
+def get_score_memo():
+    """The process-wide ScoreMemo (in memory; survives Streamlit reruns), or
+    None when SCORE_MEMO_ENABLED is off."""
+    global _score_memo
+    if not SCORE_MEMO_ENABLED:
+        return None
+    if _score_memo is None:
+        _score_memo = ScoreMemo()
+    return _score_memo
+
+
+def disk_cache_enabled():
+    """Whether scans keep anything under the cache directory: the same
+    conditions as get_price_cache (PRICE_CACHE_ENABLED, cacheable provider)."""
+    return PRICE_CACHE_ENABLED and get_provider().cacheable
+
+
+def get_state_store():
+    """Where --incremental keeps each ticker's IndicatorState: on disk under
+    state/<provider name> when disk_cache_enabled(), otherwise in memory for
+    this process (and provider), so an offline or --no-cache scan leaves
+    nothing behind for a later live scan to pick up."""
+    global _state_store
+    import indicator_state
+    if disk_cache_enabled():
+        return indicator_state.StateStore(namespace=get_provider().name)
+    if _state_store is None:
+        _state_store = indicator_state.MemoryStateStore()
+    return _state_store
+
+
+def get_scan_snapshot(name):
+    """The ScanSnapshot for scans named `name` ("cli", "dashboard"), used by
+    the scan-to-scan diff, or None unless disk_cache_enabled()."""
+    if not disk_cache_enabled():
+        return None
+    return ScanSnapshot(name)
+
+
+def open_scan_journal(key, name, resume=False):
+    """A ScanJournal checkpointing the scan named `name`, or None when
+    nothing should be written under the cache directory (disk_cache_enabled)
+    — unless `resume` was asked for, which always journals so the scan can
+    be resumed again."""
+    if not resume and not disk_cache_enabled():
+        return None
+    return ScanJournal(key, name=name, resume=resume)
+
+
+def split_dead_tickers(tickers):
+    """Split `tickers` into (live, dead) using the dead-ticker registry;
+    symbols due for their periodic re-probe count as live."""
+    registry = get_dead_registry()
+    if registry is None:
+        return list(tickers), []
+    live, dead = [], []
+    for t in tickers:
+        (dead if registry.is_dead(t) else live).append(t)
+    return live, dead
+
+
+def _load_histories(tickers, start, end, chunk_size, on_chunk=None, failed=None):
+    """Return ticker -> raw OHLCV history covering [start, end), going through
+    the on-disk cache: entries already refreshed today cost no network at all,
+    older entries only download the bars since their last cached date, and
+    only misses (or entries whose adjusted prices have since changed, e.g.
+    after a dividend or split) download the whole window. Tickers left with
+    nothing because their download failed go into `failed` (see
+    _download_chunked)."""
+    cache = get_price_cache()
+    if cache is None:
+        return _download_chunked(tickers, start, end, chunk_size, on_chunk, failed)
+
+    today = get_provider().today().isoformat()
+    out, cached, full = {}, {}, []
+    incremental = {}  # last cached date -> tickers needing bars after it
+    for t in tickers:
+        df, meta = cache.load(t)
+        if df is None or dt.date.fromisoformat(meta["covered_from"]) > start:
+            full.append(t)
+        elif meta["refreshed"] == today:
+            out[t] = df
+        else:
+            cached[t] = (df, meta)
+            incremental.setdefault(df.index[-1].date(), []).append(t)
+    if on_chunk is not None and out:
+        on_chunk(len(out))
+
+    for last_date, group in incremental.items():
+        # Re-request the last cached bar too, to detect re-adjusted history.
+        fresh = _download_chunked(group, last_date, end, chunk_size, on_chunk)
+        for t in group:
+            df, meta = cached[t]
+            new = fresh.get(t)
+            if new is None:
+                out[t] = df  # provider hiccup: serve the stale copy, retry next run
+                continue
+            overlap = new.index.intersection(df.index)
+            if len(overlap) and not np.allclose(new.loc[overlap, "Close"], df.loc[overlap, "Close"],
+                                                rtol=1e-4, equal_nan=True):
+                full.append(t)
+                continue
+            if len(new.index.difference(df.index)) == 0:
+                cache.mark_refreshed(t, meta)
+                out[t] = df
+                continue
+            merged = pd.concat([df[~df.index.isin(new.index)], new[df.columns.intersection(new.columns)]])
+            cache.save(t, merged, meta["covered_from"])
+            out[t] = merged.sort_index()
+
+    if full:
+        fresh = _download_chunked(full, start, end, chunk_size, on_chunk, failed)
+        for t, df in fresh.items():
+            if df is not None:
+                cache.save(t, df, start)
+            out[t] = df
+    return out
+
+
+def _fetch_window(tickers, period_days, min_rows, chunk_size=BATCH_CHUNK_SIZE, progress=None, failed=None):
+    tickers = list(dict.fromkeys(tickers))  # de-duplicate, keep order
+    end = get_provider().today()
+    start = end - dt.timedelta(days=int(period_days * 1.6))  # buffer for weekends/holidays
+    done = [0]
+
+    def on_chunk(n):
+        done[0] += n
+        if progress is not None:
+            progress(min(done[0], len(tickers)), len(tickers))
+
+    raw = _load_histories(tickers, start, end, max(1, int(chunk_size)), on_chunk, failed)
+    results = {}
+    for t in tickers:
+        df = raw.get(t)
+        if df is not None:
+            df = df.loc[df.index >= pd.Timestamp(start)]
+        results[t] = clean_ohlcv(df.copy() if df is not None else None, min_rows)
+    return results
+
+
+def fetch_history_batch(tickers, period_days=LOOKBACK_DAYS, chunk_size=BATCH_CHUNK_SIZE, progress=None,
+                        failed=None):
+    """Batched fetch_history: download `tickers` in chunks of `chunk_size`
+    symbols per provider round-trip (instead of one request per ticker)
+    and return a dict ticker -> OHLCV DataFrame (or None if there wasn't
+    enough data, with the same 210-bar rejection as fetch_history).
+    `progress`, if given, is called as progress(done, total) as tickers are
+    served from the on-disk cache or downloaded. Pass a set as `failed` to
+    collect the tickers that are None because the download itself failed
+    (throttling, timeouts) rather than because the symbol had no data."""
+    return _fetch_window(tickers, period_days, 210, chunk_size, progress, failed)
 
 
 def fetch_recent_quote(ticker, period_days=40):
@@ -129,42 +426,104 @@ def fetch_recent_quote(ticker, period_days=40):
     52-week calculations), this only needs 2 rows — used for quick live
     quotes like the market snapshot, where requesting a short window but
     then rejecting it for being 'too short' would always return nothing."""
-    end = dt.date.today()
-    start = end - dt.timedelta(days=int(period_days * 1.6))
-    df = yf.download(ticker, start=start, end=end, progress=False, auto_adjust=True)
-    if df is None or df.empty or len(df) < 2:
-        return None
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    df = df.rename(columns=str.title)
-    return df
+    return _fetch_window([ticker], period_days, 2)[ticker]
+
+
+class DataContext:
+    """Per-run store for the market symbols every scan reads (SPY, the
+    intermarket proxies, the sector ETFs, the snapshot quotes).
+
+    Each symbol is fetched once, at the widest window asked for (never less
+    than `period_days`), and every consumer gets its own window sliced from
+    that copy — exactly what fetch_history / fetch_recent_quote would have
+    returned. prefetch() batches all the symbols it is given into one
+    provider round-trip, and concurrent requests for a symbol already being
+    fetched wait for that download instead of starting another (see
+    scan_engine.SingleFlight). Create one per scan (the dashboard keeps one
+    per few minutes) and pass it to get_intermarket_regime,
+    get_sector_leaderboard, get_market_snapshot and
+    get_normalized_comparison."""
+
+    def __init__(self, period_days=LOOKBACK_DAYS):
+        self.period_days = period_days
+        self.fetches = 0  # provider fetches issued, for diagnostics
+        self._raw = {}    # ticker -> (period_days fetched, OHLCV frame or None)
+        self._flight = SingleFlight()
+
+    def _covers(self, ticker, period_days):
+        held = self._raw.get(ticker)
+        return held is not None and held[0] >= period_days
+
+    def _fetch(self, tickers, period_days):
+        self.fetches += 1
+        frames = _fetch_window(tickers, period_days, 1)
+        for t in tickers:
+            self._raw[t] = (period_days, frames.get(t))
+
+    def prefetch(self, tickers, period_days=0):
+        """Make sure every ticker is held at >= period_days, downloading the
+        missing ones together in one batch."""
+        period = max(period_days, self.period_days)
+        # A second pass covers keys another thread was fetching at a narrower window.
+        for _ in range(2):
+            need = [t for t in dict.fromkeys(tickers) if not self._covers(t, period)]
+            if not need:
+                return
+            self._flight.run(need, lambda claimed: self._fetch(claimed, period))
+
+    def history(self, ticker, period_days=LOOKBACK_DAYS, min_rows=210):
+        """Same result as fetch_history(ticker, period_days)."""
+        self.prefetch([ticker], period_days)
+        df = self._raw.get(ticker, (0, None))[1]
+        if df is None:
+            return None
+        start = get_provider().today() - dt.timedelta(days=int(period_days * 1.6))
+        return clean_ohlcv(df.loc[df.index >= pd.Timestamp(start)].copy(), min_rows)
+
+    def recent_quote(self, ticker, period_days=40):
+        """Same result as fetch_recent_quote(ticker, period_days)."""
+        return self.history(ticker, period_days, min_rows=2)
+
 
+def market_symbols(include_snapshot=False):
+    """Every market symbol a scan's prologue reads: the benchmark, the
+    intermarket proxies and the sector ETFs (plus the snapshot quotes shown
+    on the dashboard, when asked)."""
+    symbols = [BENCHMARK, *INTERMARKET_TICKERS.values(), *SECTOR_ETFS.values()]
+    if include_snapshot:
+        symbols += MARKET_SNAPSHOT_TICKERS.values()
+    return list(dict.fromkeys(symbols))
 
-def get_market_snapshot():
+
+def get_market_snapshot(ctx=None):
     """Fetch live price + today's % change for FX/commodities/bond proxy
     tickers, for display on the dashboard home screen."""
+    ctx = ctx or DataContext(period_days=0)
+    ctx.prefetch(MARKET_SNAPSHOT_TICKERS.values(), 40)
+    closes, lengths = close_panel([ctx.recent_quote(ticker) for ticker in MARKET_SNAPSHOT_TICKERS.values()])
     snapshot = {}
-    for label, ticker in MARKET_SNAPSHOT_TICKERS.items():
-        df = fetch_recent_quote(ticker)
-        close = df["Close"].dropna() if df is not None else None
-        if close is None or len(close) < 2:
+    for j, (label, ticker) in enumerate(MARKET_SNAPSHOT_TICKERS.items()):
+        if lengths[j] < 2:
             snapshot[label] = {"ticker": ticker, "price": None, "day_change_pct": None}
             continue
-        price = float(close.iloc[-1])
-        day_change_pct = float((close.iloc[-1] / close.iloc[-2] - 1) * 100)
+        price = float(closes[-1, j])
+        day_change_pct = float((closes[-1, j] / closes[-2, j] - 1) * 100)
         snapshot[label] = {"ticker": ticker, "price": price, "day_change_pct": day_change_pct}
     return snapshot
 
 
-def get_normalized_comparison(tickers, lookback=252):
+def get_normalized_comparison(tickers, lookback=252, ctx=None):
     """Build a normalized (rebased to 100) comparison DataFrame for an
     arbitrary set of tickers, for a multi-line chart (e.g. SPY vs.
     commodities/bonds/each sector). `tickers` is a dict label -> ticker.
     Returns a DataFrame indexed by date, one column per label that had
     enough data, or None if nothing could be built."""
+    period_days = max(lookback + 30, LOOKBACK_DAYS)
+    ctx = ctx or DataContext(period_days=0)
+    ctx.prefetch(tickers.values(), period_days)
     series = {}
     for label, ticker in tickers.items():
-        df = fetch_history(ticker, period_days=max(lookback + 30, LOOKBACK_DAYS))
+        df = ctx.history(ticker, period_days=period_days)
         if df is None:
             continue
         close = df["Close"].tail(lookback)
@@ -186,11 +545,13 @@ UNIVERSE_MAP = {
 }
 
 
-def get_universe_tickers(universe="sp500", n=None):
+def get_universe_tickers(universe="sp500", n=None, skip_dead=True):
     """Return ticker symbols for a given universe.
     universe: "sp500" | "sp400" | "sp600" | "watchlist" (curated extra ADRs/tickers)
               | "all" (S&P 500 + 400 + 600 + the watchlist, combined)
     Pass n to get only the first n tickers (quick partial scan); omit n for the full list.
+    Symbols the dead-ticker registry knows return no data are left out
+    (pass skip_dead=False to keep them).
     """
     if universe == "all":
         combined = (list(SP500_DATA.keys()) + list(SP400_DATA.keys()) +
@@ -204,6 +565,8 @@ def get_universe_tickers(universe="sp500", n=None):
     else:
         table = UNIVERSE_MAP.get(universe, SP500_DATA)
         all_tickers = list(table.keys())
+    if skip_dead:
+        all_tickers = split_dead_tickers(all_tickers)[0]
     if n is None:
         return all_tickers
     n = max(1, min(int(n), len(all_tickers)))
@@ -237,34 +600,57 @@ def get_sp500_tickers(n=None):
     return get_universe_tickers("sp500", n)
 
 
+def _provider_info(ticker):
+    return call_provider(get_provider().info, ticker)
+
+
+def get_metadata(ticker):
+    """Sector and quoteType for a ticker from a single provider .info call,
+    which both get_sector and is_etf read. Results are memoized for the
+    process and kept in the on-disk MetadataCache (shared by the CLI and the
+    dashboard); a failed or empty lookup is cached as such (ok=False), so a
+    bad symbol isn't re-queried on every scan. A lookup that failed for a
+    transient reason (throttled, timed out — see call_provider) is not
+    cached at all."""
+    entry = _metadata_memo.get(ticker)
+    if entry is not None:
+        return entry
+    cache = get_metadata_cache()
+    entry = cache.load(ticker) if cache is not None else None
+    if entry is None:
+        try:
+            info = _provider_info(ticker) or {}
+            ok = "sector" in info or "quoteType" in info
+            entry = {"sector": info.get("sector", "Unknown"), "quoteType": info.get("quoteType") or "", "ok": ok}
+        except ProviderError:
+            return {"sector": "Unknown", "quoteType": "", "ok": False}
+        except Exception:
+            entry = {"sector": "Unknown", "quoteType": "", "ok": False}
+        if cache is not None:
+            entry = cache.save(ticker, entry["sector"], entry["quoteType"], ok=entry["ok"])
+    _metadata_memo[ticker] = entry
+    return entry
+
+
 def get_sector(ticker):
     """Look up sector for a ticker. Prefers the embedded S&P 500/400/600 map
-    (fast, free, no rate limits); falls back to a live yfinance lookup if the
-    ticker isn't in that map (e.g. a non-US-index symbol or an ETF)."""
+    (fast, free, no rate limits); falls back to a (cached) yfinance lookup if
+    the ticker isn't in that map (e.g. a non-US-index symbol or an ETF)."""
     if ticker in ALL_UNIVERSE_DATA:
         return ALL_UNIVERSE_DATA[ticker][1]
-
-    try:
-        info = yf.Ticker(ticker).info
-        return info.get("sector", "Unknown")
-    except Exception:
-        return "Unknown"
+    return get_metadata(ticker)["sector"]
 
 
 def is_etf(ticker):
     """Classify a ticker as an ETF or an individual stock. Any ticker found
     in our S&P 500/400/600 constituent data is by definition a stock. For
     anything else, check a known-ETF list first (fast, no API call), then
-    fall back to a live yfinance quoteType lookup."""
+    fall back to a (cached) yfinance quoteType lookup."""
     if ticker in ALL_UNIVERSE_DATA:
         return False
     if ticker in KNOWN_ETFS:
         return True
-    try:
-        info = yf.Ticker(ticker).info
-        return info.get("quoteType", "").upper() == "ETF"
-    except Exception:
-        return False
+    return str(get_metadata(ticker)["quoteType"]).upper() == "ETF"
 
 
 # ---------------------------------------------------------------------------
@@ -284,6 +670,57 @@ def bollinger_bands(close, window=20, num_std=2):
     return upper, mid, lower, width
 
 
+def _quantile_position(window, q):
+    """Index of the lower order statistic and the interpolation fraction for
+    pandas' default ("linear") rolling quantile over a full window."""
+    pos = q * (window - 1)
+    lo = int(pos)
+    return lo, pos - lo
+
+
+def rolling_quantile(series, window=120, q=0.2):
+    """Same values as series.rolling(window).quantile(q), computed with a
+    sorted window: each bar is inserted and the bar leaving the window
+    removed by binary search, so the whole series costs O(n log w)
+    comparisons instead of re-ranking every window. As with pandas, a window
+    containing any NaN gives NaN."""
+    values = pd.Series(series, dtype=float).tolist()
+    lo, frac = _quantile_position(window, q)
+    out = [np.nan] * len(values)
+    win, nans = [], 0
+    for i, x in enumerate(values):
+        if x != x:
+            nans += 1
+        else:
+            bisect.insort(win, x)
+        if i >= window:
+            old = values[i - window]
+            if old != old:
+                nans -= 1
+            else:
+                del win[bisect.bisect_left(win, old)]
+        if i >= window - 1 and nans == 0:
+            out[i] = win[lo] if frac == 0 else win[lo] + (win[lo + 1] - win[lo]) * frac
+    index = series.index if isinstance(series, pd.Series) else None
+    return pd.Series(out, index=index)
+
+
+def rolling_quantile_last(values, window=120, q=0.2):
+    """Only the last value of rolling_quantile — all a live scan needs.
+    Selects the two order statistics of the final window with np.partition
+    (O(w)) instead of building the whole rolling series. A 2-D array is
+    treated as one series per column and returns one value per column."""
+    arr = np.asarray(values, dtype=float)
+    if len(arr) < window:
+        return np.nan if arr.ndim == 1 else np.full(arr.shape[1:], np.nan)
+    tail = arr[-window:]
+    lo, frac = _quantile_position(window, q)
+    part = np.partition(tail, [lo, lo + 1] if frac else lo, axis=0)
+    out = part[lo] if frac == 0 else part[lo] + (part[lo + 1] - part[lo]) * frac
+    out = np.where(np.isnan(tail).any(axis=0), np.nan, out)
+    return float(out) if arr.ndim == 1 else out
+
+
 def rsi(close, window=14):
     delta = close.diff()
     gain = delta.clip(lower=0)
@@ -320,66 +757,184 @@ def compute_beta(stock_close, spy_close, window=252):
     return float(combined["stock"].cov(combined["spy"]) / var)
 
 
+def index_ns(index):
+    """A DatetimeIndex as int64 nanoseconds whatever its resolution (pandas
+    2+ may hand back [us] or [s] indexes, whose .asi8 is in other units)."""
+    return np.asarray(index, dtype="datetime64[ns]").view(np.int64)
+
+
+def benchmark_returns(spy_close):
+    """SPY's daily returns as (int64 dates, returns), NaNs dropped — the
+    shared side of every beta. Compute once per scan and pass it to
+    beta_matrix / rolling_beta instead of a close series."""
+    values = spy_close.to_numpy(dtype=np.float64)
+    dates = index_ns(spy_close.index)[1:]
+    ret = values[1:] / values[:-1] - 1
+    keep = ~np.isnan(ret)
+    return dates[keep], ret[keep]
+
+
+def align_returns(closes, spy_dates):
+    """(len(spy_dates) x len(closes)) matrix of each ticker's daily returns
+    placed on SPY's return dates (compute_beta's inner join); NaN wherever a
+    ticker has no return on that date. `closes` maps ticker -> close Series
+    (an OHLCV DataFrame works too)."""
+    y = np.full((len(spy_dates), len(closes)), np.nan)
+    for j, close in enumerate(closes.values()):
+        if isinstance(close, pd.DataFrame):
+            close = close["Close"]
+        values = close.to_numpy(dtype=np.float64)
+        ret = values[1:] / values[:-1] - 1
+        dates = index_ns(close.index)[1:]
+        pos = np.searchsorted(spy_dates, dates)
+        hit = (pos < len(spy_dates)) & ~np.isnan(ret)
+        hit[hit] = spy_dates[pos[hit]] == dates[hit]
+        y[pos[hit], j] = ret[hit]
+    return y
+
+
+def beta_matrix(closes, spy_close, window=252, min_periods=30):
+    """compute_beta for many tickers in one matrix operation. Every ticker's
+    returns are aligned on the shared SPY returns, then covariance / variance
+    is taken over each column's own last `window` overlapping observations,
+    so a ticker with gaps or a short history gets exactly the beta
+    compute_beta would give it. spy_close may be a close Series or the
+    output of benchmark_returns. Returns a Series indexed by ticker (NaN
+    with fewer than `min_periods` observations)."""
+    tickers = list(closes)
+    if spy_close is None or not tickers:
+        return pd.Series(np.nan, index=tickers, dtype=float)
+    spy_dates, spy_ret = spy_close if isinstance(spy_close, tuple) else benchmark_returns(spy_close)
+    y = align_returns(closes, spy_dates)
+    x = np.broadcast_to(spy_ret[:, None], y.shape)
+    valid = ~np.isnan(y)
+    # keep only each column's last `window` valid rows (the inner join's .tail(window))
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]
+    valid &= from_end <= window
+    n = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mx = np.where(valid, x, 0.0).sum(axis=0) / n
+        my = np.where(valid, y, 0.0).sum(axis=0) / n
+        dx, dy = np.where(valid, x - mx, 0.0), np.where(valid, y - my, 0.0)
+        var = (dx * dx).sum(axis=0) / (n - 1)
+        beta = (dx * dy).sum(axis=0) / (n - 1) / var
+    return pd.Series(np.where((n >= min_periods) & (var > 0), beta, np.nan), index=tickers)
+
+
+def rolling_beta(closes, spy_close, window=252, min_periods=30):
+    """Beta as of every SPY date for many tickers: the value compute_beta
+    would have returned on that day from the history up to it. Built from
+    cumulative sums of x, y, x^2 and xy over each ticker's valid
+    observations, so the whole (dates x tickers) table costs O(n) per
+    ticker. Dates a ticker has no return on come out NaN."""
+    tickers = list(closes)
+    spy_dates, spy_ret = spy_close if isinstance(spy_close, tuple) else benchmark_returns(spy_close)
+    y = align_returns(closes, spy_dates)
+    out = np.full(y.shape, np.nan)
+    for j in range(y.shape[1]):
+        rows = np.flatnonzero(~np.isnan(y[:, j]))
+        if len(rows) < min_periods:
+            continue
+        xs, ys = spy_ret[rows], y[rows, j]
+        sums = [np.concatenate(([0.0], np.cumsum(v))) for v in (xs, ys, xs * xs, xs * ys)]
+        end = np.arange(1, len(rows) + 1)
+        start = np.maximum(end - window, 0)
+        n = end - start
+        sx, sy, sxx, sxy = (c[end] - c[start] for c in sums)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (sxx - sx * sx / n) / (n - 1)
+            beta = ((sxy - sx * sy / n) / (n - 1)) / var
+        out[rows, j] = np.where((n >= min_periods) & (var > 0), beta, np.nan)
+    return pd.DataFrame(out, index=pd.DatetimeIndex(spy_dates), columns=tickers)
+
+
+CANDLE_PATTERNS = [
+    ("hammer", "Hammer (bullish reversal at a downtrend low)"),
+    ("bullish_engulfing", "Bullish Engulfing pattern"),
+    ("piercing_line", "Piercing Line pattern"),
+    ("morning_star", "Morning Star pattern"),
+]
+
+
+def _shift_bars(a, k):
+    """a shifted k bars later along axis 0, NaN-padded (a[t - k] at bar t)."""
+    out = np.full_like(a, np.nan)
+    if k < len(a):
+        out[k:] = a[:len(a) - k]
+    return out
+
+
+def candle_pattern_masks(o, h, l, c):
+    """Evaluate every bullish candlestick pattern at every bar at once.
+    o/h/l/c are Series or arrays — 1-D for one ticker, or 2-D
+    (bars x tickers) for a whole panel. Returns {pattern: boolean array of
+    the same shape}, keyed by the names in CANDLE_PATTERNS. Bars without
+    enough history for a pattern (the first one or two) come out False."""
+    o, h, l, c = (np.asarray(x, dtype=float) for x in (o, h, l, c))
+    prev_o, prev_c = _shift_bars(o, 1), _shift_bars(c, 1)
+    o1, c1 = _shift_bars(o, 2), _shift_bars(c, 2)
+    with np.errstate(invalid="ignore"):
+        body = np.abs(c - o)
+        full_range = h - l
+        lower_shadow = np.minimum(o, c) - l
+        upper_shadow = h - np.maximum(o, c)
+        prev_red = prev_c < prev_o
+        green = c > o
+        # small body near top of range, long lower shadow, little/no upper shadow
+        hammer = ((full_range > 0) & (lower_shadow >= 2 * body)
+                  & (upper_shadow <= 0.3 * body + 0.02 * full_range) & (body <= 0.35 * full_range))
+        # prior red, current green, current body engulfs prior body
+        engulfing = prev_red & green & (c >= prev_o) & (o <= prev_c)
+        piercing = prev_red & green & (o < prev_c) & (c > (prev_o + prev_c) / 2) & (c < prev_o)
+        morning_star = ((c1 < o1) & (np.abs(prev_c - prev_o) < np.abs(c1 - o1) * 0.5)
+                        & green & (c > (o1 + c1) / 2))
+    return {"hammer": hammer, "bullish_engulfing": engulfing,
+            "piercing_line": piercing, "morning_star": morning_star}
+
+
+def candle_patterns(df):
+    """Full-history pattern table for one ticker: a boolean DataFrame on
+    df's index with one column per pattern (for backtests / hit-rate work)."""
+    masks = candle_pattern_masks(df["Open"], df["High"], df["Low"], df["Close"])
+    return pd.DataFrame(masks, index=df.index)
+
+
+def _last_bar_pattern(o, h, l, c, name):
+    tail = [np.asarray(x, dtype=float)[-3:] for x in (o, h, l, c)]
+    return bool(candle_pattern_masks(*tail)[name][-1])
+
+
 def is_bullish_engulfing(o, h, l, c):
-    # last two candles: prior red, current green, current body engulfs prior body
-    prev_o, prev_c = o.iloc[-2], c.iloc[-2]
-    cur_o, cur_c = o.iloc[-1], c.iloc[-1]
-    return (prev_c < prev_o) and (cur_c > cur_o) and (cur_c >= prev_o) and (cur_o <= prev_c)
+    return _last_bar_pattern(o, h, l, c, "bullish_engulfing")
 
 
 def is_hammer(o, h, l, c):
-    cur_o, cur_c, cur_h, cur_l = o.iloc[-1], c.iloc[-1], h.iloc[-1], l.iloc[-1]
-    body = abs(cur_c - cur_o)
-    full_range = cur_h - cur_l
-    if full_range <= 0:
-        return False
-    lower_shadow = min(cur_o, cur_c) - cur_l
-    upper_shadow = cur_h - max(cur_o, cur_c)
-    # small body near top of range, long lower shadow, little/no upper shadow
-    return (lower_shadow >= 2 * body) and (upper_shadow <= 0.3 * body + 0.02 * full_range) and (body <= 0.35 * full_range)
+    return _last_bar_pattern(o, h, l, c, "hammer")
 
 
 def is_piercing_line(o, h, l, c):
-    prev_o, prev_c = o.iloc[-2], c.iloc[-2]
-    cur_o, cur_c = o.iloc[-1], c.iloc[-1]
-    prev_mid = (prev_o + prev_c) / 2
-    return (prev_c < prev_o) and (cur_c > cur_o) and (cur_o < prev_c) and (cur_c > prev_mid) and (cur_c < prev_o)
+    return _last_bar_pattern(o, h, l, c, "piercing_line")
 
 
 def is_morning_star(o, h, l, c):
-    if len(c) < 3:
-        return False
-    o1, c1 = o.iloc[-3], c.iloc[-3]
-    o2, c2 = o.iloc[-2], c.iloc[-2]
-    o3, c3 = o.iloc[-1], c.iloc[-1]
-    day1_bearish = c1 < o1
-    day2_small = abs(c2 - o2) < abs(c1 - o1) * 0.5
-    day3_bullish_recovery = (c3 > o3) and (c3 > (o1 + c1) / 2)
-    return day1_bearish and day2_small and day3_bullish_recovery
+    return _last_bar_pattern(o, h, l, c, "morning_star")
 
 
 def detect_bullish_candle(df):
-    o, h, l, c = df["Open"], df["High"], df["Low"], df["Close"]
-    hits = []
-    try:
-        if is_hammer(o, h, l, c):
-            hits.append("Hammer (bullish reversal at a downtrend low)")
-        if is_bullish_engulfing(o, h, l, c):
-            hits.append("Bullish Engulfing pattern")
-        if is_piercing_line(o, h, l, c):
-            hits.append("Piercing Line pattern")
-        if is_morning_star(o, h, l, c):
-            hits.append("Morning Star pattern")
-    except Exception:
-        pass
-    return hits
+    """Descriptions of the bullish patterns on the last bar of df. Only the
+    last three bars feed the pattern engine."""
+    if df is None or df.empty:
+        return []
+    tail = df.iloc[-3:]
+    masks = candle_pattern_masks(tail["Open"], tail["High"], tail["Low"], tail["Close"])
+    return [label for name, label in CANDLE_PATTERNS if masks[name][-1]]
 
 
 # ---------------------------------------------------------------------------
 # INTERMARKET REGIME (Murphy's Intermarket Analysis)
 # ---------------------------------------------------------------------------
 
-def trend_direction(close, window=60, compare_bars=20, threshold=0.005):
+def trend_direction(close, window=TREND_MA_WINDOW, compare_bars=TREND_COMPARE_BARS, threshold=TREND_THRESHOLD):
     """Slope-based trend: is the N-day SMA rising or falling, comparing its
     current value to `compare_bars` trading days ago? Returns (direction,
     pct_change) where pct_change is the % move of the MA over that window —
@@ -399,42 +954,98 @@ def trend_direction(close, window=60, compare_bars=20, threshold=0.005):
     return "flat", pct_change
 
 
-def get_intermarket_regime():
+def close_panel(frames, dropna=True):
+    """Stack the Close column of each frame (None allowed) into one
+    (bars x symbols) array, right-aligned on each symbol's latest bar and
+    NaN-padded on the left, so row -n is every symbol's n-th last bar (what
+    close.iloc[-n] reads per symbol). Returns (closes, lengths)."""
+    series = [(df["Close"].dropna() if dropna else df["Close"]).to_numpy(dtype=np.float64)
+              if df is not None else np.empty(0) for df in frames]
+    lengths = np.array([len(c) for c in series], dtype=np.int64)
+    closes = np.full((int(lengths.max()) if len(lengths) else 0, len(series)), np.nan)
+    for j, c in enumerate(series):
+        if len(c):
+            closes[len(closes) - len(c):, j] = c
+    return closes, lengths
+
+
+def trend_directions(closes, window=TREND_MA_WINDOW, compare_bars=TREND_COMPARE_BARS, threshold=TREND_THRESHOLD):
+    """trend_direction for every column of a close_panel at once. Returns
+    (directions, pct_changes) as lists."""
+    n_cols = closes.shape[1]
+    if len(closes) < window:
+        return ["flat"] * n_cols, [0.0] * n_cols
+    ma = sliding_window_view(closes, window, axis=0).mean(axis=-1)  # NaN wherever the window has a gap
+    valid = ~np.isnan(ma)
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]  # 1 = last valid MA, compare_bars + 1 = the prior one
+    recent = np.where(valid & (from_end == 1), ma, 0.0).sum(axis=0)
+    prior = np.where(valid & (from_end == compare_bars + 1), ma, 0.0).sum(axis=0)
+    enough = valid.sum(axis=0) >= compare_bars + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(enough, (recent / prior - 1) * 100, 0.0)
+    directions = np.where(~enough, "flat", np.where(pct > threshold * 100, "up",
+                                                    np.where(pct < -threshold * 100, "down", "flat")))
+    return directions.tolist(), [float(p) for p in pct]
+
+
+# Intermarket regimes, in the order classify_regime tests them: (key, description, favored sectors).
+# Bonds (TLT) rising == interest rates falling; bonds falling == rates rising.
+REGIMES = [
+    ("inflationary",
+     "Early/mid inflationary regime: commodities rising, bonds falling (rates rising) — "
+     "favor commodities/energy, caution on rate-sensitive stocks",
+     ["Energy", "Materials", "Basic Materials"]),
+    ("disinflationary",
+     "Disinflationary/slowdown regime: commodities falling, bonds rising (rates falling) — "
+     "favor bonds and defensive stocks",
+     ["Utilities", "Consumer Staples", "Consumer Defensive", "Health Care", "Healthcare"]),
+    ("expansion",
+     "Healthy early expansion: both stocks and bonds rising — constructive for growth stocks",
+     ["Information Technology", "Technology", "Financials", "Financial Services", "Consumer Discretionary"]),
+    ("stage6",
+     "Stage 6 (everything falling) — cash is king, increased caution across all positions",
+     []),
+    ("mixed",
+     "Mixed / no clear signal (stocks={stocks}, bonds={bonds}, commodities={commodities}, dollar={dollar})",
+     []),
+]
+
+
+def classify_regime(bonds, stocks, commodities):
+    """Index into REGIMES for the given trend directions ("up" / "down" /
+    "flat" / "unknown"). Works elementwise on arrays of directions, so a
+    whole history of trends is classified in one call."""
+    bonds, stocks, commodities = (np.asarray(x) for x in (bonds, stocks, commodities))
+    return np.select([(commodities == "up") & (bonds == "down"),
+                      (commodities == "down") & (bonds == "up"),
+                      (stocks == "up") & (bonds == "up"),
+                      (stocks == "down") & (commodities == "down") & (bonds == "down")],
+                     [0, 1, 2, 3], len(REGIMES) - 1)
+
+
+def get_intermarket_regime(ctx=None):
     """Classify the macro regime using bonds/stocks/commodities/dollar trends,
-    per Murphy's four-market model + Pring's six-stage business cycle map."""
+    per Murphy's four-market model + Pring's six-stage business cycle map.
+    Pass a DataContext to share downloads with the rest of the scan."""
+    ctx = ctx or DataContext(period_days=0)
+    ctx.prefetch(INTERMARKET_TICKERS.values(), REGIME_PERIOD_DAYS)
+    frames = [ctx.history(ticker, period_days=REGIME_PERIOD_DAYS) for ticker in INTERMARKET_TICKERS.values()]
+    directions, pct_changes = trend_directions(close_panel(frames, dropna=False)[0])
     trends = {}
     trends_pct = {}
-    for name, ticker in INTERMARKET_TICKERS.items():
-        df = fetch_history(ticker, period_days=250)
+    for name, df, direction, pct_change in zip(INTERMARKET_TICKERS, frames, directions, pct_changes):
         if df is None:
             trends[name] = "unknown"
             trends_pct[name] = None
         else:
-            direction, pct_change = trend_direction(df["Close"])
             trends[name] = direction
             trends_pct[name] = round(pct_change, 2)
 
     bonds, stocks, commodities, dollar = (trends.get(k, "unknown") for k in
                                            ["Bonds", "Stocks", "Commodities", "Dollar"])
-
-    # Bonds (TLT) rising == interest rates falling; bonds falling == rates rising
-    if commodities == "up" and bonds == "down":
-        regime = ("Early/mid inflationary regime: commodities rising, bonds falling (rates rising) — "
-                   "favor commodities/energy, caution on rate-sensitive stocks")
-        favored = ["Energy", "Materials", "Basic Materials"]
-    elif commodities == "down" and bonds == "up":
-        regime = ("Disinflationary/slowdown regime: commodities falling, bonds rising (rates falling) — "
-                   "favor bonds and defensive stocks")
-        favored = ["Utilities", "Consumer Staples", "Consumer Defensive", "Health Care", "Healthcare"]
-    elif stocks == "up" and bonds == "up":
-        regime = "Healthy early expansion: both stocks and bonds rising — constructive for growth stocks"
-        favored = ["Information Technology", "Technology", "Financials", "Financial Services", "Consumer Discretionary"]
-    elif stocks == "down" and commodities == "down" and bonds == "down":
-        regime = "Stage 6 (everything falling) — cash is king, increased caution across all positions"
-        favored = []
-    else:
-        regime = f"Mixed / no clear signal (stocks={stocks}, bonds={bonds}, commodities={commodities}, dollar={dollar})"
-        favored = []
+    _, description, favored = REGIMES[int(classify_regime(bonds, stocks, commodities))]
+    regime = description.format(stocks=stocks, bonds=bonds, commodities=commodities, dollar=dollar)
+    favored = list(favored)
 
     # Step 1 (Murphy Playbook) headline call: is the overall environment
     # Risk-On or Risk-Off? Simple proxy: the broad stock market itself is
@@ -449,45 +1060,41 @@ def get_intermarket_regime():
 # SECTOR RELATIVE STRENGTH
 # ---------------------------------------------------------------------------
 
-def get_sector_leaderboard():
-    """Rank each sector ETF's relative performance vs SPY over 1w/1m/3m/12m."""
-    spy = fetch_history(BENCHMARK, period_days=280)
+def get_sector_leaderboard(ctx=None):
+    """Rank each sector ETF's relative performance vs SPY over 1w/1m/3m/12m.
+    Pass a DataContext to share downloads with the rest of the scan."""
+    ctx = ctx or DataContext(period_days=0)
+    ctx.prefetch([BENCHMARK, *SECTOR_ETFS.values()], SECTOR_PERIOD_DAYS)
+    spy = ctx.history(BENCHMARK, period_days=SECTOR_PERIOD_DAYS)
     if spy is None:
         return {}
-    spy_close = spy["Close"].dropna()
 
-    results = {}
-    seen_etfs = set()
     etf_to_sector = {}
     for sector, etf in SECTOR_ETFS.items():
         etf_to_sector.setdefault(etf, sector)
-        if etf in seen_etfs:
-            continue
-        seen_etfs.add(etf)
-        df = fetch_history(etf, period_days=280)
-        if df is None:
-            continue
-        close = df["Close"].dropna()
-        if len(close) < 2:
+    etfs = list(etf_to_sector)
+    closes, lengths = close_panel([spy] + [ctx.history(etf, period_days=SECTOR_PERIOD_DAYS) for etf in etfs])
+    spy_close, spy_len = closes[:, 0], lengths[0]
+    closes, lengths = closes[:, 1:], lengths[1:]
+
+    def rel_perf(n):
+        # percentage points vs SPY over the last n bars, NaN where either history is too short
+        if spy_len <= n or len(closes) < n:
+            return np.full(len(etfs), np.nan)
+        stock_ret = closes[-1] / closes[-n] - 1
+        spy_ret = spy_close[-1] / spy_close[-n] - 1
+        return np.where(lengths > n, (stock_ret - spy_ret) * 100, np.nan)
+
+    perf = {label: rel_perf(n) for label, n in SECTOR_PERF_WINDOWS}
+    day_change = (closes[-1] / closes[-2] - 1) * 100 if len(closes) >= 2 else np.full(len(etfs), np.nan)
+    results = {}
+    for j, etf in enumerate(etfs):
+        if lengths[j] < 2:
             continue
-
-        def rel_perf(n):
-            if len(close) <= n or len(spy_close) <= n:
-                return np.nan
-            stock_ret = close.iloc[-1] / close.iloc[-n] - 1
-            spy_ret = spy_close.iloc[-1] / spy_close.iloc[-n] - 1
-            return (stock_ret - spy_ret) * 100  # percentage points vs SPY
-
-        last_price = float(close.iloc[-1])
-        day_change_pct = float((close.iloc[-1] / close.iloc[-2] - 1) * 100)
-
         results[etf] = {
-            "1w": rel_perf(5),
-            "1m": rel_perf(21),
-            "3m": rel_perf(63),
-            "12m": rel_perf(252),
-            "price": last_price,
-            "day_change_pct": day_change_pct,
+            **{label: float(values[j]) for label, values in perf.items()},
+            "price": float(closes[-1, j]),
+            "day_change_pct": float(day_change[j]),
         }
 
     # rank sectors by average of 1m + 3m relative strength (medium-term leadership)
@@ -551,14 +1158,66 @@ def get_relative_strength_series(ticker_df, spy_df, lookback=126):
 # SCORING
 # ---------------------------------------------------------------------------
 
-def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, spy_close=None):
+def compute_indicators(df, spy_close=None, beta=None):
+    """Every indicator value score_stock reads, as of the last bar of `df`.
+    Split out from the scoring rules so other producers of the same values
+    (e.g. the incremental per-ticker state in indicator_state.py) can feed
+    score_indicators directly. Pass `beta` when it was already computed (see
+    beta_matrix) to skip the per-ticker compute_beta."""
     close, high, low, vol = df["Close"], df["High"], df["Low"], df["Volume"]
+    upper, mid, lower, width = bollinger_bands(close)
+    macd_line, signal_line, hist = macd(close)
+    return {
+        "last_close": close.iloc[-1],
+        "beta": (beta if beta is not None
+                 else compute_beta(close, spy_close) if spy_close is not None else np.nan),
+        "ma50": sma(close, 50).iloc[-1],
+        "ma200": sma(close, 200).iloc[-1],
+        "week52_high": close.rolling(252).max().iloc[-1],
+        "price_52w_ago": close.iloc[-252] if len(close) >= 252 else close.iloc[0],
+        "avg_vol20": vol.rolling(20).mean().iloc[-1],
+        "vol_today": vol.iloc[-1],
+        "vol_yesterday": vol.iloc[-2] if len(vol) >= 2 else np.nan,
+        "bb_width": width.iloc[-1],
+        "bb_width_q20": rolling_quantile_last(width, 120, 0.2),
+        "bb_lower": lower.iloc[-1],
+        "candle_hits": detect_bullish_candle(df),
+        "rsi": rsi(close).iloc[-1],
+        "macd": macd_line.iloc[-1],
+        "macd_signal": signal_line.iloc[-1],
+        "macd_hist": (hist.iloc[-3], hist.iloc[-2], hist.iloc[-1]),
+        "day_high": high.iloc[-1],
+        "day_low": low.iloc[-1],
+        "recent_low": low.rolling(BREAKOUT_LOOKBACK).min().iloc[-1],
+    }
 
-    last_close = close.iloc[-1]
+
+def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, spy_close=None, beta=None):
+    return score_indicators(ticker, compute_indicators(df, spy_close, beta=beta), sector, sector_leaderboard, regime,
+                            is_etf=is_etf)
+
+
+def score_context_view(sector, sector_leaderboard, regime, is_etf=False):
+    """Everything score_indicators reads from the sector leaderboard and the
+    regime for one ticker (keep the two in step): the same indicators score
+    the same under any two contexts with the same view. ScoreMemo uses it to
+    tell which tickers a leaderboard or regime change actually touches."""
+    risk_on = bool(regime.get("risk_on", True))
+    if is_etf:
+        return (risk_on,)
+    info = sector_leaderboard.get(SECTOR_ETFS.get(sector))
+    return (risk_on, sector, info["rank"] if info else None, len(sector_leaderboard),
+            sector in regime.get("favored_sectors", []))
+
+
+def score_indicators(ticker, ind, sector, sector_leaderboard, regime, is_etf=False):
+    """The scoring rules behind score_stock, applied to an indicator
+    snapshot from compute_indicators (or an equivalent source)."""
+    last_close = ind["last_close"]
     reasons = []
     score = 0
 
-    beta = compute_beta(close, spy_close) if spy_close is not None else np.nan
+    beta = ind["beta"]
     if not np.isnan(beta):
         if beta >= 1:
             reasons.append(f"Beta={beta:.2f} — moves at least as much as the market (higher-beta profile)")
@@ -566,19 +1225,18 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
             reasons.append(f"Beta={beta:.2f} — moves less than the market (lower-beta/defensive profile)")
 
     # --- 1. 52-week trend template (25 pts) ---------------------------------
-    ma50 = sma(close, 50)
-    ma200 = sma(close, 200)
-    week52_high = close.rolling(252).max().iloc[-1]
-    price_52w_ago = close.iloc[-252] if len(close) >= 252 else close.iloc[0]
+    ma50, ma200 = ind["ma50"], ind["ma200"]
+    week52_high = ind["week52_high"]
+    price_52w_ago = ind["price_52w_ago"]
 
     trend_pts = 0
     if last_close > price_52w_ago:
         trend_pts += 8
         reasons.append("Price is above where it was 52 weeks ago (positive yearly trend)")
-    if last_close > ma50.iloc[-1] and last_close > ma200.iloc[-1]:
+    if last_close > ma50 and last_close > ma200:
         trend_pts += 10
         reasons.append("Price is above both the 50-day and 200-day moving averages (confirmed uptrend)")
-    if ma50.iloc[-1] > ma200.iloc[-1]:
+    if ma50 > ma200:
         trend_pts += 4
         reasons.append("50-day MA is above the 200-day MA (golden-cross structure)")
     if last_close >= week52_high * 0.75:
@@ -589,10 +1247,10 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
     # --- 2. Near-MA50 pullback opportunity on volume (10 pts) ---------------
     near_ma50_pts = 0
     support_signal = False
-    dist_from_ma50 = abs(last_close - ma50.iloc[-1]) / ma50.iloc[-1]
-    avg_vol20 = vol.rolling(20).mean().iloc[-1]
-    vol_today = vol.iloc[-1]
-    vol_yesterday = vol.iloc[-2] if len(vol) >= 2 else np.nan
+    dist_from_ma50 = abs(last_close - ma50) / ma50
+    avg_vol20 = ind["avg_vol20"]
+    vol_today = ind["vol_today"]
+    vol_yesterday = ind["vol_yesterday"]
 
     # Recent volume spike (today OR yesterday >= 1.5x the 20-day average) —
     # a standalone, more sensitive signal separate from the scoring bonus below.
@@ -607,7 +1265,7 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
         reasons.append(f"Volume spike: {volume_spike_ratio:.1f}x the 20-day average volume "
                         f"({volume_spike_day}) — meets the 1.5x threshold, a strong potential-move indicator")
 
-    if dist_from_ma50 <= NEAR_MA50_PCT and last_close >= ma50.iloc[-1] * 0.98:
+    if dist_from_ma50 <= NEAR_MA50_PCT and last_close >= ma50 * 0.98:
         near_ma50_pts += 5
         support_signal = True
         reasons.append("Price is hugging the 50-day MA — a possible support zone")
@@ -617,22 +1275,21 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
     score += near_ma50_pts
 
     # --- 3. Bollinger setup (10 pts) ----------------------------------------
-    upper, mid, lower, width = bollinger_bands(close)
     bb_pts = 0
     squeeze_signal = False
-    width_percentile = (width.iloc[-1] <= width.rolling(120).quantile(0.2).iloc[-1])
+    width_percentile = (ind["bb_width"] <= ind["bb_width_q20"])
     if width_percentile:
         bb_pts += 6
         squeeze_signal = True
         reasons.append("Bollinger Bands are unusually narrow (squeeze) — a breakout may be brewing")
-    if last_close <= lower.iloc[-1] * 1.02 and last_close > ma200.iloc[-1]:
+    if last_close <= ind["bb_lower"] * 1.02 and last_close > ma200:
         bb_pts += 4
         support_signal = True
         reasons.append("Price is touching the lower Bollinger Band within an overall uptrend — possible buy zone")
     score += min(bb_pts, 10)
 
     # --- 4. Bullish candlestick (10 pts) ------------------------------------
-    candle_hits = detect_bullish_candle(df)
+    candle_hits = ind["candle_hits"]
     candle_signal = bool(candle_hits)
     if candle_hits:
         score += 10
@@ -645,14 +1302,14 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
         vol_pts += 7
         volume_signal = True
         reasons.append(f"Unusual volume today ({vol_today / avg_vol20:.1f}x the 20-day average) — possible large money flow")
-        day_range = high.iloc[-1] - low.iloc[-1]
-        if day_range > 0 and (last_close - low.iloc[-1]) / day_range >= 0.7:
+        day_range = ind["day_high"] - ind["day_low"]
+        if day_range > 0 and (last_close - ind["day_low"]) / day_range >= 0.7:
             vol_pts += 3
             reasons.append("...closed near the day's high on that unusual volume — sign of support defense / institutional buying")
     score += vol_pts
 
     # --- 6. RSI (10 pts) -----------------------------------------------------
-    rsi_val = rsi(close).iloc[-1]
+    rsi_val = ind["rsi"]
     rsi_pts = 0
     if 50 <= rsi_val <= 70:
         rsi_pts = 10
@@ -668,12 +1325,12 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
     score += rsi_pts
 
     # --- 7. MACD (10 pts) -----------------------------------------------------
-    macd_line, signal_line, hist = macd(close)
+    hist = ind["macd_hist"]
     macd_pts = 0
-    if macd_line.iloc[-1] > signal_line.iloc[-1]:
+    if ind["macd"] > ind["macd_signal"]:
         macd_pts += 6
         reasons.append("MACD is above its signal line — positive momentum")
-        if hist.iloc[-1] > hist.iloc[-2] > hist.iloc[-3]:
+        if hist[-1] > hist[-2] > hist[-3]:
             macd_pts += 4
             reasons.append("MACD histogram is expanding — momentum is accelerating")
     score += macd_pts
@@ -713,8 +1370,8 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
         score = score * 100 / 85
 
     # --- Stop loss & price target -----------------------------------------
-    recent_low = low.rolling(BREAKOUT_LOOKBACK).min().iloc[-1]
-    stop_loss = min(recent_low, ma50.iloc[-1]) * 0.98  # small buffer below nearest support
+    recent_low = ind["recent_low"]
+    stop_loss = min(recent_low, ma50) * 0.98  # small buffer below nearest support
     risk = last_close - stop_loss
     target = last_close + max(risk * 2.5, (week52_high - last_close) * 0.5)
     if week52_high > last_close:
@@ -795,6 +1452,284 @@ def score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=False, sp
     }
 
 
+# ---------------------------------------------------------------------------
+# CONCURRENT FETCH STAGE (shared by the CLI and the dashboard)
+# ---------------------------------------------------------------------------
+
+def fetch_scan_inputs(tickers, jobs=DEFAULT_JOBS, chunk_size=BATCH_CHUNK_SIZE):
+    """Fetch everything score_stock needs for each ticker — price history,
+    ETF classification and sector — overlapping the downloads across `jobs`
+    worker threads (all sharing scan_engine's rate limiter). This is a
+    generator: it yields (ticker, df, etf_flag, sector, error) tuples as each
+    chunk of tickers completes, so the caller can score and report progress
+    on its own thread. df is None when the ticker had no usable data; error
+    is the exception if classifying it failed. Empty/short fetches are
+    recorded in the dead-ticker registry (and successful ones clear it); a
+    download that failed after retries comes back as a ProviderError
+    instead, and doesn't count against the ticker.
+
+    With a remote provider the pool has MAX_JOBS threads, and `jobs` is only
+    where scan_engine's adaptive concurrency limit starts."""
+    registry = get_dead_registry()
+    if get_provider().rate_limited:
+        CONTROLLER.set_jobs(jobs)
+        jobs = MAX_JOBS
+
+    def work(chunk):
+        failed = set()
+        histories = fetch_history_batch(chunk, chunk_size=len(chunk), failed=failed)
+        out = []
+        for ticker in chunk:
+            df = histories.get(ticker)
+            if ticker in failed:
+                out.append((ticker, None, None, None, ProviderError("download failed after retries")))
+                continue
+            if registry is not None and df is None:
+                registry.record_miss(ticker)
+            elif registry is not None:
+                registry.record_hit(ticker)
+            if df is None:
+                out.append((ticker, None, None, None, None))
+                continue
+            try:
+                etf_flag = is_etf(ticker)
+                sector = "ETF" if etf_flag else get_sector(ticker)
+                out.append((ticker, df, etf_flag, sector, None))
+            except Exception as e:
+                out.append((ticker, None, None, None, e))
+        return out
+
+    try:
+        for items in run_pool(chunked(tickers, chunk_size, jobs), work, jobs=jobs):
+            yield from items
+    finally:
+        if registry is not None:
+            registry.save()
+
+
+# ---------------------------------------------------------------------------
+# SCORING STAGE (optionally on a process pool)
+# ---------------------------------------------------------------------------
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+SCORE_BATCH = 16     # tickers per process-pool task (amortizes IPC round-trips)
+
+_score_context = None  # (sector_leaderboard, regime, spy_close, spy_returns, min_beta), set once per worker
+
+
+def pack_ohlcv(df):
+    """Compact, cheap-to-pickle form of an OHLCV frame: (int64 date index,
+    5 x N float64 array). Much smaller/faster to ship to a worker process
+    than a pickled DataFrame."""
+    values = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(dtype=np.float64).T)
+    return index_ns(df.index), values
+
+
+def unpack_ohlcv(index_i8, values):
+    return pd.DataFrame(values.T, index=pd.DatetimeIndex(index_i8), columns=OHLCV_COLUMNS)
+
+
+BAR_CHECK_WINDOW = 60  # trailing bars whose (adjusted) closes/volumes a scan snapshot fingerprints
+
+
+def last_bar(df):
+    """[date, close, volume, digest] of a frame's latest bar, JSON-friendly:
+    what a scan snapshot compares to tell whether a ticker has new data.
+    The digest covers the closes and volumes of the last BAR_CHECK_WINDOW
+    bars, so a split or dividend adjustment issued since (which restates
+    every bar before the ex-date) changes it even when the latest bar
+    doesn't. It only needs that many bars, so a short quote window yields
+    the same value as the full history."""
+    tail = df.iloc[-BAR_CHECK_WINDOW:]
+    digest = hashlib.blake2b(np.round(tail["Close"].to_numpy(dtype=np.float64), 4).tobytes()
+                             + tail["Volume"].to_numpy(dtype=np.float64).tobytes(), digest_size=8).hexdigest()
+    return [str(df.index[-1].date()), round(float(df["Close"].iloc[-1]), 4), float(df["Volume"].iloc[-1]), digest]
+
+
+def _below_min_beta(beta, min_beta, etf_flag):
+    return (min_beta is not None and not etf_flag and beta is not None and not np.isnan(beta)
+            and round(beta, 2) < min_beta)
+
+
+def _score_batch(batch, sector_leaderboard, regime, spy_close=None, min_beta=None, spy_returns=None,
+                 indicators=None):
+    """Score a list of (ticker, df, sector, etf_flag), computing the whole
+    batch's betas in one beta_matrix call. Stocks whose beta is already known
+    to be below `min_beta` skip the rest of the scoring and come back as a
+    stub result holding just Ticker and Beta — all run_scan's beta filter
+    reads before discarding them. Pass `spy_returns` (benchmark_returns of
+    spy_close) to reuse the SPY side across batches, and an `indicators`
+    dict to collect ticker -> (batch beta, compute_indicators snapshot or
+    None for a stub) for the ScoreMemo."""
+    betas = {}
+    if spy_close is not None:
+        try:
+            betas = beta_matrix({ticker: df for ticker, df, _, _ in batch},
+                                spy_returns if spy_returns is not None else spy_close)
+        except Exception:
+            pass  # fall back to compute_beta per ticker
+    out = []
+    for ticker, df, sector, etf_flag in batch:
+        try:
+            beta = betas.get(ticker)
+            if _below_min_beta(beta, min_beta, etf_flag):
+                out.append((ticker, etf_flag, {"Ticker": ticker, "Beta": round(float(beta), 2)}, None))
+                if indicators is not None:
+                    indicators[ticker] = (beta, None)
+                continue
+            ind = compute_indicators(df, spy_close, beta=beta)
+            res = score_indicators(ticker, ind, sector, sector_leaderboard, regime, is_etf=etf_flag)
+            out.append((ticker, etf_flag, res, None))
+            if indicators is not None:
+                indicators[ticker] = (beta, ind)
+        except Exception as e:
+            out.append((ticker, etf_flag, None, e))
+    return out
+
+
+def _init_score_worker(sector_leaderboard, regime, spy_packed, min_beta=None):
+    """Process-pool initializer: receives the inputs shared by every ticker
+    (sector leaderboard, regime, SPY closes) once per worker, instead of once
+    per task."""
+    global _score_context
+    spy_close = spy_returns = None
+    if spy_packed is not None:
+        spy_close = pd.Series(spy_packed[1], index=pd.DatetimeIndex(spy_packed[0]))
+        spy_returns = benchmark_returns(spy_close)
+    _score_context = (sector_leaderboard, regime, spy_close, spy_returns, min_beta)
+
+
+def _score_packed_batch(batch):
+    sector_leaderboard, regime, spy_close, spy_returns, min_beta = _score_context
+    batch = [(ticker, unpack_ohlcv(index_i8, values), sector, etf_flag)
+             for ticker, index_i8, values, sector, etf_flag in batch]
+    indicators = {}
+    out = _score_batch(batch, sector_leaderboard, regime, spy_close=spy_close, min_beta=min_beta,
+                       spy_returns=spy_returns, indicators=indicators)
+    return out, indicators
+
+
+def score_scan_inputs(inputs, sector_leaderboard, regime, spy_close=None, processes=0, incremental=False,
+                      min_beta=None, memo=None):
+    """Score an iterable of (ticker, df, sector, etf_flag) and yield
+    (ticker, etf_flag, result, error) for each. Tickers are scored in
+    batches of SCORE_BATCH so each batch's betas come from one beta_matrix
+    call; with `min_beta` set, stocks below it get a stub result instead of a
+    full score (see _score_batch). With processes <= 1 this runs inline (or,
+    with incremental=True, through indicator_state's score_incremental, which
+    only processes bars newer than each ticker's stored indicator state, see
+    get_state_store).
+    Otherwise the CPU-bound indicator work runs on a pool of `processes`
+    worker processes: each ticker is shipped as packed NumPy arrays (see
+    pack_ohlcv), and the shared inputs are sent to every worker once, via the
+    pool initializer. Results are yielded in completion order.
+
+    With a ScoreMemo (not used with incremental=True), a ticker whose
+    history and SPY closes are unchanged since it was last memoized isn't
+    scored again: its result is reused, or only score_indicators is rerun
+    when its sector/regime view changed (see score_memo.py). Only the rest
+    go through the batches / the pool."""
+    if incremental:
+        import indicator_state
+        store = get_state_store()
+        spy_ret_by_date = indicator_state.spy_returns(spy_close)
+        for ticker, df, sector, etf_flag in inputs:
+            try:
+                yield ticker, etf_flag, indicator_state.score_incremental(
+                    ticker, df, sector, sector_leaderboard, regime, is_etf=etf_flag, spy_close=spy_close,
+                    store=store, spy_ret_by_date=spy_ret_by_date), None
+            except Exception as e:
+                yield ticker, etf_flag, None, e
+        return
+
+    spy_fp = None
+    if memo is not None and spy_close is not None:
+        spy_fp = array_fingerprint(index_ns(spy_close.index), spy_close.to_numpy(dtype=np.float64))
+    pending = {}  # ticker -> (data fingerprint, sector) while it is being scored
+
+    def recall(ticker, packed, sector, etf_flag):
+        # The memoized result, or None when the ticker is dirty and has to be scored.
+        data_fp = data_fingerprint(*packed)
+        entry = memo.get(ticker, data_fp, spy_fp, etf_flag)
+        if entry is not None and _below_min_beta(entry["beta"], min_beta, etf_flag):
+            memo.count("hit")
+            return {"Ticker": ticker, "Beta": round(float(entry["beta"]), 2)}
+        if entry is not None and entry["ind"] is not None:
+            view = score_context_view(sector, sector_leaderboard, regime, is_etf=etf_flag)
+            if view == entry["view"]:
+                memo.count("hit")
+                return dict(entry["result"])
+            try:
+                res = score_indicators(ticker, entry["ind"], sector, sector_leaderboard, regime, is_etf=etf_flag)
+            except Exception:
+                res = None  # score it from scratch, which reports the error
+            if res is not None:
+                memo.put(ticker, data_fp, spy_fp, etf_flag, entry["beta"], entry["ind"], view, res)
+                memo.count("rescored")
+                return dict(res)
+        memo.count("miss")
+        pending[ticker] = (data_fp, sector)
+        return None
+
+    def remember(out, indicators):
+        for ticker, etf_flag, res, error in out:
+            data_fp, sector = pending.pop(ticker)
+            if error is None and ticker in indicators:
+                beta, ind = indicators[ticker]
+                memo.put(ticker, data_fp, spy_fp, etf_flag, beta, ind,
+                         score_context_view(sector, sector_leaderboard, regime, is_etf=etf_flag), dict(res))
+        return out
+
+    if processes is None or processes <= 1:
+        spy_returns = benchmark_returns(spy_close) if spy_close is not None else None
+
+        def score(batch):
+            if memo is None:
+                return _score_batch(batch, sector_leaderboard, regime, spy_close=spy_close, min_beta=min_beta,
+                                    spy_returns=spy_returns)
+            indicators = {}
+            return remember(_score_batch(batch, sector_leaderboard, regime, spy_close=spy_close, min_beta=min_beta,
+                                         spy_returns=spy_returns, indicators=indicators), indicators)
+
+        batch = []
+        for item in inputs:
+            ticker, df, sector, etf_flag = item
+            res = recall(ticker, pack_ohlcv(df), sector, etf_flag) if memo is not None else None
+            if res is not None:
+                yield ticker, etf_flag, res, None
+                continue
+            batch.append(item)
+            if len(batch) >= SCORE_BATCH:
+                yield from score(batch)
+                batch = []
+        if batch:
+            yield from score(batch)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    spy_packed = None
+    if spy_close is not None:
+        spy_packed = (index_ns(spy_close.index), spy_close.to_numpy(dtype=np.float64))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_score_worker,
+                             initargs=(sector_leaderboard, regime, spy_packed, min_beta)) as pool:
+        futures, batch = [], []
+        for ticker, df, sector, etf_flag in inputs:
+            packed = pack_ohlcv(df)
+            res = recall(ticker, packed, sector, etf_flag) if memo is not None else None
+            if res is not None:
+                yield ticker, etf_flag, res, None
+                continue
+            batch.append((ticker, *packed, sector, etf_flag))
+            if len(batch) >= SCORE_BATCH:
+                futures.append(pool.submit(_score_packed_batch, batch))
+                batch = []
+        if batch:
+            futures.append(pool.submit(_score_packed_batch, batch))
+        for fut in as_completed(futures):
+            out, indicators = fut.result()
+            yield from (remember(out, indicators) if memo is not None else out)
+
+
 # ---------------------------------------------------------------------------
 # MAIN SCAN (CLI)
 # ---------------------------------------------------------------------------
@@ -810,15 +1745,302 @@ def _fmt_price_cols(df):
 SETUP_SORT_ORDER = {"Buy Zone": 0, "Watchlist": 1, "No Signal": 2}
 
 
+class TopN:
+    """Running top-n of scan results, kept in a bounded heap as results
+    stream in, and ranked like the final tables: Setup tier first (with
+    by_setup), then checklist steps passed, then Score, ties going to the
+    ticker earlier in the scan order."""
+
+    def __init__(self, n, by_setup=False):
+        self.n = n
+        self.by_setup = by_setup
+        self._heap = []  # min-heap on the negated rank, so the root is the worst kept result
+
+    def _rank(self, res, position):
+        setup = SETUP_SORT_ORDER.get(res.get("Setup"), 9) if self.by_setup else 0
+        return (-setup, res.get("ChecklistPassCount", 0), res.get("Score", 0), -position)
+
+    def push(self, res, position):
+        """Offer a result; True if it made the top n."""
+        item = (self._rank(res, position), res)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, item)
+            return True
+        if item[0] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+            return True
+        return False
+
+    def items(self):
+        """The current top n, best first."""
+        return [res for _, res in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+
+def known_classification(ticker):
+    """(etf_flag, sector) for a ticker when it is known without any network
+    call — from the embedded index data, the known-ETF list, or an entry
+    already in the metadata cache — else None. Matches what the fetch stage
+    would get from is_etf / get_sector."""
+    if ticker in ALL_UNIVERSE_DATA:
+        return False, ALL_UNIVERSE_DATA[ticker][1]
+    if ticker in KNOWN_ETFS:
+        return True, "ETF"
+    entry = _metadata_memo.get(ticker)
+    if entry is None:
+        cache = get_metadata_cache()
+        entry = cache.load(ticker) if cache is not None else None
+    if entry is None:
+        return None
+    etf_flag = str(entry["quoteType"]).upper() == "ETF"
+    return etf_flag, "ETF" if etf_flag else entry["sector"]
+
+
+def plan_scan(tickers, sector_leaderboard, only_strong_sectors=True):
+    """Apply every filter that needs no price data before anything is
+    downloaded: the dead-ticker skip list, ETF classification and (for
+    stocks) sector strength. Returns a dict:
+        fetch        tickers to download and score, in input order
+        dead         skipped as known dead/delisted
+        weak_sector  stocks skipped for being outside the strong sectors
+        etfs         how many of `fetch` are ETFs (never sector-filtered)
+        unclassified how many of `fetch` still need a metadata lookup, and
+                     so can only be sector-filtered after download
+        total        len(tickers)"""
+    strong_etfs = strong_sector_etfs(sector_leaderboard)
+    live, dead = split_dead_tickers(tickers)
+    fetch, weak = [], []
+    etfs = unclassified = 0
+    for ticker in live:
+        known = known_classification(ticker)
+        if known is None:
+            unclassified += 1
+        elif known[0]:
+            etfs += 1
+        elif only_strong_sectors and strong_etfs and \
+                not stock_is_in_strong_sector(known[1], sector_leaderboard, strong_etfs):
+            weak.append(ticker)
+            continue
+        fetch.append(ticker)
+    return {"fetch": fetch, "dead": dead, "weak_sector": weak, "etfs": etfs,
+            "unclassified": unclassified, "total": len(tickers)}
+
+
+def print_scan_plan(plan, chunk_size=BATCH_CHUNK_SIZE):
+    """The --plan dry-run report: what the pre-fetch filters removed and
+    how many downloads that saves."""
+    avoided = len(plan["dead"]) + len(plan["weak_sector"])
+    total = plan["total"]
+    requests_before = -(-total // chunk_size)
+    requests_after = -(-len(plan["fetch"]) // chunk_size)
+    print(f"\nScan plan for {total} tickers:")
+    print(f"  known dead/delisted, skipped:    {len(plan['dead'])}")
+    print(f"  outside strong sectors, skipped: {len(plan['weak_sector'])}")
+    print(f"  to fetch:                        {len(plan['fetch'])} "
+          f"({plan['etfs']} ETFs, {plan['unclassified']} needing a sector lookup after download)")
+    pct = avoided / total * 100 if total else 0.0
+    print(f"History downloads avoided: {avoided} of {total} ({pct:.0f}%), "
+          f"about {requests_before - requests_after} fewer batch requests at {chunk_size} tickers each.")
+
+
+def print_dead_ticker_summary(skipped, no_data, limit=20):
+    """Report tickers skipped as known-dead and tickers that came back with
+    no usable data in this scan (and which of those are now flagged dead)."""
+    def fmt(symbols):
+        return ", ".join(symbols[:limit]) + (f" (+{len(symbols) - limit} more)" if len(symbols) > limit else "")
+
+    registry = get_dead_registry()
+    if skipped:
+        print(f"Skipped {len(skipped)} known-dead tickers (re-probed every {registry.reprobe_days} days): "
+              f"{fmt(skipped)}")
+    if no_data:
+        print(f"{len(no_data)} tickers returned no usable data: {fmt(no_data)}")
+        newly_dead = [t for t in no_data if registry is not None and registry.is_dead(t)]
+        if newly_dead:
+            print(f"  now flagged as dead and skipped in future scans: {fmt(newly_dead)}")
+
+
+# How much each scheduling signal adds to a ticker's priority (see schedule_tickers).
+PRIORITY_WEIGHTS = {"strong_sector": 2.0, "buy_zone": 1.5, "score": 1.0, "liquidity": 0.5}
+# Liquidity stand-in, on the same 0-1 scale, for tickers with no dollar volume on record yet.
+INDEX_LIQUIDITY_PRIOR = ((SP500_DATA, 0.5), (SP400_DATA, 0.25), (SP600_DATA, 0.1))
+
+
+def schedule_tickers(tickers, sector_leaderboard=None, strong_etfs=None):
+    """Reorder `tickers` so the likeliest actionable names are fetched and
+    scored first. Every input comes from cached data, no network: strong-
+    sector membership (known_classification against the leaderboard), and,
+    from the PriorityStore, how often the ticker was recently in the Buy
+    Zone, its last Score, and its dollar-volume rank (index membership as a
+    stand-in until it has one). Weights are in PRIORITY_WEIGHTS; ties keep
+    the input order. Only the processing order changes, never the results."""
+    store = get_priority_store()
+    signals = store.entries if store is not None else {}
+    volumes = sorted(e["dollar_volume"] for t in tickers if (e := signals.get(t)) and e.get("dollar_volume"))
+    w = PRIORITY_WEIGHTS
+
+    def priority(ticker):
+        entry = signals.get(ticker, {})
+        p = 0.0
+        known = known_classification(ticker)
+        if known is not None and strong_etfs:
+            etf_flag, sector = known
+            strong = ticker in strong_etfs if etf_flag else \
+                stock_is_in_strong_sector(sector, sector_leaderboard, strong_etfs)
+            p += w["strong_sector"] * strong
+        p += w["buy_zone"] * entry.get("buy_zone_rate", 0.0)
+        p += w["score"] * (entry.get("score") or 0) / 100
+        if entry.get("dollar_volume"):
+            liquidity = bisect.bisect_left(volumes, entry["dollar_volume"]) / len(volumes)
+        else:
+            liquidity = next((prior for table, prior in INDEX_LIQUIDITY_PRIOR if ticker in table), 0.0)
+        return p + w["liquidity"] * liquidity
+
+    ranked = {t: priority(t) for t in tickers}
+    return sorted(tickers, key=lambda t: -ranked[t])
+
+
+def scan_journal_key(min_beta=None):
+    """What a ScanJournal is keyed on: per-ticker results can be reused
+    across runs with the same as-of date, data source and beta cutoff (below
+    the cutoff score_scan_inputs only returns a stub)."""
+    provider = get_provider()
+    return {"as_of": provider.today().isoformat(), "provider": provider.name, "min_beta": min_beta}
+
+
+def journal_restorable(entry, only_strong_sectors=True):
+    """Whether a journaled ticker outcome stands on resume. Failed fetches
+    and scoring errors are retried; a weak-sector skip only counts while
+    the strong-sector filter is on."""
+    if entry["status"] == "scored":
+        return True
+    return entry["status"] == "weak_sector" and only_strong_sectors
+
+
+def scan_stream(tickers, sector_leaderboard, regime, spy_close=None, only_strong_sectors=True, min_beta=1.0,
+                only_actionable=True, require_volume_spike=False, require_full_checklist=False,
+                chunk_size=BATCH_CHUNK_SIZE, jobs=DEFAULT_JOBS, processes=0, incremental=False,
+                journal=None, restored=(), order=None, top_n=10, rank_by_setup=True, stats=None):
+    """The scan pipeline as a generator: fetch, score and filter `tickers`,
+    yielding one event dict per ticker as soon as it is decided, so callers
+    can render results while the scan is still running. Each event has
+    "ticker", "etf", "result" (the score_stock dict if it passed the
+    filters, else None), "error", "done" / "total" (progress), and
+    "top_stocks" / "top_etfs" (the running best `top_n`, see TopN) with
+    "top_changed" set when either list moved.
+
+    `restored` journal entries (see ScanJournal / journal_restorable) are
+    replayed first; every new outcome is recorded in `journal`, which is
+    marked complete once the stream is exhausted. `order` maps ticker ->
+    position in the full scan for tie-breaking (default: restored tickers,
+    then `tickers`). Skip counts accumulate in the `stats` dict: weak_sector,
+    beta, no_signal, no_vol_spike, checklist, and the no_data ticker list."""
+    stats = {} if stats is None else stats
+    stats.update(weak_sector=sum(e["status"] == "weak_sector" for e in restored), beta=0, no_signal=0,
+                 no_vol_spike=0, checklist=0, no_data=[])
+    if order is None:
+        order = {t: i for i, t in enumerate([e["ticker"] for e in restored] + list(tickers))}
+    strong_etfs = strong_sector_etfs(sector_leaderboard)
+    top = {False: TopN(top_n, by_setup=rank_by_setup), True: TopN(top_n)}
+    total = len(restored) + len(tickers)
+    done = 0
+
+    def record(ticker, status, **fields):
+        if journal is not None:
+            journal.record(ticker, status, **fields)
+
+    priority = get_priority_store()
+    decided = []  # (ticker, etf_flag, None, error) for tickers settled before scoring
+    bars = {}  # ticker -> last_bar of the history it is being scored on, journaled with the result
+
+    def scoring_candidates():
+        # Everything that can be decided before scoring happens here, on the
+        # caller's thread, as the fetch stage delivers each ticker.
+        for ticker, df, etf_flag, sector, error in fetch_scan_inputs(tickers, jobs=jobs, chunk_size=chunk_size):
+            if error is not None:
+                record(ticker, "error", error=str(error))
+                decided.append((ticker, etf_flag, None, error))
+                continue
+            if df is None:
+                stats["no_data"].append(ticker)
+                record(ticker, "no_data")
+                decided.append((ticker, etf_flag, None, None))
+                continue
+            if priority is not None:
+                tail = df.iloc[-20:]
+                priority.record_liquidity(ticker, (tail["Close"] * tail["Volume"]).mean())
+            if (not etf_flag and only_strong_sectors and strong_etfs
+                    and not stock_is_in_strong_sector(sector, sector_leaderboard, strong_etfs)):
+                stats["weak_sector"] += 1
+                record(ticker, "weak_sector")
+                decided.append((ticker, etf_flag, None, None))
+                continue
+            bars[ticker] = last_bar(df)
+            yield ticker, df, sector, etf_flag
+
+    def outcomes():
+        for item in score_scan_inputs(scoring_candidates(), sector_leaderboard, regime, spy_close=spy_close,
+                                      processes=processes, incremental=incremental, min_beta=min_beta,
+                                      memo=get_score_memo()):
+            yield from decided
+            decided.clear()
+            ticker, etf_flag, res, error = item
+            bar = bars.pop(ticker, None)
+            if error is not None:
+                record(ticker, "error", error=str(error))
+            else:
+                record(ticker, "scored", etf=etf_flag, result=res, bar=bar)
+                if priority is not None and "Setup" in res:  # not a below-min_beta stub
+                    priority.record_result(ticker, res["Score"], res["Setup"], today=get_provider().today())
+            yield item
+        yield from decided
+
+    from_journal = ((e["ticker"], e["etf"], e["result"], None) for e in restored if e["status"] == "scored")
+    for ticker, etf_flag, res, error in itertools.chain(from_journal, outcomes()):
+        done += 1
+        changed = False
+        if res is not None and not etf_flag:
+            if min_beta is not None and res["Beta"] is not None and res["Beta"] < min_beta:
+                stats["beta"] += 1
+                res = None
+            elif only_actionable and res["Setup"] == "No Signal":
+                stats["no_signal"] += 1
+                res = None
+            elif require_volume_spike and not res["VolumeSpike"]:
+                stats["no_vol_spike"] += 1
+                res = None
+            elif require_full_checklist and res["ChecklistPassCount"] < 5:
+                stats["checklist"] += 1
+                res = None
+        if res is not None:
+            changed = top[etf_flag].push(res, order.get(ticker, 0))
+        yield {"ticker": ticker, "etf": etf_flag, "result": res, "error": error, "done": done, "total": total,
+               "top_stocks": top[False].items(), "top_etfs": top[True].items(), "top_changed": changed}
+    if journal is not None:
+        journal.mark_complete()
+    if priority is not None:
+        priority.save()
+
+
 def run_scan(tickers, top_n=None, only_strong_sectors=True, min_beta=1.0, only_actionable=True,
-             require_volume_spike=False, require_full_checklist=False):
+             require_volume_spike=False, require_full_checklist=False, chunk_size=BATCH_CHUNK_SIZE, jobs=DEFAULT_JOBS,
+             processes=0, incremental=False, dry_run=False, two_stage=False, resume=False, schedule=True,
+             diff=False):
+    CONTROLLER.reset_stats()
+    memo = get_score_memo()
+    if memo is not None:
+        memo.reset_stats()
+    universe = list(tickers)
+    # One batched download of every benchmark/intermarket/sector-ETF symbol,
+    # shared by the regime, the leaderboard and the beta calculation.
+    ctx = DataContext()
+    ctx.prefetch(market_symbols())
     print("Fetching intermarket regime (bonds/stocks/commodities/dollar)...")
-    regime = get_intermarket_regime()
+    regime = get_intermarket_regime(ctx)
     print("Regime:", regime["description"])
     print("Step 1 call: Risk-ON" if regime.get("risk_on") else "Step 1 call: Risk-OFF (extra caution)")
 
     print("Building sector relative-strength leaderboard...")
-    sector_leaderboard = get_sector_leaderboard()
+    sector_leaderboard = get_sector_leaderboard(ctx)
 
     strong, weak = summarize_sector_strength(sector_leaderboard)
     strong_etfs = strong_sector_etfs(sector_leaderboard)
@@ -835,41 +2057,115 @@ def run_scan(tickers, top_n=None, only_strong_sectors=True, min_beta=1.0, only_a
     if require_full_checklist:
         print("(Only stocks passing ALL 5 Murphy Playbook checklist steps are shown — the tightest filter)")
 
-    spy_df = fetch_history(BENCHMARK)
+    # Filters that need no price data run before anything is downloaded.
+    plan = plan_scan(tickers, sector_leaderboard, only_strong_sectors=only_strong_sectors)
+    if dry_run:
+        print_scan_plan(plan, chunk_size)
+        return
+    tickers, dead = plan["fetch"], plan["dead"]
+    if dead or plan["weak_sector"]:
+        print(f"(Pre-fetch filters: {len(plan['weak_sector'])} weak-sector and {len(dead)} known-dead tickers "
+              f"are skipped without downloading — pass --plan for the full breakdown)")
+
+    # With the on-disk cache on, every finished ticker is checkpointed, so an
+    # interrupted scan can be resumed with --resume at the cost of only the
+    # tickers it hadn't done.
+    order = {t: i for i, t in enumerate(tickers)}
+    journal = open_scan_journal(scan_journal_key(min_beta), "cli", resume=resume)
+    restored = [e for t, e in (journal.entries if journal is not None else {}).items()
+                if t in order and journal_restorable(e, only_strong_sectors)]
+    if resume and journal.resumed:
+        print(f"Resuming: {len(restored)} of {len(tickers)} tickers are already done in the scan journal.")
+    elif resume:
+        print("(No scan journal matching this as-of date, data source and --min-beta to resume; starting over)")
+    if restored:
+        done = {e["ticker"] for e in restored}
+        tickers = [t for t in tickers if t not in done]
+
+    spy_df = ctx.history(BENCHMARK)
     spy_close = spy_df["Close"] if spy_df is not None else None
 
+    # Each finished scan is snapshotted for the scan-to-scan diff; a --diff
+    # scan also carries over the previous result of every ticker whose
+    # latest bar hasn't changed, when nothing it was scored against has.
+    import scan_diff
+    snapshots = get_scan_snapshot("cli")
+    previous = snapshots.load() if snapshots is not None else None
+    context = scan_diff.context_fingerprint(sector_leaderboard, regime, spy_close, min_beta)
+    if diff and snapshots is None:
+        print("(--diff needs the on-disk cache (no --no-cache, live data); showing the full results)")
+        diff = False
+    elif diff and previous is None:
+        print("(No previous scan snapshot to diff against; this scan becomes the baseline)")
+    elif diff:
+        reused, tickers = scan_diff.reuse_unchanged(tickers, previous, context, jobs=jobs, chunk_size=chunk_size,
+                                                    fetch_window=_fetch_window)
+        for e in reused:
+            journal.record(e["ticker"], "scored", etf=e["etf"], result=e["result"], bar=e["bar"])
+        restored += reused
+        if previous["context"] != context:
+            print(f"(Sector ranks, regime or SPY changed since the previous scan ({previous['as_of']}); "
+                  f"rescoring everything)")
+        else:
+            print(f"Reusing {len(reused)} tickers unchanged since the previous scan ({previous['as_of']}); "
+                  f"rescoring {len(tickers)}.")
+
+    prefilter_stats = None
+    if two_stage:
+        import prefilter
+        print(f"Stage one: checking {len(tickers)} tickers on a {prefilter.PREFILTER_PERIOD_DAYS}-day quote window...")
+        tickers, prefilter_stats = prefilter.prefilter(
+            tickers, only_actionable=only_actionable, require_volume_spike=require_volume_spike,
+            require_full_checklist=require_full_checklist, jobs=jobs, chunk_size=chunk_size,
+            fetch_window=_fetch_window, classify=known_classification)
+
+    if schedule:
+        # Fetch/score the likeliest actionable names first; `order` still
+        # holds the input order, so the final tables don't change.
+        tickers = schedule_tickers(tickers, sector_leaderboard, strong_etfs)
+
+    print(f"Fetching and scoring {len(tickers)} tickers ({jobs} workers, up to {chunk_size} per request)...")
     stock_results, etf_results = [], []
-    skipped_weak_sector = skipped_beta = skipped_no_signal = skipped_no_vol_spike = skipped_checklist = 0
-    for i, ticker in enumerate(tickers, start=1):
-        print(f"[{i}/{len(tickers)}] scanning {ticker}...", end="\r")
-        try:
-            df = fetch_history(ticker)
-            if df is None:
-                continue
-            etf_flag = is_etf(ticker)
-            sector = "ETF" if etf_flag else get_sector(ticker)
-            if not etf_flag and only_strong_sectors and strong_etfs:
-                if not stock_is_in_strong_sector(sector, sector_leaderboard, strong_etfs):
-                    skipped_weak_sector += 1
-                    continue
-            res = score_stock(ticker, df, sector, sector_leaderboard, regime, is_etf=etf_flag, spy_close=spy_close)
-            if not etf_flag:
-                if min_beta is not None and res["Beta"] is not None and res["Beta"] < min_beta:
-                    skipped_beta += 1
-                    continue
-                if only_actionable and res["Setup"] == "No Signal":
-                    skipped_no_signal += 1
-                    continue
-                if require_volume_spike and not res["VolumeSpike"]:
-                    skipped_no_vol_spike += 1
-                    continue
-                if require_full_checklist and res["ChecklistPassCount"] < 5:
-                    skipped_checklist += 1
-                    continue
-            (etf_results if etf_flag else stock_results).append(res)
-        except Exception as e:
-            print(f"\n  skipped {ticker}: {e}")
-            continue
+    stats = {}
+    live_n = top_n or 10
+    last_table = time.monotonic()
+    events = scan_stream(tickers, sector_leaderboard, regime, spy_close=spy_close,
+                         only_strong_sectors=only_strong_sectors, min_beta=min_beta, only_actionable=only_actionable,
+                         require_volume_spike=require_volume_spike, require_full_checklist=require_full_checklist,
+                         chunk_size=chunk_size, jobs=jobs, processes=processes, incremental=incremental,
+                         journal=journal, restored=restored, order=order, top_n=live_n, stats=stats)
+    table_stale = False
+    download_failed = []
+    for ev in events:
+        if isinstance(ev["error"], ProviderError):
+            download_failed.append(ev["ticker"])  # summarized below rather than one line per ticker
+        elif ev["error"] is not None:
+            print(f"\n  skipped {ev['ticker']}: {ev['error']}")
+        if ev["result"] is not None:
+            (etf_results if ev["etf"] else stock_results).append(ev["result"])
+        table_stale |= ev["top_changed"]
+        best = ev["top_stocks"][0] if ev["top_stocks"] else None
+        lead = f" | best so far: {best['Ticker']} ({best['Setup']}, {best['Score']})" if best else ""
+        print(f"[{ev['done']}/{ev['total']}] scanning {ev['ticker']}...{lead}", end="\r")
+        # Long scans: every LIVE_TABLE_SECONDS, show the running leaders
+        # rather than leaving them all to the end.
+        if table_stale and time.monotonic() - last_table >= LIVE_TABLE_SECONDS:
+            print(f"\n--- Top {live_n} stocks so far ({ev['done']}/{ev['total']} scanned) ---")
+            for res in ev["top_stocks"]:
+                print(f"  {res['Ticker']:<6} {res['Setup']:<10} {res['ChecklistPassCount']}/5  "
+                      f"score {res['Score']:>3}  {res['Sector']}")
+            last_table, table_stale = time.monotonic(), False
+    if journal is not None:
+        journal.close()
+
+    # Workers finish out of order (and resumed results come first); restore
+    # input order so ties sort the same way every run.
+    stock_results.sort(key=lambda r: order.get(r["Ticker"], 0))
+    etf_results.sort(key=lambda r: order.get(r["Ticker"], 0))
+    skipped_weak_sector = len(plan["weak_sector"]) + stats["weak_sector"]
+    skipped_beta, skipped_no_signal = stats["beta"], stats["no_signal"]
+    skipped_no_vol_spike, skipped_checklist = stats["no_vol_spike"], stats["checklist"]
+    no_data = stats["no_data"]
 
     print()  # newline after progress
     if only_strong_sectors and skipped_weak_sector:
@@ -882,6 +2178,40 @@ def run_scan(tickers, top_n=None, only_strong_sectors=True, min_beta=1.0, only_a
         print(f"Skipped {skipped_no_vol_spike} stocks without a {RECENT_VOLUME_SPIKE_MULT}x+ volume spike.")
     if require_full_checklist and skipped_checklist:
         print(f"Skipped {skipped_checklist} stocks that didn't pass all 5 checklist steps.")
+    if prefilter_stats is not None and prefilter_stats["dropped"]:
+        print(f"Stage one skipped {prefilter_stats['dropped']} of {prefilter_stats['checked']} stocks that could "
+              f"not pass the filters above, without downloading their full history.")
+    print_dead_ticker_summary(dead, no_data)
+    options = {"tickers": len(order), "only_strong_sectors": only_strong_sectors, "min_beta": min_beta,
+               "only_actionable": only_actionable, "require_volume_spike": require_volume_spike,
+               "require_full_checklist": require_full_checklist}
+    store = get_signal_store()
+    if store is not None:
+        store.append(stock_results + etf_results, get_provider().today(), source="cli", options=options)
+        print(f"Recorded {len(stock_results) + len(etf_results)} results in the signal history "
+              f"(query it with signal_store.py).")
+    if snapshots is not None:
+        current = scan_diff.make_snapshot(journal.entries, [r["Ticker"] for r in stock_results + etf_results],
+                                          universe, context, get_provider().today(), options=options)
+        if previous is not None:
+            changes = scan_diff.diff_scans(previous, current)
+            if previous["options"] != options:
+                print("(The previous scan used different filters; some changes below come from that)")
+            if diff:
+                print(f"\n=== Changes since the previous scan ({previous['as_of']}) ===")
+                print("\n".join(scan_diff.format_changes(changes)) or "  No changes.")
+            elif changes:
+                print(f"{len(changes)} changes since the previous scan ({previous['as_of']}): "
+                      f"{scan_diff.count_changes(changes)} — run with --diff to list them.")
+        snapshots.save(current)
+    if CONTROLLER.summary():
+        print(CONTROLLER.summary())
+    if memo is not None and memo.summary():
+        print(memo.summary())
+    if download_failed:
+        print(f"{len(download_failed)} tickers could not be downloaded even after retries "
+              f"(throttling / timeouts): {', '.join(download_failed[:15])}{' ...' if len(download_failed) > 15 else ''}"
+              f" — rerun with --resume to retry just those.")
     if not stock_results and not etf_results:
         print("No results.")
         return
@@ -901,8 +2231,9 @@ def run_scan(tickers, top_n=None, only_strong_sectors=True, min_beta=1.0, only_a
             ["ChecklistPassCount", "Score"], ascending=[False, False])
         if top_n:
             df_out = df_out.head(top_n)
-        print(f"\n=== {label} ===")
-        print(_fmt_price_cols(df_out)[display_cols].to_string(index=False))
+        if not diff:  # a --diff scan prints only the changes; the CSVs stay complete
+            print(f"\n=== {label} ===")
+            print(_fmt_price_cols(df_out)[display_cols].to_string(index=False))
         export_df = df_out.copy()
         export_df["Reasons"] = export_df["Reasons"].apply(lambda r: " | ".join(r))
         export_df["Checklist"] = export_df["Checklist"].apply(
@@ -914,7 +2245,7 @@ def run_scan(tickers, top_n=None, only_strong_sectors=True, min_beta=1.0, only_a
     stocks_df = show_and_save(stock_results, "STOCKS", "screener_results_stocks.csv", sort_by_setup=True)
     etfs_df = show_and_save(etf_results, "ETFs", "screener_results_etfs.csv")
 
-    if stocks_df is not None:
+    if stocks_df is not None and not diff:
         print("\n=== Top 5 stocks — full explanation ===")
         for _, row in stocks_df.head(5).iterrows():
             print(f"\n{row['Ticker']}  |  Score: {row['Score']}  |  Setup: {row['Setup']}  |  Sector: {row['Sector']}")
@@ -955,21 +2286,85 @@ def parse_args():
                     help="Only include stocks passing ALL 5 steps of the Murphy Playbook checklist "
                          "(macro, sector, trend & support, candlestick, risk management) — the tightest "
                          "filter, for a narrow 3-5 stock watchlist (off by default)")
+    p.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                    help=f"Number of concurrent download workers (default: {DEFAULT_JOBS}; "
+                         "all workers share one rate limit). With live data this is only the starting "
+                         f"point: concurrency then adapts between 1 and {MAX_JOBS} to how hard Yahoo is "
+                         "throttling, see scan_engine.py")
+    p.add_argument("--score-processes", type=int, default=0,
+                    help="Score tickers on a pool of N worker processes (CPU-bound indicator math; "
+                         "worthwhile for large, already-cached scans). Default: 0 = score inline")
+    p.add_argument("--incremental", action="store_true",
+                    help="Keep per-ticker indicator state on disk and only process bars added since the "
+                         "last scan (near-zero CPU for repeat scans; scores inline, ignores --score-processes)")
+    p.add_argument("--two-stage", action="store_true",
+                    help="Screen stocks on a short recent-quote window first and only download full history "
+                         "for those that could still pass the setup/volume-spike/checklist filters (never "
+                         "drops a stock the full scan would keep; see prefilter.py)")
+    p.add_argument("--resume", action="store_true",
+                    help="Continue an interrupted scan from its checkpoint journal "
+                         "(.murphy_cache/journal/): only tickers that hadn't finished — or failed — are "
+                         "fetched and scored, then merged with the saved results. Without this flag every "
+                         "scan starts a fresh journal, or keeps none with --no-cache or offline data")
+    p.add_argument("--input-order", action="store_true",
+                    help="Fetch and score tickers in the order given instead of most-relevant first "
+                         "(strong sector, recent Buy Zone setups, last score and dollar volume from earlier "
+                         "scans); the final tables are the same either way")
+    p.add_argument("--diff", action="store_true",
+                    help="Show only what changed since the previous scan (new and dropped names, new Buy Zone "
+                         "setups, checklist steps gained or lost, new volume spikes) instead of the full "
+                         "tables, and reuse the previous result of every ticker whose latest bar hasn't "
+                         "changed (nor, by a fingerprint, its last 60 bars — so recent split/dividend "
+                         "adjustments force a rescore; see scan_diff.py; needs the on-disk cache)")
+    p.add_argument("--plan", action="store_true",
+                    help="Dry run: show which tickers the pre-fetch filters (strong sectors, ETF "
+                         "classification, dead-ticker list) would skip and how many downloads that saves, "
+                         "then exit without downloading any stock history")
+    p.add_argument("--no-cache", action="store_true",
+                    help="Ignore the on-disk price cache and download full history for every ticker")
+    p.add_argument("--no-history", action="store_true",
+                    help="Don't record this scan's results in the signal history (.murphy_cache/signals.sqlite)")
+    source = p.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="DIR",
+                        help="Run fully offline against market data previously captured with --record DIR")
+    source.add_argument("--record", metavar="DIR",
+                        help="Fetch live data as usual, and capture every response to DIR for later --replay")
+    source.add_argument("--synthetic", action="store_true",
+                        help="Run against deterministic synthetic prices (no network; for benchmarks/testing)")
+    p.add_argument("--batch-size", type=int, default=BATCH_CHUNK_SIZE,
+                    help=f"Tickers per price-history download request (default: {BATCH_CHUNK_SIZE})")
     return p.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
+    if args.no_cache:
+        PRICE_CACHE_ENABLED = False
+    if args.no_history:
+        SIGNAL_HISTORY_ENABLED = False
+    if args.replay:
+        set_provider(ReplayProvider(args.replay))
+    elif args.record:
+        set_provider(ReplayProvider(args.record, upstream=get_provider()))
+    elif args.synthetic:
+        set_provider(SyntheticProvider())
     if args.file:
         with open(args.file) as f:
             tickers = [line.strip().upper() for line in f if line.strip()]
     elif args.tickers:
         tickers = [t.upper() for t in args.tickers]
     else:
-        tickers = get_universe_tickers(args.universe, args.count)
+        tickers = get_universe_tickers(args.universe, args.count, skip_dead=False)  # the planner skips them
 
-    run_scan(tickers, top_n=args.top, only_strong_sectors=not args.all_sectors,
-              min_beta=(None if args.min_beta < 0 else args.min_beta),
-              only_actionable=not args.all_setups,
-              require_volume_spike=args.require_volume_spike,
-              require_full_checklist=args.full_checklist_only)
+    try:
+        run_scan(tickers, top_n=args.top, only_strong_sectors=not args.all_sectors,
+                  min_beta=(None if args.min_beta < 0 else args.min_beta),
+                  only_actionable=not args.all_setups,
+                  require_volume_spike=args.require_volume_spike,
+                  require_full_checklist=args.full_checklist_only,
+                  chunk_size=args.batch_size, jobs=args.jobs, processes=args.score_processes,
+                  incremental=args.incremental, dry_run=args.plan, two_stage=args.two_stage,
+                  resume=args.resume, schedule=not args.input_order, diff=args.diff)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Finished tickers are checkpointed; rerun with --resume to continue.")
+        sys.exit(130)
@@ -0,0 +1,302 @@
+"""
+panel_scoring.py
+Vectorized, cross-sectional version of murphy_screener.score_stock.
+
+score_stock recomputes every indicator one ticker at a time with pandas
+Series ops. score_panel instead stacks every ticker's Open/High/Low/Close/
+Volume into 2-D NumPy arrays (bars x tickers) and computes the 50/200-day
+MAs, 52-week high, Bollinger width percentile, RSI, MACD, volume ratios,
+candlestick patterns, trend points and stop/target for the whole universe
+in one pass. It returns the same numeric/label columns score_stock does
+(Score, Setup, ChecklistPassCount, StopLoss, Target, R:R, ...) as one
+DataFrame — everything except the plain-English Reasons/Checklist text,
+which still comes from score_stock for the tickers you actually display.
+
+The panel is aligned on each ticker's *latest bar* (row -1 is every
+ticker's most recent bar, shorter histories are NaN-padded at the top),
+which for a normal daily scan is the same thing as a dates x tickers
+panel, and matches score_stock exactly even when a ticker has gaps.
+
+run_scan does not use it: every listed result needs score_stock's
+Reasons/Checklist anyway, and scan scoring already batches betas and
+memoizes (score_scan_inputs). score_panel is the reference for what a fully
+vectorized scorer costs; tests/test_panel_scoring.py holds it to parity with
+score_stock, and `python panel_scoring.py` times the two on synthetic data
+(no network needed).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import murphy_screener as ms
+
+
+PANEL_COLUMNS = ["Ticker", "AssetType", "Sector", "Setup", "Beta", "VolumeSpike", "VolumeSpikeRatio",
+                 "VolumeSpikeDay", "Score", "Price", "StopLoss", "Target", "R:R", "RSI", "SectorRank",
+                 "ChecklistPassCount"]
+
+
+def build_panel(histories):
+    """Stack {ticker: OHLCV DataFrame} into a dict of (bars x tickers) float
+    arrays, right-aligned on each ticker's latest bar. Returns (tickers,
+    panel, lengths) where lengths[j] is ticker j's real bar count."""
+    tickers = [t for t, df in histories.items() if df is not None and len(df)]
+    lengths = np.array([len(histories[t]) for t in tickers], dtype=np.int64)
+    n_bars = int(lengths.max()) if len(lengths) else 0
+    stacked = np.full((len(ms.OHLCV_COLUMNS), n_bars, len(tickers)), np.nan)
+    for j, t in enumerate(tickers):
+        df = histories[t]
+        # one block copy + positional pick; much cheaper than df[columns] per ticker
+        values = df.to_numpy(dtype=np.float64)[:, df.columns.get_indexer(ms.OHLCV_COLUMNS)]
+        stacked[:, n_bars - len(values):, j] = values.T
+    panel = {col: stacked[k] for k, col in enumerate(ms.OHLCV_COLUMNS)}
+    return tickers, panel, lengths
+
+
+def _tail_mean(x, window):
+    """Mean of the last `window` bars per column (NaN if any are missing),
+    i.e. the last value of series.rolling(window).mean()."""
+    if len(x) < window:
+        return np.full(x.shape[1], np.nan)
+    return x[-window:].mean(axis=0)
+
+
+def _ewm(x, alpha, min_periods=0):
+    """Column-wise pandas-style ewm(alpha=..., adjust=False).mean() over a
+    top-NaN-padded (bars x tickers) array."""
+    out = np.full_like(x, np.nan)
+    state = np.full(x.shape[1], np.nan)
+    count = np.zeros(x.shape[1], dtype=np.int64)
+    for i in range(len(x)):
+        xi = x[i]
+        valid = ~np.isnan(xi)
+        state = np.where(np.isnan(state), xi, np.where(valid, (1 - alpha) * state + alpha * xi, state))
+        count += valid
+        out[i] = np.where(count >= min_periods, state, np.nan)
+    return out
+
+
+def _rsi_last(close, window=14):
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    gain = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    loss = np.where(np.isnan(delta), np.nan, -np.clip(delta, None, 0))
+    avg_gain = _ewm(gain, 1 / window, min_periods=window)[-1]
+    avg_loss = _ewm(loss, 1 / window, min_periods=window)[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / np.where(avg_loss == 0, np.nan, avg_loss)
+        out = 100 - (100 / (1 + rs))
+    return np.where(np.isnan(out), 50.0, out)
+
+
+def _macd_tail(close, fast=12, slow=26, signal=9, bars=3):
+    """Last `bars` values of (macd_line, signal_line, hist)."""
+    ema_fast = _ewm(close, 2 / (fast + 1))
+    ema_slow = _ewm(close, 2 / (slow + 1))
+    macd_line = ema_fast - ema_slow
+    signal_line = _ewm(macd_line, 2 / (signal + 1))
+    return macd_line[-bars:], signal_line[-bars:], (macd_line - signal_line)[-bars:]
+
+
+def _squeeze_last(close, bb_window=20, rank_window=120, q=0.2):
+    """width[-1] <= rolling(rank_window).quantile(q)[-1] for the Bollinger
+    width series, evaluated for every column at once."""
+    need = bb_window + rank_window - 1
+    if len(close) < need:
+        return np.zeros(close.shape[1], dtype=bool)
+    windows = sliding_window_view(close[-need:], bb_window, axis=0)  # (rank_window, tickers, bb_window)
+    mid = windows.mean(axis=-1)
+    std = windows.std(axis=-1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        width = (4 * std) / mid
+    thresh = ms.rolling_quantile_last(width, rank_window, q)  # NaN if any width in the window is missing
+    return width[-1] <= thresh
+
+
+def _round_or_none(v, digits):
+    return round(float(v), digits) if not np.isnan(v) else None
+
+
+def score_panel(histories, sectors, etf_flags, sector_leaderboard, regime, spy_close=None):
+    """Score every ticker in `histories` ({ticker: OHLCV DataFrame}) in one
+    vectorized pass. `sectors` / `etf_flags` map ticker -> sector name /
+    bool (missing = not an ETF). Returns a DataFrame with PANEL_COLUMNS, one
+    row per ticker with data, in the same order as `histories`; values match
+    score_stock for the same inputs."""
+    tickers, panel, lengths = build_panel(histories)
+    if not tickers:
+        return pd.DataFrame(columns=PANEL_COLUMNS)
+    o, h, l, c, v = (panel[k] for k in ms.OHLCV_COLUMNS)
+    is_etf = np.array([bool(etf_flags.get(t, False)) for t in tickers])
+    n_bars = len(c)
+    cols = np.arange(len(tickers))
+
+    last_close = c[-1]
+    beta = ms.beta_matrix({t: histories[t] for t in tickers}, spy_close).to_numpy()
+
+    # --- 1. trend template --------------------------------------------------
+    ma50, ma200 = _tail_mean(c, 50), _tail_mean(c, 200)
+    week52_high = c[-252:].max(axis=0) if n_bars >= 252 else np.full(len(tickers), np.nan)
+    week52_high = np.where(lengths >= 252, week52_high, np.nan)
+    first_row = n_bars - lengths
+    price_52w_ago = np.where(lengths >= 252, c[n_bars - 252] if n_bars >= 252 else np.nan, c[first_row, cols])
+    trend_pts = (np.where(last_close > price_52w_ago, 8, 0)
+                 + np.where((last_close > ma50) & (last_close > ma200), 10, 0)
+                 + np.where(ma50 > ma200, 4, 0)
+                 + np.where(last_close >= week52_high * 0.75, 3, 0))
+    score = np.minimum(trend_pts, 25).astype(np.float64)
+
+    # --- 2. near-MA50 pullback + volume spike ratios -------------------------
+    avg_vol20 = _tail_mean(v, 20)
+    vol_today, vol_yesterday = v[-1], v[-2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_today = np.where(avg_vol20 > 0, vol_today / avg_vol20, np.nan)
+        ratio_yesterday = np.where((avg_vol20 > 0) & ~np.isnan(vol_yesterday), vol_yesterday / avg_vol20, np.nan)
+        dist_from_ma50 = np.abs(last_close - ma50) / ma50
+    use_today = np.isnan(ratio_yesterday) | (~np.isnan(ratio_today) & (ratio_today >= ratio_yesterday))
+    spike_ratio = np.where(use_today, ratio_today, ratio_yesterday)
+    spike_flag = ~np.isnan(spike_ratio) & (spike_ratio >= ms.RECENT_VOLUME_SPIKE_MULT)
+
+    near_ma50 = (dist_from_ma50 <= ms.NEAR_MA50_PCT) & (last_close >= ma50 * 0.98)
+    support = near_ma50.copy()
+    score += np.where(near_ma50, 5, 0) + np.where(near_ma50 & (vol_today >= avg_vol20 * 1.3), 5, 0)
+
+    # --- 3. Bollinger setup ----------------------------------------------------
+    squeeze = _squeeze_last(c)
+    std20 = c[-20:].std(axis=0, ddof=1)
+    lower_band = _tail_mean(c, 20) - 2 * std20
+    lower_touch = (last_close <= lower_band * 1.02) & (last_close > ma200)
+    support |= lower_touch
+    score += np.minimum(np.where(squeeze, 6, 0) + np.where(lower_touch, 4, 0), 10)
+
+    # --- 4. candlesticks ---------------------------------------------------------
+    candle_masks = ms.candle_pattern_masks(o[-3:], h[-3:], l[-3:], c[-3:])
+    candle = np.logical_or.reduce([mask[-1] for mask in candle_masks.values()])
+    score += np.where(candle, 10, 0)
+
+    # --- 5. unusual volume day ---------------------------------------------------
+    volume_signal = (avg_vol20 > 0) & (vol_today >= avg_vol20 * ms.VOLUME_SPIKE_MULT)
+    day_range = h[-1] - l[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        closes_high = (day_range > 0) & ((last_close - l[-1]) / day_range >= 0.7)
+    score += np.where(volume_signal, 7, 0) + np.where(volume_signal & closes_high, 3, 0)
+
+    # --- 6. RSI / 7. MACD ----------------------------------------------------------
+    rsi_val = _rsi_last(c)
+    score += np.select([(rsi_val >= 50) & (rsi_val <= 70), (rsi_val >= 40) & (rsi_val < 50), rsi_val > 70],
+                       [10, 5, 3], 0)
+    macd_line, signal_line, hist = _macd_tail(c)
+    macd_up = macd_line[-1] > signal_line[-1]
+    score += np.where(macd_up, 6, 0) + np.where(macd_up & (hist[-1] > hist[-2]) & (hist[-2] > hist[-3]), 4, 0)
+
+    # --- 8. sector leadership / 9. regime alignment (stocks only) -------------------
+    n_sectors = len(sector_leaderboard)
+    favored = set(regime.get("favored_sectors", []))
+    sector_rank = np.full(len(tickers), np.nan)
+    sector_pts = np.zeros(len(tickers))
+    macro_pts = np.zeros(len(tickers))
+    for j, t in enumerate(tickers):
+        if is_etf[j]:
+            continue
+        sector = sectors.get(t)
+        etf_for_sector = ms.SECTOR_ETFS.get(sector)
+        if etf_for_sector and etf_for_sector in sector_leaderboard:
+            rank = sector_leaderboard[etf_for_sector]["rank"]
+            sector_rank[j] = rank
+            if rank <= max(1, n_sectors // 3):
+                sector_pts[j] = 10
+            elif rank <= n_sectors * 2 // 3:
+                sector_pts[j] = 5
+        if sector in favored:
+            macro_pts[j] = 5
+    score += sector_pts + macro_pts
+    score = np.where(is_etf, score * 100 / 85, score)
+
+    # --- stop loss / target ------------------------------------------------------------
+    recent_low = l[-ms.BREAKOUT_LOOKBACK:].min(axis=0)
+    stop_loss = np.where(ma50 < recent_low, ma50, recent_low) * 0.98
+    risk = last_close - stop_loss
+    upside = (week52_high - last_close) * 0.5
+    target = last_close + np.where(upside > risk * 2.5, upside, risk * 2.5)
+    target = np.where((week52_high > last_close) & (week52_high > target), week52_high, target)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rr_ratio = np.where(risk > 0, (target - last_close) / risk, np.nan)
+
+    # --- setup tier + checklist -----------------------------------------------------------
+    buy_zone = support | candle | volume_signal | spike_flag
+    watch = squeeze | (trend_pts >= 18)
+    setup = np.where(buy_zone, "Buy Zone", np.where(watch, "Watchlist", "No Signal"))
+    passes = (int(bool(regime.get("risk_on", True)))
+              + np.where(is_etf, 1, sector_pts == 10).astype(int)
+              + ((trend_pts >= 18) & support).astype(int)
+              + candle.astype(int)
+              + (~np.isnan(rr_ratio) & (rr_ratio >= 2.0)).astype(int))
+
+    rows = []
+    for j, t in enumerate(tickers):
+        rows.append({
+            "Ticker": t,
+            "AssetType": "ETF" if is_etf[j] else "Stock",
+            "Sector": "ETF" if is_etf[j] else sectors.get(t),
+            "Setup": str(setup[j]),
+            "Beta": _round_or_none(beta[j], 2),
+            "VolumeSpike": bool(spike_flag[j]),
+            "VolumeSpikeRatio": _round_or_none(spike_ratio[j], 2),
+            "VolumeSpikeDay": ("Today" if use_today[j] else "Yesterday") if spike_flag[j] else None,
+            "Score": round(float(score[j]), 1),
+            "Price": round(float(last_close[j]), 2),
+            "StopLoss": round(float(stop_loss[j]), 2),
+            "Target": round(float(target[j]), 2),
+            "R:R": _round_or_none(rr_ratio[j], 2),
+            "RSI": round(float(rsi_val[j]), 1),
+            "SectorRank": None if np.isnan(sector_rank[j]) else int(sector_rank[j]),
+            "ChecklistPassCount": int(passes[j]),
+        })
+    return pd.DataFrame(rows, columns=PANEL_COLUMNS)
+
+
+def parity_report(histories, sectors, etf_flags, sector_leaderboard, regime, spy_close=None,
+                  columns=("Score", "Setup", "ChecklistPassCount", "StopLoss", "Target", "R:R", "Beta", "RSI")):
+    """Score the same inputs with score_panel and with score_stock one
+    ticker at a time; return (mismatches DataFrame, panel_seconds,
+    per_ticker_seconds). An empty mismatches frame means full parity."""
+    t0 = time.perf_counter()
+    panel = score_panel(histories, sectors, etf_flags, sector_leaderboard, regime, spy_close).set_index("Ticker")
+    panel_secs = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    rows = [ms.score_stock(t, df, sectors.get(t), sector_leaderboard, regime,
+                           is_etf=bool(etf_flags.get(t, False)), spy_close=spy_close)
+            for t, df in histories.items() if df is not None]
+    loop_secs = time.perf_counter() - t0
+    reference = pd.DataFrame(rows).set_index("Ticker")
+
+    mismatches = []
+    for t in reference.index:
+        for col in columns:
+            a, b = reference.at[t, col], panel.at[t, col]
+            same = (pd.isna(a) and pd.isna(b)) or a == b
+            if not same and isinstance(a, float) and isinstance(b, float):
+                same = abs(a - b) <= 0.011  # last-digit rounding of a 2-decimal value
+            if not same:
+                mismatches.append({"Ticker": t, "Column": col, "score_stock": a, "score_panel": b})
+    return pd.DataFrame(mismatches, columns=["Ticker", "Column", "score_stock", "score_panel"]), panel_secs, loop_secs
+
+
+if __name__ == "__main__":
+    from market_data import SyntheticProvider
+
+    ms.set_provider(SyntheticProvider())
+    tickers = ms.get_universe_tickers("all")
+    histories = ms.fetch_history_batch(tickers)
+    sectors = {t: ms.get_sector(t) for t in histories}
+    etf_flags = {t: ms.is_etf(t) for t in histories}
+    regime = ms.get_intermarket_regime()
+    leaderboard = ms.get_sector_leaderboard()
+    spy_close = ms.fetch_history(ms.BENCHMARK)["Close"]
+    mismatches, panel_secs, loop_secs = parity_report(histories, sectors, etf_flags, leaderboard, regime, spy_close)
+    print(f"{len(histories)} tickers: score_panel {panel_secs:.2f}s vs. score_stock loop {loop_secs:.2f}s "
+          f"({loop_secs / panel_secs:.1f}x faster)")
+    print("Parity: OK" if mismatches.empty else f"Parity: {len(mismatches)} mismatches\n{mismatches.to_string()}")
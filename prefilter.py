@@ -0,0 +1,157 @@
+"""
+prefilter.py
+Two-stage screening for the Murphy Screener: a cheap first pass over a
+short recent-quote window that drops stocks which cannot possibly survive
+run_scan's post-score filters, before paying for their full ~640-day
+history download and score_stock.
+
+Stage one only ever uses *necessary* conditions. With the default
+only_actionable filter a stock is kept unless every route to "Buy Zone" or
+"Watchlist" is ruled out:
+
+- bullish candle, unusual-volume day, 1.5x volume spike — exact: they only
+  need the last 20 bars;
+- MA50 support test — exact once the window holds 50 bars;
+- lower-Bollinger-band touch — the band is exact; the "above MA200" half is
+  ignored (it can only make the full path stricter);
+- squeeze — the width has to rank in the bottom 20% of the last 120 widths,
+  so it is ruled out when more than 24 of the widths we can see are already
+  narrower;
+- trend (trend_pts >= 18) — needs the close above MA50.
+
+--require-volume-spike and --full-checklist-only add their own necessary
+conditions (the spike itself; a candle plus a possible support test and
+uptrend). Comparisons are loosened by a relative 1e-9 in the "keep"
+direction, so rolling-sum rounding differences between the short and long
+windows can never flip a verdict. ETFs and tickers of unknown type always go
+through: run_scan's filters don't apply to ETFs.
+
+The network side runs through whatever fetch function the caller passes
+(`fetch_window`, `classify`; murphy_screener's own by default), so a caller
+whose provider / cache settings live in another module object — the CLI
+run as a script is `__main__`, not `murphy_screener` — stays in charge of
+where the quotes come from.
+
+tests/test_prefilter.py checks the guarantee: across synthetic universes
+and several as-of dates, no stock the full path keeps is dropped by stage
+one.
+"""
+
+import numpy as np
+
+import murphy_screener as ms
+from scan_engine import DEFAULT_JOBS, chunked, run_pool
+
+
+PREFILTER_PERIOD_DAYS = 100   # ~110 bars: MA50 plus ~90 Bollinger widths for the squeeze bound
+SQUEEZE_MAX_NARROWER = 24     # width <= 20th pct of 120 widths => at most 24 of them are narrower
+_SLACK = 1e-9
+
+
+def _le(a, b):
+    """a <= b, loosened by a relative 1e-9 (a stage-one comparison must
+    never be stricter than the same comparison on the full history)."""
+    return a <= b + _SLACK * (abs(a) + abs(b))
+
+
+def fetch_quotes(tickers, jobs=DEFAULT_JOBS, chunk_size=ms.BATCH_CHUNK_SIZE, period_days=PREFILTER_PERIOD_DAYS,
+                 fetch_window=None):
+    """Short-window OHLCV for every ticker (batched, concurrent, rate
+    limited like the full fetch stage). dict ticker -> DataFrame or None.
+    `fetch_window` is the screener's _fetch_window (the default) or an
+    equivalent (tickers, period_days, min_rows, chunk_size=) callable."""
+    fetch_window = fetch_window or ms._fetch_window
+
+    def work(chunk):
+        return fetch_window(chunk, period_days, 2, chunk_size=len(chunk))
+
+    quotes = {}
+    for part in run_pool(chunked(tickers, chunk_size, jobs), work, jobs=jobs):
+        quotes.update(part)
+    return quotes
+
+
+def could_pass(df, only_actionable=True, require_volume_spike=False, require_full_checklist=False):
+    """False only if the full scan is certain to filter this stock out under
+    the given run_scan filters; True whenever the short window can't rule it
+    out."""
+    if df is None or len(df) < 3:
+        return True  # nothing to judge on; let the full path decide
+    close = df["Close"].to_numpy(dtype=np.float64)
+    high = df["High"].to_numpy(dtype=np.float64)
+    low = df["Low"].to_numpy(dtype=np.float64)
+    vol = df["Volume"].to_numpy(dtype=np.float64)
+    n, last = len(close), close[-1]
+
+    masks = ms.candle_pattern_masks(df["Open"].to_numpy()[-3:], high[-3:], low[-3:], close[-3:])
+    candle = any(mask[-1] for mask in masks.values())
+
+    if n >= 20:
+        avg_vol20 = vol[-20:].mean()
+        volume_day = avg_vol20 > 0 and _le(avg_vol20 * ms.VOLUME_SPIKE_MULT, vol[-1])
+        spike = avg_vol20 > 0 and _le(avg_vol20 * ms.RECENT_VOLUME_SPIKE_MULT, max(vol[-1], vol[-2]))
+        window = close[-20:]
+        std20 = window.std(ddof=1)
+        band_touch = _le(last, (window.mean() - 2 * std20) * 1.02)
+    else:
+        volume_day = spike = band_touch = True
+
+    if n >= 50:
+        ma50 = close[-50:].mean()
+        near_ma50 = _le(abs(last - ma50) / ma50, ms.NEAR_MA50_PCT) and _le(ma50 * 0.98, last)
+        uptrend = _le(ma50, last)  # trend_pts >= 18 needs last > ma50
+    else:
+        near_ma50 = uptrend = True
+
+    if n >= 20 + 1:
+        _, _, _, width = ms.bollinger_bands(df["Close"])
+        widths = width.to_numpy()[19:]
+        cur = widths[-1]
+        narrower = np.count_nonzero(widths[:-1] < cur - _SLACK * abs(cur))
+        squeeze = narrower <= SQUEEZE_MAX_NARROWER
+    else:
+        squeeze = True
+
+    support = near_ma50 or band_touch
+    if only_actionable and not (support or candle or volume_day or spike or squeeze or uptrend):
+        return False
+    if require_volume_spike and not spike:
+        return False
+    if require_full_checklist and not (candle and support and uptrend):
+        return False
+    return True
+
+
+def prefilter(tickers, only_actionable=True, require_volume_spike=False, require_full_checklist=False,
+              jobs=DEFAULT_JOBS, chunk_size=ms.BATCH_CHUNK_SIZE, fetch_window=None, classify=None):
+    """Stage one of a two-stage scan. Returns (keep, stats): `keep` is the
+    tickers (in input order) that still need the full fetch + score, and
+    stats = {"checked", "dropped", "exempt", "no_quote"}. `fetch_window`
+    (see fetch_quotes) and `classify` (default: the screener's
+    known_classification) supply the data."""
+    classify = classify or ms.known_classification
+    stats = {"checked": 0, "dropped": 0, "exempt": 0, "no_quote": 0}
+    if not (only_actionable or require_volume_spike or require_full_checklist):
+        stats["exempt"] = len(tickers)
+        return list(tickers), stats
+
+    stocks = []
+    for t in tickers:
+        known = classify(t)
+        if known is None or known[0]:
+            stats["exempt"] += 1  # ETFs aren't filtered; unknown types might be ETFs
+        else:
+            stocks.append(t)
+    quotes = fetch_quotes(stocks, jobs=jobs, chunk_size=chunk_size, fetch_window=fetch_window)
+
+    dropped = set()
+    for t in stocks:
+        stats["checked"] += 1
+        df = quotes.get(t)
+        if df is None:
+            stats["no_quote"] += 1
+            continue
+        if not could_pass(df, only_actionable, require_volume_spike, require_full_checklist):
+            dropped.add(t)
+    stats["dropped"] = len(dropped)
+    return [t for t in tickers if t not in dropped], stats
@@ -0,0 +1,328 @@
+"""
+price_cache.py
+On-disk OHLCV cache for the Murphy Screener.
+
+One file per ticker (Parquet when pyarrow is installed — it ships with
+Streamlit — otherwise a pandas pickle), plus a tiny JSON sidecar recording
+how far back the cached history reaches and the date it was last refreshed.
+murphy_screener.py sits this behind fetch_history / fetch_recent_quote /
+fetch_history_batch: a ticker refreshed today is served straight from disk,
+and an older entry only downloads the bars after its last cached date.
+
+MetadataCache keeps the per-symbol sector / quoteType lookups that
+get_sector and is_etf need for tickers outside the embedded S&P data, so
+the slow, heavily throttled .info endpoint is hit once per symbol per
+month rather than on every scan; failed lookups are cached too, for a
+shorter time.
+
+DeadTickerRegistry remembers symbols that keep coming back with no usable
+history (delisted names still in the embedded universe lists), so scans
+skip them up front and only re-probe them once a month.
+
+PriorityStore remembers a few facts per ticker from earlier scans (dollar
+volume, last score and setup, how often it was in the Buy Zone) so the next
+scan can fetch and score the most relevant tickers first.
+
+ArrayStore keeps small derived NumPy tables (e.g. the point-in-time sector
+leaderboard and regime history in market_history.py) as .npz files, so they
+are rebuilt at most once per data day.
+
+The per-scan records (the resume journal and the last scan's snapshot)
+live in scan_journal.py, under the same cache directory.
+
+The cache lives in ./.murphy_cache next to this file by default; set the
+MURPHY_CACHE_DIR environment variable to put it somewhere else.
+"""
+
+import os
+import json
+import threading
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (only needed for the Parquet format)
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+
+METADATA_TTL_DAYS = 30        # sector / ETF classification rarely changes
+METADATA_NEGATIVE_TTL_DAYS = 7  # how long a failed lookup is remembered before retrying
+
+DEAD_AFTER_MISSES = 3           # empty fetches, on separate days, before a symbol is treated as dead
+DEAD_REPROBE_DAYS = 30          # how often a dead symbol is fetched again in case it came back
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "MURPHY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".murphy_cache"))
+
+
+def safe_filename(ticker):
+    """Make a ticker usable as a file name (e.g. 'ILS=X', '^VIX', 'BRK/B')."""
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in ticker.upper())
+
+
+def atomic_write_json(path, payload):
+    """Write JSON via a temp file + rename, so a concurrent reader (another
+    scan thread, or the dashboard) never sees a half-written file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, default=json_default)
+    os.replace(tmp, path)
+
+
+class PriceCache:
+    """Per-ticker OHLCV store. Entries are (DataFrame, meta) where meta is
+    {"covered_from": ISO date the history was requested from,
+     "refreshed": ISO date of the last successful download}."""
+
+    def __init__(self, root=None):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "ohlcv")
+        self.ext = ".parquet" if _PARQUET else ".pkl"
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, ticker):
+        base = os.path.join(self.root, safe_filename(ticker))
+        return base + self.ext, base + ".json"
+
+    def load(self, ticker):
+        """Return (df, meta) for a cached ticker, or (None, None) on a miss
+        or an unreadable/corrupt entry."""
+        data_path, meta_path = self._paths(ticker)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            df = pd.read_parquet(data_path) if _PARQUET else pd.read_pickle(data_path)
+        except Exception:
+            return None, None
+        if df is None or df.empty:
+            return None, None
+        return df, meta
+
+    def save(self, ticker, df, covered_from, refreshed=None):
+        data_path, meta_path = self._paths(ticker)
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        tmp = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if _PARQUET:
+            df.to_parquet(tmp)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, data_path)
+        atomic_write_json(meta_path, {
+            "covered_from": pd.Timestamp(covered_from).date().isoformat(),
+            "refreshed": (refreshed or dt.date.today()).isoformat(),
+        })
+
+    def mark_refreshed(self, ticker, meta, refreshed=None):
+        """Record a refresh that produced no new bars (weekend, holiday)."""
+        _, meta_path = self._paths(ticker)
+        atomic_write_json(meta_path, {**meta, "refreshed": (refreshed or dt.date.today()).isoformat()})
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+
+class MetadataCache:
+    """Per-symbol metadata store: one JSON file per ticker holding
+    {"sector", "quoteType", "fetched": ISO date, "ok": bool}. Entries with
+    ok=False record a failed lookup (negative caching) and expire after
+    negative_ttl_days instead of ttl_days."""
+
+    def __init__(self, root=None, ttl_days=METADATA_TTL_DAYS, negative_ttl_days=METADATA_NEGATIVE_TTL_DAYS):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "meta")
+        self.ttl_days = ttl_days
+        self.negative_ttl_days = negative_ttl_days
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ticker):
+        return os.path.join(self.root, safe_filename(ticker) + ".json")
+
+    def load(self, ticker, today=None):
+        """The cached entry for `ticker`, or None on a miss, an expired entry
+        or an unreadable file."""
+        try:
+            with open(self._path(ticker)) as f:
+                entry = json.load(f)
+            fetched = dt.date.fromisoformat(entry["fetched"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        ttl = self.ttl_days if entry.get("ok") else self.negative_ttl_days
+        if ((today or dt.date.today()) - fetched).days >= ttl:
+            return None
+        return entry
+
+    def save(self, ticker, sector, quote_type, ok=True, fetched=None):
+        entry = {"sector": sector, "quoteType": quote_type,
+                 "fetched": (fetched or dt.date.today()).isoformat(), "ok": bool(ok)}
+        atomic_write_json(self._path(ticker), entry)
+        return entry
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+
+class DeadTickerRegistry:
+    """Symbols whose history fetch keeps returning nothing (or too little to
+    score). Stored as one JSON file, {ticker: {"misses", "last_miss",
+    "last_probe"}}; a ticker with `dead_after` misses on separate days is
+    dead until its last probe is `reprobe_days` old, when one scan tries it
+    again. Any successful fetch removes it. Thread-safe; call save() to
+    persist."""
+
+    def __init__(self, root=None, dead_after=DEAD_AFTER_MISSES, reprobe_days=DEAD_REPROBE_DAYS):
+        self.path = os.path.join(root or DEFAULT_CACHE_DIR, "dead_tickers.json")
+        self.dead_after = dead_after
+        self.reprobe_days = reprobe_days
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def is_dead(self, ticker, today=None):
+        entry = self._entries.get(ticker)
+        if entry is None or entry["misses"] < self.dead_after:
+            return False
+        last_probe = dt.date.fromisoformat(entry["last_probe"])
+        return ((today or dt.date.today()) - last_probe).days < self.reprobe_days
+
+    def dead_tickers(self, today=None):
+        return [t for t in self._entries if self.is_dead(t, today)]
+
+    def record_miss(self, ticker, today=None):
+        """Record an empty/short fetch. Repeat misses on the same day count
+        once. Returns True if the ticker is (now) dead."""
+        today = (today or dt.date.today()).isoformat()
+        with self._lock:
+            entry = self._entries.setdefault(ticker, {"misses": 0, "last_miss": None, "last_probe": today})
+            if entry["last_miss"] != today:
+                entry["misses"] += 1
+                entry["last_miss"] = today
+            entry["last_probe"] = today
+            self._dirty = True
+            return entry["misses"] >= self.dead_after
+
+    def record_hit(self, ticker):
+        if ticker in self._entries:
+            with self._lock:
+                self._entries.pop(ticker, None)
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = dict(self._entries)
+            self._dirty = False
+        atomic_write_json(self.path, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._dirty = True
+        self.save()
+
+
+PRIORITY_BUY_ZONE_ALPHA = 0.2   # weight of the latest scan day in the Buy Zone frequency (EWMA)
+
+
+class PriorityStore:
+    """Per-ticker scheduling signals from earlier scans, one JSON file:
+    {ticker: {"dollar_volume", "score", "setup", "buy_zone_rate", "day"}}.
+    buy_zone_rate is an exponentially weighted share of scan days on which
+    the ticker was in the Buy Zone, updated at most once per day. Thread-safe;
+    call save() to persist."""
+
+    def __init__(self, root=None, alpha=PRIORITY_BUY_ZONE_ALPHA):
+        self.path = os.path.join(root or DEFAULT_CACHE_DIR, "priority.json")
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def record_liquidity(self, ticker, dollar_volume):
+        with self._lock:
+            self.entries.setdefault(ticker, {})["dollar_volume"] = float(dollar_volume)
+            self._dirty = True
+
+    def record_result(self, ticker, score, setup, today=None):
+        today = (today or dt.date.today()).isoformat()
+        in_buy_zone = 1.0 if setup == "Buy Zone" else 0.0
+        with self._lock:
+            entry = self.entries.setdefault(ticker, {})
+            if "buy_zone_rate" not in entry:
+                entry["buy_zone_rate"] = in_buy_zone
+            elif entry.get("day") != today:
+                entry["buy_zone_rate"] += self.alpha * (in_buy_zone - entry["buy_zone_rate"])
+            entry.update(score=score, setup=setup, day=today)
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {t: dict(e) for t, e in self.entries.items()}
+            self._dirty = False
+        atomic_write_json(self.path, payload)
+
+
+class ArrayStore:
+    """Named sets of NumPy arrays, one <root>/arrays/<name>.npz each, stamped
+    with a key (any JSON-able value: as-of date, data provider, options).
+    load() only returns arrays saved under an equal key, so a stale or
+    foreign entry is simply rebuilt."""
+
+    def __init__(self, root=None):
+        self.root = os.path.join(root or DEFAULT_CACHE_DIR, "arrays")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, name + ".npz")
+
+    def load(self, name, key):
+        """{array name: array} saved under `key`, or None."""
+        try:
+            with np.load(self._path(name), allow_pickle=False) as data:
+                if json.loads(str(data["__key__"])) != key:
+                    return None
+                return {k: data[k] for k in data.files if k != "__key__"}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, name, key, arrays):
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(tmp, __key__=np.array(json.dumps(key)), **arrays)
+        os.replace(tmp, path)
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.root, name))
+
+
+def json_default(obj):
+    """json.dump fallback for NumPy scalars that slip into score results."""
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,174 @@
+"""
+scan_diff.py
+Scan-to-scan diff for the Murphy Screener: what changed since the previous
+scan — new entrants and drop-outs, new Buy Zone names, checklist steps won
+or lost, fresh volume spikes — instead of eyeballing two CSVs.
+
+Every finished scan (CLI or dashboard, with the on-disk cache enabled) is
+saved as a snapshot (scan_journal.ScanSnapshot): each scanned ticker's
+outcome and full result, the last bar it was scored on (date, close,
+volume and a digest of the trailing window, see murphy_screener.last_bar),
+which tickers made the final lists, and a fingerprint of the
+market context the scores depended on. diff_scans compares two snapshots by
+ticker and returns only the deltas.
+
+A diff scan (`--diff`) also makes the morning rescan cheap: reuse_unchanged
+takes one batched short-window quote pass (prefilter.fetch_quotes) and,
+when the context fingerprint still matches, hands back the previous results
+of every ticker whose latest bar and trailing window haven't changed. Only
+the rest are fetched in full and rescored. The window is the last
+ms.BAR_CHECK_WINDOW bars, not the whole history: an adjustment issued since
+the previous scan restates the bars before its ex-date and so shows up in
+it, but a restatement confined to older bars alone (rare outside data
+corrections) would go unnoticed until the next scan with new data.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+import murphy_screener as ms
+
+
+# change kinds, in display order
+CHANGES = {
+    "new": "NEW",
+    "buy_zone": "BUY ZONE",
+    "volume_spike": "VOL SPIKE",
+    "gained_step": "+STEP",
+    "lost_step": "-STEP",
+    "left_buy_zone": "LEFT BUY ZONE",
+    "dropped": "DROPPED",
+}
+
+
+def context_fingerprint(sector_leaderboard, regime, spy_close=None, min_beta=None):
+    """Short hash of everything outside a ticker's own bars that its scan
+    result depends on: the sector ranks, the regime call, SPY's closes
+    (beta; all of them, adjustments included) and the beta cutoff (below it
+    only a stub is scored)."""
+    payload = {
+        "ranks": sorted((etf, info["rank"]) for etf, info in sector_leaderboard.items()),
+        "risk_on": bool(regime.get("risk_on", True)),
+        "favored": sorted(regime.get("favored_sectors", [])),
+        "spy": ([str(spy_close.index[-1].date()), len(spy_close),
+                 hashlib.sha1(np.round(spy_close.to_numpy(dtype=np.float64), 4).tobytes()).hexdigest()]
+                if spy_close is not None and len(spy_close) else None),
+        "min_beta": min_beta,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def make_snapshot(journal_entries, listed, universe, context, as_of, options=None):
+    """A snapshot from a finished scan's journal entries (ticker -> journal
+    line): {"as_of", "context", "options", "universe": the tickers the scan
+    was asked for, "listed": those in its final lists, "tickers": {ticker:
+    {"status", "etf", "bar", "result"}} for every ticker it fetched}."""
+    return {
+        "as_of": str(as_of),
+        "context": context,
+        "options": options or {},
+        "universe": sorted(set(universe)),
+        "listed": sorted(set(listed)),
+        "tickers": {t: {"status": e["status"], "etf": e.get("etf"), "bar": e.get("bar"), "result": e.get("result")}
+                    for t, e in journal_entries.items()},
+    }
+
+
+def reuse_unchanged(tickers, previous, context, jobs=ms.DEFAULT_JOBS, chunk_size=ms.BATCH_CHUNK_SIZE,
+                    fetch_window=None):
+    """Split `tickers` into (reused, remaining). `reused` are journal-style
+    entries {"ticker", "status": "scored", "etf", "result", "bar"} carried
+    over from the `previous` snapshot for tickers whose latest bar and
+    trailing-window digest (ms.last_bar of one batched short-window quote
+    fetch) are the ones they were scored on; every
+    other ticker is in `remaining`, in order. Nothing is reused when the
+    context fingerprint differs. `fetch_window` is passed on to
+    prefilter.fetch_quotes."""
+    if not previous or previous.get("context") != context:
+        return [], list(tickers)
+    candidates = [t for t in tickers if (previous["tickers"].get(t) or {}).get("status") == "scored"
+                  and previous["tickers"][t].get("bar")]
+    import prefilter
+    quotes = prefilter.fetch_quotes(candidates, jobs=jobs, chunk_size=chunk_size, fetch_window=fetch_window)
+    reused = []
+    for t in candidates:
+        df, entry = quotes.get(t), previous["tickers"][t]
+        if df is not None and ms.last_bar(df) == entry["bar"]:
+            reused.append({"ticker": t, "status": "scored", "etf": entry["etf"], "result": entry["result"],
+                           "bar": entry["bar"]})
+    done = {e["ticker"] for e in reused}
+    return reused, [t for t in tickers if t not in done]
+
+
+def _summary(res):
+    if "Setup" not in res:
+        return "below the beta cutoff"
+    return f"{res['Setup']}, {res['ChecklistPassCount']}/5 steps, score {res['Score']}"
+
+
+def _outcome(entry):
+    if entry is None:
+        return "skipped before download"
+    if entry["status"] == "scored":
+        return _summary(entry["result"])
+    return entry["status"].replace("_", " ")
+
+
+def _passed_steps(res):
+    return {c["label"] for c in res.get("Checklist", []) if c["passed"]}
+
+
+def diff_scans(previous, current):
+    """Changes from the `previous` snapshot to `current` over the tickers in
+    both scans' universe that either listed: a list of {"Ticker", "Change"
+    (a CHANGES key), "Detail", "Score"}, grouped by change kind, best score
+    first."""
+    prev_t, cur_t = previous["tickers"], current["tickers"]
+    prev_listed, cur_listed = set(previous["listed"]), set(current["listed"])
+    changes = []
+
+    def add(ticker, kind, detail, res):
+        changes.append({"Ticker": ticker, "Change": kind, "Detail": detail, "Score": res.get("Score")})
+
+    for t in sorted((prev_listed | cur_listed) & set(previous["universe"]) & set(current["universe"])):
+        old = (prev_t.get(t) or {}).get("result") or {}
+        new = (cur_t.get(t) or {}).get("result") or {}
+        was = _outcome(prev_t.get(t))
+        new_buy_zone = new.get("Setup") == "Buy Zone" and old.get("Setup") != "Buy Zone"
+        if new_buy_zone:  # entrants in the Buy Zone are reported as that
+            add(t, "buy_zone", f"{_summary(new)} (was {was})", new)
+        elif t in cur_listed and t not in prev_listed:
+            add(t, "new", f"{_summary(new)} (was {was})", new)
+        if t in prev_listed and t not in cur_listed:
+            add(t, "dropped", f"now {_outcome(cur_t.get(t))}", old)
+        if "Setup" not in new:
+            continue
+        if old.get("Setup") == "Buy Zone" and new["Setup"] != "Buy Zone":
+            add(t, "left_buy_zone", f"now {_summary(new)}", new)
+        if new["VolumeSpike"] and not old.get("VolumeSpike"):
+            add(t, "volume_spike", f"{new['VolumeSpikeRatio']}x average volume ({new['VolumeSpikeDay']})", new)
+        if "Setup" in old:
+            steps = f"({old['ChecklistPassCount']} -> {new['ChecklistPassCount']}/5)"
+            gained, lost = _passed_steps(new) - _passed_steps(old), _passed_steps(old) - _passed_steps(new)
+            if gained:
+                add(t, "gained_step", f"{', '.join(sorted(gained))} now passes {steps}", new)
+            if lost:
+                add(t, "lost_step", f"{', '.join(sorted(lost))} no longer passes {steps}", new)
+    kinds = list(CHANGES)
+    changes.sort(key=lambda c: (kinds.index(c["Change"]), -(c["Score"] or 0), c["Ticker"]))
+    return changes
+
+
+def count_changes(changes):
+    """One-line tally of the changes by kind, e.g. "3 new, 1 buy zone"."""
+    counts = {}
+    for c in changes:
+        counts[c["Change"]] = counts.get(c["Change"], 0) + 1
+    return ", ".join(f"{n} {CHANGES[k].lower()}" for k, n in counts.items())
+
+
+def format_changes(changes):
+    """The deltas as plain-text lines for the CLI."""
+    return [f"  {CHANGES[c['Change']]:<14} {c['Ticker']:<6} {c['Detail']}" for c in changes]
@@ -0,0 +1,328 @@
+"""
+scan_engine.py
+Concurrency helpers shared by the CLI scan (murphy_screener.run_scan) and
+the dashboard scan loop.
+
+- TokenBucket: a thread-safe token-bucket rate limiter (one token per
+  ticker requested), so however many scan threads are running we stay
+  under Yahoo's throttling.
+- run_pool: runs a work function over chunks of tickers on a bounded
+  thread pool and yields each chunk's result as soon as it completes, so
+  network latency overlaps instead of adding up, while the caller (which
+  owns the progress line / st.progress bar) stays on the main thread.
+- SingleFlight: merges concurrent requests for the same keys, so two
+  threads (or two dashboard sessions) asking for SPY at the same moment
+  cost one download, not two.
+- CallController: murphy_screener sends every call to a remote provider
+  through the module-level CONTROLLER. It takes the call's tokens from its
+  TokenBucket, retries transient failures (is_transient: throttling,
+  timeouts, network errors, HTTP 429/5xx) with exponential backoff and
+  jitter, gives up on calls that hang past a deadline, and stops calling
+  altogether for a while when transient failures keep coming (circuit
+  breaker). Anything else — a bad symbol — is raised at once, unretried.
+- AdaptiveLimit: CONTROLLER's cap on concurrent calls, adapted AIMD-style
+  — one more after each window of clean calls, half as many after a
+  throttle or timeout — so throughput settles near what Yahoo tolerates
+  without hand-tuning --jobs. CONTROLLER.stats counts retries, throttles,
+  timeouts, bad requests and failures for the current run.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+
+
+DEFAULT_JOBS = 4                 # concurrent fetch workers
+REQUESTS_PER_SECOND = 20.0       # sustained tickers/second requested from the provider
+REQUEST_BURST = 100              # bucket capacity: how far a burst may run ahead of the sustained rate
+MAX_JOBS = 16                    # ceiling for the adaptive number of concurrent provider calls
+
+CALL_RETRIES = 4                 # extra attempts after a failed provider call
+BACKOFF_BASE = 1.0               # seconds; attempt k waits a random 0..min(BACKOFF_CAP, BACKOFF_BASE * 2**k)
+THROTTLE_BACKOFF_BASE = 4.0      # the same, after a 429 / "Too Many Requests"
+BACKOFF_CAP = 60.0
+CALL_TIMEOUT = 90.0              # seconds before a hung provider call is abandoned
+CIRCUIT_THRESHOLD = 8            # consecutive failed attempts that open the circuit
+CIRCUIT_COOLDOWN = 60.0          # seconds the circuit stays open before one trial call is let through
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens are added per second, up to
+    `capacity`. acquire(n) blocks until the tokens are available. A request
+    larger than the whole bucket (e.g. a 200-ticker batch against a 100-token
+    bucket) waits for a full bucket and then runs the balance negative, so
+    it still pays for every token before the next caller gets through."""
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=REQUEST_BURST):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, n=1):
+        need = min(float(n), self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= need:
+                    self._tokens -= n
+                    return
+                wait = (need - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def chunked(items, chunk_size, jobs=1):
+    """Split `items` into chunks of at most `chunk_size`, but small enough
+    that there are at least `jobs` chunks to hand out (when there are that
+    many items), so a short scan still uses every worker."""
+    items = list(items)
+    if not items:
+        return []
+    per_worker = -(-len(items) // max(1, jobs))  # ceil division
+    size = max(1, min(int(chunk_size), per_worker))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_pool(chunks, work, jobs=DEFAULT_JOBS):
+    """Yield work(chunk) for every chunk, in completion order, running up
+    to `jobs` chunks at once. With jobs <= 1 everything runs inline on the
+    caller's thread."""
+    if jobs <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield work(chunk)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(work, chunk) for chunk in chunks]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+class SingleFlight:
+    """Request coalescing ("singleflight"). run(keys, work) calls
+    work(claimed) with the keys no other thread is currently working on,
+    then waits for the threads that had the remaining keys in flight to
+    finish. The caller owns storing the results; SingleFlight only makes
+    sure each key is being fetched at most once at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> threading.Event set when its fetch finishes
+
+    def run(self, keys, work):
+        keys = list(dict.fromkeys(keys))
+        done = threading.Event()
+        with self._lock:
+            waiting = {self._inflight[k] for k in keys if k in self._inflight}
+            claimed = [k for k in keys if k not in self._inflight]
+            for k in claimed:
+                self._inflight[k] = done
+        try:
+            if claimed:
+                work(claimed)
+        finally:
+            with self._lock:
+                for k in claimed:
+                    del self._inflight[k]
+            done.set()
+        for event in waiting:
+            event.wait()
+        return claimed
+
+
+class ProviderError(Exception):
+    """A provider call that failed for a transient reason (network error,
+    throttling, timeout) — as opposed to a symbol with no data."""
+
+
+class ThrottledError(ProviderError):
+    """The provider refused the call for rate-limiting reasons (HTTP 429)."""
+
+
+class CallTimeout(ProviderError):
+    """The call did not finish within the controller's deadline."""
+
+
+class CircuitOpenError(ProviderError):
+    """The circuit breaker is open: the call was not attempted."""
+
+
+def is_transient(exc):
+    """Whether a failed provider call is worth retrying: throttling,
+    timeouts and other ProviderErrors, network errors (OSError — the
+    requests / socket exception family) and HTTP 429 / 5xx responses. A 4xx
+    response or any other exception (e.g. a bad symbol's .info) won't go
+    away on retry."""
+    if isinstance(exc, ProviderError):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, OSError)
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit. acquire() blocks while `limit` calls are
+    already running and returns the current epoch; release(epoch, outcome)
+    ends a call with outcome "ok", "congested" (throttle, timeout) or
+    "error". Each clean call adds 1/limit (about +1 per window of calls); a
+    congested one halves the limit — once per epoch, so a burst of failures
+    from calls that were all in flight together counts as a single
+    congestion signal; other errors leave it alone."""
+
+    def __init__(self, initial=4, minimum=1, maximum=MAX_JOBS):
+        self.minimum, self.maximum = minimum, maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.epoch = 0
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._running >= int(self.limit):
+                self._cond.wait()
+            self._running += 1
+            return self.epoch
+
+    def release(self, epoch, outcome="ok"):
+        with self._cond:
+            self._running -= 1
+            if outcome == "congested":
+                if epoch == self.epoch:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self.epoch += 1
+            elif outcome == "ok":
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CallController:
+    """Runs provider calls with retries, exponential backoff with full
+    jitter, a per-call deadline, a circuit breaker and an AdaptiveLimit on
+    concurrency (see the module docstring). call(fn, *args, tokens=n) takes
+    n tokens from the rate limiter per attempt and returns fn's result, or
+    raises a ProviderError once the retries are used up (or at once while
+    the circuit is open). Only transient failures (see is_transient) are
+    retried and count toward the circuit breaker; any other exception is
+    raised as is on the first attempt, so callers can tell a bad symbol
+    from a struggling provider."""
+
+    def __init__(self, limiter, retries=CALL_RETRIES, timeout=CALL_TIMEOUT, jobs=DEFAULT_JOBS):
+        self.limiter = limiter
+        self.retries = retries
+        self.timeout = timeout
+        self.concurrency = AdaptiveLimit(jobs)
+        self._lock = threading.Lock()
+        self._failures = 0         # consecutive failed attempts
+        self._open_until = 0.0
+        self._trial = False        # a half-open trial call is in flight
+        self._timer_pool = ThreadPoolExecutor(max_workers=MAX_JOBS * 2, thread_name_prefix="provider-call")
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the per-run counters (call at the start of each scan)."""
+        with self._lock:
+            self.stats = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "timeouts": 0,
+                          "errors": 0, "bad_requests": 0, "failed": 0, "circuit_opens": 0, "rejected": 0,
+                          "min_concurrency": int(self.concurrency.limit),
+                          "max_concurrency": int(self.concurrency.limit)}
+
+    def set_jobs(self, jobs):
+        """Restart the adaptive limit from `jobs` concurrent calls."""
+        self.concurrency = AdaptiveLimit(jobs)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _admit(self):
+        """Circuit breaker gate: raise CircuitOpenError while open; once the
+        cooldown has passed, let exactly one trial call through."""
+        with self._lock:
+            if self._open_until == 0.0:
+                return
+            if time.monotonic() < self._open_until or self._trial:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError("provider circuit open after repeated failures; not calling")
+            self._trial = True
+
+    def _record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._failures = 0
+                self._open_until = 0.0
+                return
+            self._failures += 1
+            if self._failures >= CIRCUIT_THRESHOLD:
+                if self._open_until == 0.0 or time.monotonic() >= self._open_until:
+                    self.stats["circuit_opens"] += 1
+                self._open_until = time.monotonic() + CIRCUIT_COOLDOWN
+
+    def _attempt(self, fn, args, tokens):
+        self.limiter.acquire(tokens)
+        concurrency = self.concurrency  # set_jobs may swap it while this call runs
+        epoch = concurrency.acquire()
+        outcome = "error"
+        try:
+            future = self._timer_pool.submit(fn, *args)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                # Python threads can't be killed: the call carries on in the
+                # background, but its result is dropped.
+                raise CallTimeout(f"provider call exceeded {self.timeout:.0f}s")
+            outcome = "ok"
+            return result
+        except (ThrottledError, CallTimeout):
+            outcome = "congested"
+            raise
+        finally:
+            concurrency.release(epoch, outcome)
+            with self._lock:
+                self.stats["min_concurrency"] = min(self.stats["min_concurrency"], int(concurrency.limit))
+                self.stats["max_concurrency"] = max(self.stats["max_concurrency"], int(concurrency.limit))
+
+    def call(self, fn, *args, tokens=1):
+        self._count("calls")
+        for attempt in range(self.retries + 1):
+            self._admit()
+            self._count("attempts")
+            try:
+                result = self._attempt(fn, args, tokens)
+            except Exception as e:
+                if not is_transient(e):
+                    self._record(True)  # the provider answered; the request itself was bad
+                    self._count("bad_requests")
+                    raise
+                self._record(False)
+                throttled = isinstance(e, ThrottledError)
+                self._count("throttled" if throttled else "timeouts" if isinstance(e, CallTimeout) else "errors")
+                if attempt == self.retries:
+                    self._count("failed")
+                    raise e if isinstance(e, ProviderError) else ProviderError(repr(e)) from e
+                self._count("retries")
+                base = THROTTLE_BACKOFF_BASE if throttled else BACKOFF_BASE
+                time.sleep(random.uniform(0, min(BACKOFF_CAP, base * 2 ** attempt)))
+            else:
+                self._record(True)
+                return result
+
+    def summary(self):
+        """One line on this run's provider calls, or "" if nothing went wrong."""
+        s = self.stats
+        if not (s["retries"] or s["failed"] or s["rejected"]):
+            return ""
+        return (f"Provider calls: {s['calls']} ({s['retries']} retries — {s['throttled']} throttled, "
+                f"{s['timeouts']} timed out, {s['errors']} other errors; {s['failed']} gave up"
+                + (f"; circuit opened {s['circuit_opens']}x, {s['rejected']} calls refused" if s["rejected"] else "")
+                + f"). Concurrent calls adapted between {s['min_concurrency']} and {s['max_concurrency']}.")
+
+
+CONTROLLER = CallController(TokenBucket())
@@ -0,0 +1,112 @@
+"""
+scan_journal.py
+Per-scan records of the Murphy Screener, kept under the price cache
+directory (price_cache.DEFAULT_CACHE_DIR).
+
+ScanJournal checkpoints a scan's per-ticker outcomes as they complete, so
+an interrupted scan (Ctrl-C, a rate-limit storm, a dashboard rerun) can
+resume with only the tickers it hadn't finished.
+
+ScanSnapshot keeps the per-ticker outcome of the last finished scan, which
+the scan-to-scan diff (scan_diff.py) compares the next scan against.
+
+Like the stores in price_cache.py, murphy_screener.py only opens these when
+the on-disk cache is enabled for a cacheable provider (an explicit --resume
+still journals).
+"""
+
+import os
+import json
+
+from price_cache import DEFAULT_CACHE_DIR, atomic_write_json, json_default
+
+
+class ScanJournal:
+    """Append-only checkpoint of one scan: <root>/journal/<name>.jsonl. The
+    first line is a header {"key": ...} identifying the scan (as-of date,
+    data provider, scoring options); each later line is one finished ticker,
+    {"ticker", "status", ...}, flushed as soon as it is written, and a final
+    {"complete": true} line marks a scan that ran to the end. A torn last
+    line (the process died mid-write) is ignored on load.
+
+    With resume=True an existing journal whose header matches `key` is
+    loaded into `entries` (ticker -> its latest line) and appended to;
+    otherwise the journal starts over. Not thread-safe: write from one
+    thread."""
+
+    def __init__(self, key, name="scan", root=None, resume=False):
+        self.path = os.path.join(root or DEFAULT_CACHE_DIR, "journal", name + ".jsonl")
+        self.key = key
+        self.entries = {}
+        self.complete = False
+        self.resumed = False
+        self._torn = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if resume:
+            self._load()
+        if self.resumed:
+            self._f = open(self.path, "a")
+            if self._torn:
+                self._f.write("\n")  # don't glue the next entry onto the torn line
+        else:
+            self.entries, self.complete = {}, False
+            self._f = open(self.path, "w")
+            self._write({"key": key})
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        self._torn = bool(lines) and not lines[-1].endswith("\n")
+        for i, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn write
+            if i == 0:
+                if entry.get("key") != self.key:
+                    return  # a different scan (another day, provider or settings)
+                self.resumed = True
+            elif entry.get("complete"):
+                self.complete = True
+            elif "ticker" in entry:
+                self.entries[entry["ticker"]] = entry
+
+    def _write(self, entry):
+        self._f.write(json.dumps(entry, default=json_default) + "\n")
+        self._f.flush()
+
+    def record(self, ticker, status, **fields):
+        entry = {"ticker": ticker, "status": status, **fields}
+        self.entries[ticker] = entry
+        self._write(entry)
+
+    def mark_complete(self):
+        self.complete = True
+        self._write({"complete": True})
+
+    def close(self):
+        self._f.close()
+
+
+class ScanSnapshot:
+    """The outcome of the last finished scan of one kind, one JSON file
+    <root>/snapshots/<name>.json (see scan_diff.make_snapshot for the
+    layout). Saving replaces the previous snapshot."""
+
+    def __init__(self, name="scan", root=None):
+        self.path = os.path.join(root or DEFAULT_CACHE_DIR, "snapshots", name + ".json")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def load(self):
+        """The saved snapshot dict, or None."""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, snapshot):
+        atomic_write_json(self.path, snapshot)
@@ -0,0 +1,105 @@
+"""
+score_memo.py
+Dirty tracking for the scoring stage of the Murphy Screener.
+
+A ticker's score depends only on its own OHLCV, SPY's closes (beta) and the
+few things score_indicators reads from the sector leaderboard and the
+regime. ScoreMemo remembers, per ticker, the fingerprints of those inputs
+together with the indicator snapshot (compute_indicators) and the result
+they produced, so a rescan in the same process — every Streamlit rerun, a
+second run_scan from a notebook — only redoes the work whose inputs moved:
+
+  * data and SPY fingerprints match, context view matches -> the stored
+    result is returned as is;
+  * data and SPY match, the context view changed (the sector's rank moved,
+    the regime flipped) -> only the scoring rules are rerun on the stored
+    indicators, none of the indicator math;
+  * anything else -> the ticker is dirty and is scored from scratch.
+
+The data fingerprint is the last bar's date plus a hash of the whole packed
+OHLCV history (MACD/RSI are recursive over every bar, so a restated old bar
+changes the score too). The context view comes from
+murphy_screener.score_context_view. The memo lives in memory only and is
+bounded to MAX_ENTRIES tickers, least recently used out first.
+tests/test_score_memo.py holds memoized rescans to parity with full
+rescores.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+MAX_ENTRIES = 10_000
+
+
+def array_fingerprint(*arrays):
+    """blake2b digest of the raw bytes of NumPy arrays."""
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+def data_fingerprint(index_i8, values):
+    """(last-bar date as int64 ns, digest of the full history) for a ticker's
+    packed OHLCV (see murphy_screener.pack_ohlcv)."""
+    return (int(index_i8[-1]) if len(index_i8) else None), array_fingerprint(index_i8, values)
+
+
+class ScoreMemo:
+    """Per-ticker scoring memo; see the module docstring. Thread-safe.
+    `stats` counts lookups by outcome: hit, rescored (context changed,
+    indicators reused) and miss."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hit": 0, "rescored": 0, "miss": 0}
+
+    def get(self, ticker, data_fp, spy_fp, etf_flag):
+        """The stored entry {"beta", "ind", "view", "result", ...} when it was
+        computed from the same data, SPY closes and ETF classification, else
+        None."""
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or entry["data"] != data_fp or entry["spy"] != spy_fp or entry["etf"] != etf_flag:
+                return None
+            self._entries.move_to_end(ticker)
+            return entry
+
+    def put(self, ticker, data_fp, spy_fp, etf_flag, beta, ind, view, result):
+        """Remember a scored ticker. `ind` may be None for a below-min_beta
+        stub, which was never fully scored."""
+        with self._lock:
+            self._entries[ticker] = {"data": data_fp, "spy": spy_fp, "etf": etf_flag, "beta": beta, "ind": ind,
+                                     "view": view, "result": result}
+            self._entries.move_to_end(ticker)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def summary(self):
+        """One line for the scan summary, or "" when nothing was reused."""
+        s = self.stats
+        if not s["hit"] and not s["rescored"]:
+            return ""
+        return (f"Scoring memo: {s['hit']} tickers unchanged since the last scan in this session, "
+                f"{s['rescored']} only re-ranked for a new sector/regime context, {s['miss']} scored in full.")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,383 @@
+"""
+signal_store.py
+Append-only history of every scan's results, so questions like "which
+tickers have been in the Buy Zone three scans running?", "when did X first
+make the 5/5 list?" or "how has X's score moved?" don't depend on whichever
+screener_results_*.csv happened to be written last.
+
+SignalStore is one SQLite file (.murphy_cache/signals.sqlite by default;
+SQLite ships with Python, so there is no extra dependency). Each scan adds a
+row to `scans` and one row per result to `signals`, with the numeric fields
+stored typed (REAL / INTEGER), dates as yyyymmdd integers, Setup as a small
+integer code and the checklist as a pass bitmask. Tickers, sectors and the
+Reasons / checklist texts are interned: each distinct string is stored once,
+and a result keeps only ids (the texts packed as a little-endian uint32
+blob). The (ticker, scan_date, scan_id) primary key, an index on
+(scan_date, setup) and a small `firsts` table (earliest date per ticker and
+checklist count, kept up to date on append) keep streak(),
+first_appearances() and trajectory() to milliseconds over years of daily
+scans (`python signal_store.py bench`).
+
+When several scans on the same date include a ticker, the queries use the
+latest one.
+
+Usage:
+    python signal_store.py streak --setup "Buy Zone" --days 3
+    python signal_store.py first --min-checklist 5 --since 2024-01-01
+    python signal_store.py trajectory NVDA
+    python signal_store.py bench          # timing over 3 synthetic years in a temp file
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_cache import DEFAULT_CACHE_DIR
+
+
+SETUPS = ("Buy Zone", "Watchlist", "No Signal")  # stored as their index
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id INTEGER PRIMARY KEY,
+    scan_date INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    source TEXT,
+    options TEXT,
+    n_results INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_by_date ON scans (scan_date);
+CREATE TABLE IF NOT EXISTS tickers (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS signals (
+    ticker_id INTEGER NOT NULL,
+    scan_date INTEGER NOT NULL,
+    scan_id INTEGER NOT NULL,
+    is_etf INTEGER NOT NULL,
+    sector_id INTEGER,
+    setup INTEGER NOT NULL,
+    score REAL,
+    checklist INTEGER NOT NULL,
+    checklist_mask INTEGER NOT NULL,
+    price REAL,
+    stop_loss REAL,
+    target REAL,
+    rr REAL,
+    rsi REAL,
+    beta REAL,
+    volume_spike INTEGER,
+    volume_spike_ratio REAL,
+    volume_spike_day TEXT,
+    sector_rank INTEGER,
+    checklist_texts BLOB,
+    reasons BLOB,
+    PRIMARY KEY (ticker_id, scan_date, scan_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS signals_by_date ON signals (scan_date, setup);
+CREATE TABLE IF NOT EXISTS firsts (
+    ticker_id INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    scan_date INTEGER NOT NULL,
+    scan_id INTEGER NOT NULL,
+    PRIMARY KEY (ticker_id, level)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS firsts_by_level ON firsts (level, scan_date);
+"""
+
+# result key -> signals column, for the plain typed fields
+_FIELDS = [("Score", "score"), ("ChecklistPassCount", "checklist"), ("Price", "price"), ("StopLoss", "stop_loss"),
+           ("Target", "target"), ("R:R", "rr"), ("RSI", "rsi"), ("Beta", "beta"), ("VolumeSpike", "volume_spike"),
+           ("VolumeSpikeRatio", "volume_spike_ratio"), ("VolumeSpikeDay", "volume_spike_day"),
+           ("SectorRank", "sector_rank")]
+_COLUMNS = ["ticker_id", "scan_date", "scan_id", "is_etf", "sector_id", "setup", "checklist_mask",
+            "checklist_texts", "reasons", *(col for _, col in _FIELDS)]
+
+
+def _day(date):
+    """A date as the INTEGER the store keeps (yyyymmdd: sorts like the date)."""
+    d = pd.Timestamp(date)
+    return d.year * 10000 + d.month * 100 + d.day
+
+
+def _iso(day):
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def _pack(ids):
+    return np.asarray(ids, dtype="<u4").tobytes()
+
+
+def _unpack(blob):
+    return np.frombuffer(blob, dtype="<u4").tolist() if blob else []
+
+
+def _plain(value):
+    """A result value as something sqlite3 stores typed (NumPy scalars -> Python)."""
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class SignalStore:
+    """The scan-history database (see the module docstring). Thread-safe;
+    every append is one transaction."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "signals.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._ids = {"tickers": dict(self._conn.execute("SELECT ticker, id FROM tickers")),
+                     "texts": dict(self._conn.execute("SELECT text, id FROM texts"))}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _intern(self, cur, table, values):
+        """Ids of `values` in the tickers / texts table, adding new ones."""
+        known = self._ids[table]
+        column = "ticker" if table == "tickers" else "text"
+        ids = []
+        for value in values:
+            value_id = known.get(value)
+            if value_id is None:
+                cur.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+                if cur.rowcount == 1:
+                    value_id = cur.lastrowid
+                else:  # added by another process since we loaded the ids
+                    value_id = cur.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+                known[value] = value_id
+            ids.append(value_id)
+        return ids
+
+    def append(self, results, scan_date, source=None, options=None):
+        """Record one scan: `results` are score_stock dicts (stocks and ETFs),
+        `scan_date` the as-of date of its data. Returns the new scan_id."""
+        day = _day(scan_date)
+        with self._lock:
+            try:
+                return self._append(results, day, source, options)
+            except sqlite3.Error:
+                # ids interned in the rolled-back transaction are gone again
+                self._ids = {"tickers": dict(self._conn.execute("SELECT ticker, id FROM tickers")),
+                             "texts": dict(self._conn.execute("SELECT text, id FROM texts"))}
+                raise
+
+    def _append(self, results, day, source, options):
+        with self._conn:
+            cur = self._conn.cursor()
+            cur.execute("INSERT INTO scans (scan_date, created, source, options, n_results) VALUES (?, ?, ?, ?, ?)",
+                        (day, dt.datetime.now().isoformat(timespec="seconds"), source,
+                         json.dumps(options, sort_keys=True, default=str) if options is not None else None,
+                         len(results)))
+            scan_id = cur.lastrowid
+            rows, firsts = {}, []
+            for res in results:
+                ticker_id = self._intern(cur, "tickers", [res["Ticker"]])[0]
+                sector_id = self._intern(cur, "texts", [res["Sector"]])[0] if res.get("Sector") else None
+                checklist = res.get("Checklist") or []
+                mask = sum(1 << (c["step"] - 1) for c in checklist if c["passed"])
+                checklist_texts = self._intern(cur, "texts", [s for c in checklist for s in (c["label"], c["detail"])])
+                rows[ticker_id] = (ticker_id, day, scan_id, int(res.get("AssetType") == "ETF"), sector_id,
+                                   SETUPS.index(res["Setup"]), mask, _pack(checklist_texts),
+                                   _pack(self._intern(cur, "texts", res.get("Reasons") or [])),
+                                   *(_plain(res.get(key)) for key, _ in _FIELDS))
+                firsts += [(ticker_id, level, day, scan_id) for level in range(1, int(res["ChecklistPassCount"]) + 1)]
+            cur.executemany(f"INSERT INTO signals ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                            list(rows.values()))
+            # keep the earliest date per (ticker, level); a backfilled older scan moves it back
+            cur.executemany("INSERT INTO firsts VALUES (?, ?, ?, ?) ON CONFLICT (ticker_id, level) DO UPDATE "
+                            "SET scan_date = excluded.scan_date, scan_id = excluded.scan_id "
+                            "WHERE excluded.scan_date < firsts.scan_date", firsts)
+            return scan_id
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            frame = pd.DataFrame(cur.fetchall(), columns=names)
+        if "setup" in frame.columns:
+            frame["setup"] = frame["setup"].map(lambda code: SETUPS[code])
+        for col in ("scan_date", "last_date", "first_date"):
+            if col in frame.columns:
+                frame[col] = frame[col].map(_iso)
+        return frame
+
+    def scan_dates(self):
+        """Every date with at least one recorded scan, oldest first."""
+        with self._lock:
+            return [_iso(d) for (d,) in self._conn.execute("SELECT DISTINCT scan_date FROM scans ORDER BY scan_date")]
+
+    def streak(self, setup="Buy Zone", days=3, as_of=None, min_checklist=None):
+        """Tickers whose result was `setup` (and at least `min_checklist`
+        checklist steps, if given) on each of the last `days` scan dates up to
+        `as_of`. One row per ticker with its latest score, checklist count and
+        sector; empty when fewer than `days` dates are recorded."""
+        extra = " AND checklist >= ?" if min_checklist is not None else ""
+        params = [_day(as_of) if as_of is not None else 99991231, days, SETUPS.index(setup)]
+        params += ([min_checklist] if min_checklist is not None else []) + [days]
+        return self._query(f"""
+            WITH dates AS (SELECT DISTINCT scan_date FROM scans WHERE scan_date <= ?
+                           ORDER BY scan_date DESC LIMIT ?),
+                 latest AS (SELECT ticker_id, scan_date, MAX(scan_id) AS scan_id, setup, checklist, score, sector_id
+                            FROM signals WHERE scan_date IN (SELECT scan_date FROM dates)
+                            GROUP BY ticker_id, scan_date),
+                 runs AS (SELECT ticker_id, MAX(scan_date) AS last_date, score, checklist, sector_id, COUNT(*) AS n
+                          FROM latest WHERE setup = ?{extra} GROUP BY ticker_id)
+            SELECT t.ticker, r.last_date, r.score, r.checklist, x.text AS sector
+            FROM runs r JOIN tickers t ON t.id = r.ticker_id LEFT JOIN texts x ON x.id = r.sector_id
+            WHERE r.n = ? AND r.n = (SELECT COUNT(*) FROM dates)
+            ORDER BY r.score DESC, t.ticker""", params)
+
+    def first_appearances(self, min_checklist=5, since=None):
+        """The first scan date on which each ticker passed at least
+        `min_checklist` checklist steps, with its setup, score and price that
+        day. `since` keeps only tickers whose first appearance is on or after
+        that date — i.e. the new entrants."""
+        return self._query("""
+            SELECT t.ticker, f.scan_date AS first_date, s.setup, s.score, s.checklist, s.price,
+                   x.text AS sector
+            FROM firsts f JOIN tickers t ON t.id = f.ticker_id
+            JOIN signals s ON s.ticker_id = f.ticker_id AND s.scan_date = f.scan_date AND s.scan_id = f.scan_id
+            LEFT JOIN texts x ON x.id = s.sector_id
+            WHERE f.level = ? AND f.scan_date >= ?
+            ORDER BY f.scan_date DESC, t.ticker""", (min_checklist, _day(since) if since is not None else 0))
+
+    def trajectory(self, ticker, start=None, end=None):
+        """One row per scan date for `ticker` (latest scan of the day):
+        score, setup, checklist count, price, stop, target, R:R."""
+        return self._query("""
+            SELECT s.scan_date, MAX(s.scan_id) AS scan_id, s.score, s.setup, s.checklist, s.price, s.stop_loss,
+                   s.target, s.rr
+            FROM signals s JOIN tickers t ON t.id = s.ticker_id
+            WHERE t.ticker = ? AND s.scan_date >= ? AND s.scan_date <= ?
+            GROUP BY s.scan_date ORDER BY s.scan_date""",
+            (ticker.upper(), _day(start) if start is not None else 0,
+             _day(end) if end is not None else 99991231))
+
+    def results(self, scan_date=None, scan_id=None):
+        """A recorded scan back as score_stock-style result dicts (Reasons and
+        Checklist included): the given scan, or every ticker's latest result
+        on `scan_date` (default: the newest date)."""
+        columns = ", ".join(f"s.{c}" for c in _COLUMNS)
+        with self._lock:
+            if scan_id is None:
+                day = (_day(scan_date) if scan_date is not None
+                       else self._conn.execute("SELECT MAX(scan_date) FROM scans").fetchone()[0])
+                rows = self._conn.execute(
+                    f"SELECT t.ticker, {columns}, MAX(s.scan_id) FROM signals s JOIN tickers t ON t.id = s.ticker_id "
+                    f"WHERE s.scan_date = ? GROUP BY s.ticker_id", (day,)).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f"SELECT t.ticker, {columns} FROM signals s JOIN tickers t ON t.id = s.ticker_id "
+                    f"WHERE s.scan_id = ?", (scan_id,)).fetchall()
+            wanted = {i for row in rows for i in (_unpack(row[8]) + _unpack(row[9]) + [row[5]]) if i is not None}
+            texts = dict(self._conn.execute(
+                f"SELECT id, text FROM texts WHERE id IN ({', '.join(map(str, wanted)) or 'NULL'})"))
+        out = []
+        for row in rows:
+            ticker, is_etf, sector_id, setup, mask, checklist_ids, reason_ids = row[0], *row[4:10]
+            res = {"Ticker": ticker, "AssetType": "ETF" if is_etf else "Stock", "Sector": texts.get(sector_id),
+                   "Setup": SETUPS[setup]}
+            res.update({key: value for (key, _), value in zip(_FIELDS, row[10:10 + len(_FIELDS)])})
+            res["VolumeSpike"] = bool(res["VolumeSpike"])
+            pairs = _unpack(checklist_ids)
+            res["Checklist"] = [{"step": k + 1, "label": texts[pairs[2 * k]], "passed": bool(mask >> k & 1),
+                                 "detail": texts[pairs[2 * k + 1]]} for k in range(len(pairs) // 2)]
+            res["Reasons"] = [texts[i] for i in _unpack(reason_ids)]
+            out.append(res)
+        return out
+
+
+def _bench(years=3, tickers=1500):
+    """Fill a temporary store with `years` of daily full-universe scans and
+    time the queries."""
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(0)
+    names = [f"T{i:04d}" for i in range(tickers)]
+    reasons = [f"Reason {i}" for i in range(400)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SignalStore(os.path.join(tmp, "signals.sqlite"))
+        dates = pd.bdate_range("2021-01-04", periods=int(years * 252))
+        t0 = time.perf_counter()
+        setup = rng.integers(0, 3, tickers)
+        for day in dates:
+            setup = np.where(rng.random(tickers) < 0.3, rng.integers(0, 3, tickers), setup)
+            checklist = rng.binomial(5, 0.45, tickers)
+            results = [{
+                "Ticker": t, "AssetType": "Stock", "Sector": "Technology", "Setup": SETUPS[setup[i]],
+                "Score": float(rng.integers(20, 95)), "ChecklistPassCount": int(checklist[i]), "Price": 100.0,
+                "StopLoss": 95.0, "Target": 115.0, "R:R": 3.0, "RSI": 55.0, "Beta": 1.2, "VolumeSpike": False,
+                "VolumeSpikeRatio": None, "VolumeSpikeDay": None, "SectorRank": 2,
+                "Checklist": [{"step": k + 1, "label": f"Step {k + 1}", "passed": k < checklist[i],
+                               "detail": "ok" if k < checklist[i] else "no"} for k in range(5)],
+                "Reasons": [reasons[j] for j in rng.integers(0, len(reasons), 12)],
+            } for i, t in enumerate(names)]
+            store.append(results, day, source="bench")
+        size = os.path.getsize(store.path) / 1e6
+        print(f"Stored {len(dates)} scans x {tickers} tickers in {time.perf_counter() - t0:.1f}s ({size:.0f} MB)")
+        for label, fn in [("streak(Buy Zone, 3 days)", lambda: store.streak("Buy Zone", 3)),
+                          ("first_appearances(5/5)", lambda: store.first_appearances(5)),
+                          ("first_appearances(5/5, since last month)",
+                           lambda: store.first_appearances(5, since=dates[-21])),
+                          ("trajectory(T0042)", lambda: store.trajectory("T0042")),
+                          ("results(latest date)", lambda: store.results())]:
+            fn()
+            t0 = time.perf_counter()
+            out = fn()
+            print(f"  {label:<42} {(time.perf_counter() - t0) * 1000:7.1f} ms  ({len(out)} rows)")
+        store.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Query the Murphy Screener's scan history")
+    p.add_argument("--db", help="Path to the signals database (default: .murphy_cache/signals.sqlite)")
+    sub = p.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("streak", help="Tickers with the same setup on each of the last N scan dates")
+    s.add_argument("--setup", choices=SETUPS, default="Buy Zone")
+    s.add_argument("--days", type=int, default=3)
+    s.add_argument("--min-checklist", type=int, default=None)
+    f = sub.add_parser("first", help="First scan date each ticker passed N checklist steps")
+    f.add_argument("--min-checklist", type=int, default=5)
+    f.add_argument("--since", help="Only tickers whose first appearance is on/after this date")
+    t = sub.add_parser("trajectory", help="Score/setup/checklist of one ticker over time")
+    t.add_argument("ticker")
+    sub.add_parser("bench", help="Time the queries over 3 synthetic years of scans (temporary file)")
+    args = p.parse_args()
+
+    if args.command == "bench":
+        _bench()
+        return
+    store = SignalStore(args.db)
+    if args.command == "streak":
+        out = store.streak(args.setup, args.days, min_checklist=args.min_checklist)
+    elif args.command == "first":
+        out = store.first_appearances(args.min_checklist, since=args.since)
+    else:
+        out = store.trajectory(args.ticker)
+    print(out.to_string(index=False) if len(out) else "No matching history.")
+
+
+if __name__ == "__main__":
+    main()
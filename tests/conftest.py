@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import murphy_screener as ms  # noqa: E402
+from market_data import SyntheticProvider  # noqa: E402
+
+
+@pytest.fixture
+def synthetic(monkeypatch):
+    """Route murphy_screener through a SyntheticProvider(**kwargs) for one
+    test; returns the provider."""
+
+    def use(**kwargs):
+        provider = SyntheticProvider(**kwargs)
+        monkeypatch.setattr(ms, "_provider", provider)
+        monkeypatch.setattr(ms, "_metadata_memo", {})
+        monkeypatch.setattr(ms, "_state_store", None)
+        return provider
+
+    return use
+
+
+def market_inputs(tickers):
+    """(histories, sectors, etf_flags, leaderboard, regime, spy_close) for
+    `tickers` from the active provider."""
+    histories = {t: df for t, df in ms.fetch_history_batch(tickers).items() if df is not None}
+    return (histories, {t: ms.get_sector(t) for t in histories}, {t: ms.is_etf(t) for t in histories},
+            ms.get_sector_leaderboard(), ms.get_intermarket_regime(), ms.fetch_history(ms.BENCHMARK)["Close"])
@@ -0,0 +1,63 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import murphy_screener as ms
+from backtest import WARMUP_BARS, HistoricalContext, parity_check, trade_outcomes
+from market_history import get_market_history
+
+
+@pytest.mark.parametrize("seed, as_of", [(0, dt.date(2024, 6, 28)), (5, dt.date(2023, 11, 1))])
+def test_signal_history_matches_score_stock(synthetic, seed, as_of):
+    synthetic(seed=seed, as_of=as_of)
+    period_days = 2 * 252 + WARMUP_BARS
+    tickers = ms.get_universe_tickers("sp500")[:30]
+    histories = ms.fetch_history_batch(tickers, period_days=period_days)
+    sectors = {t: ms.get_sector(t) for t in histories}
+    context = HistoricalContext(get_market_history(period_days, refresh=True))
+    assert parity_check(histories, sectors, context, samples=12, seed=seed) == []
+
+
+def bars(rows):
+    """OHLC frame from (open, high, low, close) rows, one per business day."""
+    return pd.DataFrame(rows, columns=["Open", "High", "Low", "Close"],
+                        index=pd.bdate_range("2024-01-02", periods=len(rows)))
+
+
+def outcome_of(rows, stop=95.0, target=110.0, horizon=5):
+    outcome, ret, held = trade_outcomes(bars(rows), np.array([0]), np.array([stop]), np.array([target]), horizon)
+    return outcome[0], round(float(ret[0]), 4), int(held[0])
+
+
+ENTRY = (100, 101, 99, 100)
+QUIET = (100, 102, 98, 101)
+
+
+def test_gap_through_the_target_fills_at_the_open():
+    assert outcome_of([ENTRY, QUIET, (112, 113, 111, 112)]) == ("target", 0.12, 2)
+
+
+def test_gap_above_the_target_wins_even_if_the_bar_then_hits_the_stop():
+    assert outcome_of([ENTRY, (112, 113, 90, 92)]) == ("target", 0.12, 1)
+
+
+def test_gap_through_the_stop_fills_at_the_open():
+    assert outcome_of([ENTRY, (90, 91, 88, 89)]) == ("stop", -0.1, 1)
+
+
+def test_bar_spanning_both_levels_counts_as_the_stop():
+    assert outcome_of([ENTRY, QUIET, (100, 111, 94, 105)]) == ("stop", -0.05, 2)
+
+
+def test_target_touched_intrabar_exits_at_the_target():
+    assert outcome_of([ENTRY, (104, 110.5, 103, 109)]) == ("target", 0.1, 1)
+
+
+def test_neither_level_within_the_horizon_expires_at_its_close():
+    assert outcome_of([ENTRY] + [QUIET] * 4 + [(101, 104, 100, 103), (120, 121, 119, 120)]) == ("expired", 0.03, 5)
+
+
+def test_too_few_bars_since_the_signal_is_open_at_the_last_close():
+    assert outcome_of([ENTRY, QUIET, (101, 103, 100, 102)]) == ("open", 0.02, 2)
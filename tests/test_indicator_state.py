@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import murphy_screener as ms
+from market_data import SyntheticProvider
+from indicator_state import MemoryStateStore, StateStore, score_incremental, spy_returns, sync_state
+
+
+KEYS = ["Score", "Setup", "ChecklistPassCount", "StopLoss", "Target", "R:R", "Beta", "RSI", "VolumeSpike"]
+
+
+@pytest.fixture
+def market(synthetic):
+    synthetic()
+    tickers = ms.get_universe_tickers("sp500")[:40]
+    histories = {t: df for t, df in ms.fetch_history_batch(tickers).items() if df is not None}
+    spy_close = ms.fetch_history(ms.BENCHMARK)["Close"]
+    return histories, ms.get_sector_leaderboard(), ms.get_intermarket_regime(), spy_close
+
+
+def assert_parity(ticker, df, market, store, spy_close=None):
+    _, leaderboard, regime, default_spy = market
+    spy_close = default_spy if spy_close is None else spy_close
+    want = ms.score_stock(ticker, df, ms.get_sector(ticker), leaderboard, regime, spy_close=spy_close)
+    got = score_incremental(ticker, df, ms.get_sector(ticker), leaderboard, regime, spy_close=spy_close,
+                            store=store, spy_ret_by_date=spy_returns(spy_close))
+    assert {k: got[k] for k in KEYS} == {k: want[k] for k in KEYS}, ticker
+
+
+def test_appended_bars_match_a_full_rescore(market, tmp_path):
+    histories, spy_ret = market[0], spy_returns(market[3])
+    store = StateStore(str(tmp_path))
+    for t, df in histories.items():
+        store.save(t, sync_state(None, df.iloc[:-5], spy_ret)[0])
+        for k in range(4, -1, -1):
+            assert_parity(t, df.iloc[:len(df) - k], market, store)
+        assert store.load(t).last_date == df.index[-1]
+
+
+def test_restated_last_close_rebuilds_the_state(market, tmp_path):
+    histories, spy_ret = market[0], spy_returns(market[3])
+    store = StateStore(str(tmp_path))
+    for t, df in histories.items():
+        store.save(t, sync_state(None, df, spy_ret)[0])
+        restated = df.assign(Close=df["Close"] * np.r_[np.ones(len(df) - 1), 1.03])
+        assert_parity(t, restated, market, store)
+        assert store.load(t).bars[-1][3] == restated["Close"].iat[-1]
+
+
+def test_rewind_rebuilds_the_state(market, tmp_path):
+    histories, spy_ret = market[0], spy_returns(market[3])
+    store = StateStore(str(tmp_path))
+    for t, df in histories.items():
+        store.save(t, sync_state(None, df, spy_ret)[0])
+        assert_parity(t, df.iloc[:-3], market, store)
+        assert store.load(t).last_date == df.index[-4]
+
+
+def test_state_built_without_spy_is_rebuilt_once_spy_is_back(market, tmp_path):
+    histories, spy_close = market[0], market[3]
+    store = StateStore(str(tmp_path))
+    for t, df in histories.items():
+        store.save(t, sync_state(None, df, {})[0])  # SPY's download had failed
+        assert np.isnan(store.load(t).beta())
+        assert_parity(t, df, market, store, spy_close=spy_close)
+        assert sync_state(store.load(t), df, spy_returns(spy_close))[1] is False
+
+
+def test_state_store_stays_off_disk_without_the_cache(synthetic, monkeypatch, tmp_path):
+    synthetic()
+    assert isinstance(ms.get_state_store(), MemoryStateStore)
+    assert ms.get_state_store() is ms.get_state_store()
+
+    class LiveLike(SyntheticProvider):
+        cacheable = True
+
+    monkeypatch.setattr(ms, "_provider", LiveLike())
+    monkeypatch.setattr("indicator_state.DEFAULT_CACHE_DIR", str(tmp_path))
+    store = ms.get_state_store()
+    assert isinstance(store, StateStore) and store.root == str(tmp_path / "state" / "synthetic")
+    monkeypatch.setattr(ms, "PRICE_CACHE_ENABLED", False)
+    assert isinstance(ms.get_state_store(), MemoryStateStore)
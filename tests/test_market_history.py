@@ -0,0 +1,34 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import murphy_screener as ms
+from market_history import build_history
+
+
+@pytest.mark.parametrize("seed, as_of", [(0, dt.date(2024, 6, 28)), (2, dt.date(2023, 9, 29))])
+def test_point_in_time_history_matches_the_snapshot_builders(synthetic, seed, as_of):
+    provider = synthetic(seed=seed, as_of=as_of)
+    history = build_history(period_days=3 * 365)
+    rng = np.random.default_rng(seed)
+    # mostly days with a full year of bars behind them, plus both ends
+    days = pd.DatetimeIndex(history.dates[rng.choice(np.arange(300, len(history.dates)), 8, replace=False)]
+                            ).append(pd.DatetimeIndex(history.dates[[0, -1]]))
+    ranked = 0
+    for day in days:
+        provider.as_of = (day + pd.Timedelta(days=1)).date()  # the provider serves bars strictly before as_of
+        board, regime = ms.get_sector_leaderboard(), ms.get_intermarket_regime()
+        got_board, got_regime = history.leaderboard_on(day), history.regime_on(day)
+        ranked += bool(board)
+        assert {e: v["rank"] for e, v in got_board.items()} == {e: v["rank"] for e, v in board.items()}, day
+        for etf, perf in board.items():
+            for k in ("1w", "1m", "3m", "12m"):
+                if np.isnan(perf[k]):
+                    assert np.isnan(got_board[etf][k]), (day, etf, k)
+                else:
+                    assert got_board[etf][k] == pytest.approx(perf[k], abs=1e-4), (day, etf, k)
+        for key in ("trends", "risk_on", "favored_sectors", "description"):
+            assert got_regime[key] == regime[key], (day, key)
+    assert ranked >= 9  # all but the first day, which predates enough history to rank anything
@@ -0,0 +1,22 @@
+import datetime as dt
+
+import pytest
+
+import murphy_screener as ms
+from conftest import market_inputs
+from panel_scoring import parity_report, score_panel
+
+
+@pytest.mark.parametrize("seed, as_of", [(0, dt.date(2024, 6, 28)), (7, dt.date(2023, 3, 15))])
+def test_score_panel_matches_score_stock(synthetic, seed, as_of):
+    synthetic(seed=seed, as_of=as_of)
+    tickers = ms.get_universe_tickers("sp500")[:80] + ["XLK", "XLE", "SPY"]
+    mismatches, _, _ = parity_report(*market_inputs(tickers))
+    assert mismatches.empty, mismatches.to_string()
+
+
+def test_score_panel_skips_missing_history(synthetic):
+    synthetic()
+    histories, sectors, etf_flags, leaderboard, regime, spy_close = market_inputs(["AAPL", "MSFT"])
+    panel = score_panel({**histories, "GONE": None}, sectors, etf_flags, leaderboard, regime, spy_close)
+    assert list(panel["Ticker"]) == ["AAPL", "MSFT"]
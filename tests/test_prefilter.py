@@ -0,0 +1,47 @@
+import datetime as dt
+
+import pytest
+
+import murphy_screener as ms
+from prefilter import could_pass, fetch_quotes, prefilter
+
+
+# run_scan filter options -> whether the full path keeps a score_stock result
+MODES = {
+    "only_actionable": (dict(only_actionable=True),
+                        lambda res: res["Setup"] != "No Signal"),
+    "require_volume_spike": (dict(only_actionable=True, require_volume_spike=True),
+                             lambda res: res["Setup"] != "No Signal" and res["VolumeSpike"]),
+    "full_checklist": (dict(only_actionable=True, require_full_checklist=True),
+                       lambda res: res["Setup"] != "No Signal" and res["ChecklistPassCount"] >= 5),
+}
+
+
+@pytest.mark.parametrize("seed", [0, 3])
+@pytest.mark.parametrize("as_of", [dt.date(2023, 3, 15), dt.date(2023, 11, 1), dt.date(2024, 6, 28)])
+def test_stage_one_never_drops_a_stock_the_full_scan_keeps(synthetic, seed, as_of):
+    synthetic(seed=seed, as_of=as_of)
+    tickers = ms.get_universe_tickers("all")[::8]
+    regime, leaderboard = ms.get_intermarket_regime(), ms.get_sector_leaderboard()
+    spy_close = ms.fetch_history(ms.BENCHMARK)["Close"]
+    histories = ms.fetch_history_batch(tickers)
+    quotes = fetch_quotes(tickers)
+    dropped = {mode: 0 for mode in MODES}
+    for t, df in histories.items():
+        if df is None:
+            continue
+        res = ms.score_stock(t, df, ms.get_sector(t), leaderboard, regime, spy_close=spy_close)
+        for mode, (options, kept) in MODES.items():
+            if not could_pass(quotes.get(t), **options):
+                dropped[mode] += 1
+                assert not kept(res), f"{t} ({mode}): stage one dropped {res['Setup']}"
+    assert dropped["require_volume_spike"] > 0  # the check has something to guard
+
+
+def test_prefilter_exempts_etfs_and_keeps_input_order(synthetic):
+    synthetic()
+    tickers = ms.get_universe_tickers("sp500")[:60] + ["XLK", "SPY"]
+    keep, stats = prefilter(tickers, require_volume_spike=True)
+    assert stats["exempt"] >= 2 and {"XLK", "SPY"} <= set(keep)
+    assert keep == [t for t in tickers if t in keep]
+    assert stats["dropped"] == len(tickers) - len(keep) > 0
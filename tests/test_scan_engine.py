@@ -0,0 +1,76 @@
+import pytest
+
+import murphy_screener as ms
+import scan_engine
+from market_data import MarketDataProvider
+from price_cache import MetadataCache
+from scan_engine import CIRCUIT_THRESHOLD, CallController, ThrottledError, TokenBucket
+
+
+class FakeInfoProvider(MarketDataProvider):
+    """Remote-looking provider whose .info fails for "BAD*" symbols the way
+    yfinance does for an unknown ticker, and raises the queued exceptions
+    in `failures` before answering for the others."""
+
+    name = "fake"
+    cacheable = True
+    rate_limited = True
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.calls = {}
+
+    def info(self, ticker):
+        self.calls[ticker] = self.calls.get(ticker, 0) + 1
+        if ticker.startswith("BAD"):
+            raise ValueError(f"404 Client Error: Not Found for url: .../quoteSummary/{ticker}")
+        if self.failures.get(ticker):
+            raise self.failures[ticker].pop(0)
+        return {"sector": "Technology", "quoteType": "EQUITY"}
+
+
+@pytest.fixture
+def scan_env(monkeypatch, tmp_path):
+    controller = CallController(TokenBucket(rate=1e6, capacity=1e6))
+    cache = MetadataCache(root=str(tmp_path))
+    monkeypatch.setattr(ms, "CONTROLLER", controller)
+    monkeypatch.setattr(ms, "_metadata_cache", cache)
+    monkeypatch.setattr(ms, "_metadata_memo", {})
+    monkeypatch.setattr(scan_engine.time, "sleep", lambda seconds: None)  # no real backoff waits
+
+    def use(provider):
+        monkeypatch.setattr(ms, "_provider", provider)
+        return provider
+
+    return controller, cache, use
+
+
+def test_bad_symbol_is_negative_cached_without_retries_or_opening_the_circuit(scan_env):
+    controller, cache, use = scan_env
+    provider = use(FakeInfoProvider())
+    bad = [f"BAD{i}" for i in range(2 * CIRCUIT_THRESHOLD)]
+    for ticker in bad:
+        assert ms.get_metadata(ticker)["ok"] is False
+        assert cache.load(ticker)["ok"] is False
+        assert provider.calls[ticker] == 1
+    assert controller.stats["retries"] == 0
+    assert controller.stats["circuit_opens"] == 0
+    assert controller.stats["bad_requests"] == len(bad)
+    assert ms.get_metadata("GOOD") == cache.load("GOOD")
+    assert ms.get_metadata("GOOD")["ok"] is True
+
+
+def test_transient_failures_are_retried(scan_env):
+    controller, cache, use = scan_env
+    provider = use(FakeInfoProvider({"FLAKY": [ThrottledError("429"), ConnectionError("connection reset")]}))
+    assert ms.get_metadata("FLAKY")["ok"] is True
+    assert provider.calls["FLAKY"] == 3
+    assert controller.stats["retries"] == 2
+
+
+def test_exhausted_transient_failure_is_not_cached(scan_env):
+    controller, cache, use = scan_env
+    use(FakeInfoProvider({"SLOW": [ThrottledError("429")] * (controller.retries + 1)}))
+    assert ms.get_metadata("SLOW")["ok"] is False
+    assert cache.load("SLOW") is None
+    assert controller.stats["failed"] == 1
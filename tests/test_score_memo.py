@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import murphy_screener as ms
+from conftest import market_inputs
+from score_memo import ScoreMemo
+
+
+@pytest.fixture
+def scan(synthetic):
+    synthetic()
+    tickers = ms.get_universe_tickers("sp500")[:60] + ["XLK", "XLE"]
+    histories, sectors, etf_flags, leaderboard, regime, spy_close = market_inputs(tickers)
+    items = [(t, df, sectors[t], etf_flags[t]) for t, df in histories.items()]
+    return items, leaderboard, regime, spy_close
+
+
+def score(items, leaderboard, regime, spy_close, min_beta=None, memo=None, processes=0):
+    return {t: res for t, _, res, _ in ms.score_scan_inputs(items, leaderboard, regime, spy_close=spy_close,
+                                                             processes=processes, min_beta=min_beta, memo=memo)}
+
+
+def rescan(memo, *inputs, min_beta=None, processes=0):
+    """Memoized scan, checked against a full rescore; returns the memo's stats."""
+    memo.reset_stats()
+    assert score(*inputs, min_beta=min_beta, memo=memo, processes=processes) == score(*inputs, min_beta=min_beta)
+    return dict(memo.stats)
+
+
+def test_unchanged_inputs_are_hits(scan):
+    memo = ScoreMemo()
+    assert rescan(memo, *scan) == {"hit": 0, "rescored": 0, "miss": len(scan[0])}
+    assert rescan(memo, *scan) == {"hit": len(scan[0]), "rescored": 0, "miss": 0}
+
+
+def test_changed_sector_view_only_rescores_the_tickers_it_touches(scan):
+    items, leaderboard, regime, spy_close = scan
+    memo = ScoreMemo()
+    rescan(memo, *scan)
+    by_rank = sorted(leaderboard, key=lambda etf: leaderboard[etf]["rank"])
+    reranked = {etf: dict(info) for etf, info in leaderboard.items()}
+    reranked[by_rank[0]]["rank"], reranked[by_rank[8]]["rank"] = 9, 1
+    touched = sum(ms.score_context_view(sector, leaderboard, regime, etf_flag)
+                  != ms.score_context_view(sector, reranked, regime, etf_flag) for _, _, sector, etf_flag in items)
+    assert 0 < touched < len(items)
+    assert rescan(memo, items, reranked, regime, spy_close) == {"hit": len(items) - touched, "rescored": touched,
+                                                                "miss": 0}
+    flipped = {**regime, "risk_on": not regime.get("risk_on", True)}
+    assert rescan(memo, items, reranked, flipped, spy_close) == {"hit": 0, "rescored": len(items), "miss": 0}
+
+
+def test_changed_ticker_or_spy_data_is_a_miss(scan):
+    items, leaderboard, regime, spy_close = scan
+    memo = ScoreMemo()
+    rescan(memo, *scan)
+    t, df, sector, etf_flag = items[3]
+    restated = df.assign(Close=df["Close"] * np.r_[np.full(10, 0.99), np.ones(len(df) - 10)])  # an old bar moved
+    changed = items[:3] + [(t, restated, sector, etf_flag)] + items[4:]
+    assert rescan(memo, changed, leaderboard, regime, spy_close) == {"hit": len(items) - 1, "rescored": 0, "miss": 1}
+    new_spy = spy_close * np.r_[np.ones(len(spy_close) - 1), 1.02]
+    assert rescan(memo, changed, leaderboard, regime, new_spy) == {"hit": 0, "rescored": 0, "miss": len(items)}
+
+
+def test_min_beta_stubs(scan):
+    items, leaderboard, regime, spy_close = scan
+    memo = ScoreMemo()
+    rescan(memo, *scan, min_beta=1.0)
+    results = score(*scan, min_beta=1.0)
+    stubs = [t for t, res in results.items() if "Setup" not in res]
+    assert stubs and len(stubs) < len(items)
+    # a stub is reused while the cutoff still excludes it ...
+    assert rescan(memo, *scan, min_beta=1.0) == {"hit": len(items), "rescored": 0, "miss": 0}
+    # ... but was never fully scored, so lifting the cutoff scores it from scratch
+    assert rescan(memo, *scan, processes=2) == {"hit": len(items) - len(stubs), "rescored": 0, "miss": len(stubs)}
+    # fully scored stocks below a new cutoff come back as stubs without rescoring
+    assert rescan(memo, *scan, min_beta=1.0) == {"hit": len(items), "rescored": 0, "miss": 0}